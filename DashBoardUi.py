@@ -2,14 +2,29 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import io
+import time
 
 from app.api.v1.routes import load_dashboard
 from app.services.fetcher import fetch_network_details
-from app.services.report_builder import generate_pdf_report
 from app.services.pagination import render_pagination_ui
 from app.services.processor import enrich_with_station_data
-from app.services.analytics import get_top_10_networks_by_station_count
-from app.services.plot_builder import plot_world_station_map, generate_country_summary, render_global_network_donut_chart, render_network_donut_chart,  plot_station_map, plot_station_map_all_networks
+from app.services.station_store import current_station_table, load_network_stations, query_stations
+from app.services.exporter import lazy_export, export_table, EXPORT_MIME_TYPES
+from app.services.filter_index import load_filter_index
+from app.services.memory_governor import get_budget, memory_usage
+from app.services.metrics import (
+    allocation_sites, get_metrics, is_memory_tracing, observe, start_memory_tracing, start_metrics_server,
+    stop_memory_tracing
+)
+from app.services.profiling import start_rerun_profile, stop_rerun_profile
+from app.services.analytics import get_top_10_networks_from_enriched
+from app.services.availability import RANKING_METRICS, load_availability, overall_availability, rank_networks
+from app.services.coverage import COVERAGE_RADIUS_M, load_coverage
+from app.services.feed_health import health_summary, load_feed_health, unhealthy_network_ids
+from app.services.geo_rollups import cells_for, load_geo_rollups
+from app.services.rebalancing import MAX_MOVE_DISTANCE_M, load_rebalancing
+from app.services.sketches import distribution_by_country, load_sketches, scope_distribution
+from app.services.plot_builder import plot_world_station_map, generate_country_summary, render_global_network_donut_chart, render_network_donut_chart,  plot_station_map, plot_station_map_all_networks, plot_station_density_heatmap
 
 
 
@@ -28,31 +43,40 @@ st.set_page_config(page_title="City Bike Network Dashboard", layout="wide", page
 
 
 
+# === Instrumentation: Prometheus endpoint (METRICS_PORT), memory tracing (TRACE_MEMORY) and rerun timer ===
+start_metrics_server()
+start_memory_tracing()
+rerun_started = time.perf_counter()
+
+# === Opt-in profiling of this rerun (?profile=1, or PROFILE=rerun for all sessions) ===
+start_rerun_profile(st.query_params, st.session_state)
+
+
 # === Load Dataset Before Sidebar ===
 df, plot_bar_chart, summary_table, top_country, top_network = load_dashboard()
 
+# Country/name positions and presorted options, built once per snapshot
+filter_index = load_filter_index(df)
+
 
 # === Sidebar Filters ===
 with st.sidebar:
     st.sidebar.title("🚴 City Bike Network Dashboard")
 
     # Prepare options
-    country_options = ["ALL"] + sorted(df["country"].dropna().unique())
+    country_options = filter_index.country_options
     selected_country = st.selectbox("Select Country Code", country_options, index=0, placeholder="Type a country code")
 
     # Dynamic networks based on selected country
-    if selected_country == "ALL":
-        network_options = ["ALL"] + sorted(df["name"].dropna().unique())
-    else:
-        network_options = ["ALL"] + sorted(df[df["country"] == selected_country]["name"].dropna().unique())
+    network_options = filter_index.networks_for(selected_country)
 
     selected_network = st.selectbox("Select Network Name", network_options, index=0, placeholder="Type a network")
 
     sort_by = st.selectbox("Sort By", ["", "name", "city", "station count"], index=0)
 
 
-# === Apply Filter Logic ===
-filtered_df = df.copy()
+# === Apply Filter Logic (takes only the matching rows; df itself when unfiltered) ===
+filtered_df = filter_index.select(df, selected_country, selected_network, sort_by)
 
 filters_applied = (
     selected_country != "ALL" or
@@ -60,28 +84,34 @@ filters_applied = (
     sort_by != ""
 )
 
-if selected_country != "ALL":
-    filtered_df = filtered_df[filtered_df["country"] == selected_country]
-
-if selected_network != "ALL":
-    filtered_df = filtered_df[filtered_df["name"] == selected_network]
-
-if sort_by:
-    filtered_df = filtered_df.sort_values(by=sort_by)
-
 # === Only enrich if filters are active ===
-enriched_df = enrich_with_station_data(filtered_df) if filters_applied else df.copy()
+enriched_df = enrich_with_station_data(filtered_df) if filters_applied else df
 
 # === Enrich Full Data Once (for static metrics) ===
 enriched_full_df = enrich_with_station_data(df)
 
-# === Prepare Static Metrics ===
-total_networks = len(enriched_full_df)
-total_stations = enriched_full_df["station_count"].sum()
+# === Feed Health: stale or empty feeds are left out of the totals and rankings ===
+feed_health_counts = None
+unhealthy_ids = set()
+try:
+    feed_health = load_feed_health(df["id"])
+    feed_health_counts = health_summary(feed_health)
+    unhealthy_ids = unhealthy_network_ids(feed_health)
+except Exception as e:
+    st.warning(f"Could not check feed health: {e}")
+live_df = df[~df["id"].isin(unhealthy_ids)]
+
+
+# === Prepare Static Metrics (live feeds only; the Live Feeds card shows the full count) ===
+live_enriched_df = enriched_full_df[~enriched_full_df["id"].isin(unhealthy_ids)]
+if live_enriched_df.empty:
+    live_enriched_df = enriched_full_df
+total_networks = len(live_enriched_df)
+total_stations = live_enriched_df["station_count"].sum()
 
 # Top country by total stations
 top_country_df = (
-    enriched_full_df.groupby("country")["station_count"]
+    live_enriched_df.groupby("country", observed=True)["station_count"]
     .sum()
     .reset_index()
     .sort_values(by="station_count", ascending=False)
@@ -90,7 +120,7 @@ top_country_name = top_country_df.iloc[0]["country"]
 
 # Top network by total stations (aggregated)
 top_network_df = (
-    enriched_full_df.groupby("name")["station_count"]
+    live_enriched_df.groupby("name")["station_count"]
     .sum()
     .reset_index()
     .sort_values(by="station_count", ascending=False)
@@ -98,10 +128,19 @@ top_network_df = (
 top_network_name = top_network_df.iloc[0]["name"]
 
 
+# === Station Availability (computed once per snapshot) ===
+availability_df = pd.DataFrame()
+report_availability_df = pd.DataFrame()
+try:
+    availability_df = load_availability(df["id"])
+    report_availability_df = rank_networks(availability_df, live_df, by="empty_pct", limit=10, min_stations=5)
+except Exception as e:
+    st.warning(f"Could not compute station availability: {e}")
+
 
 filtered_summary_df = pd.DataFrame()
 try:
-    summaries = generate_country_summary(df[df["country"] == top_country_name], fetch_network_details)
+    summaries = generate_country_summary(filter_index.select(df, top_country_name), fetch_network_details)
     if summaries:
         filtered_summary_df = pd.DataFrame(summaries[0]["details"]).sort_values(by="Free Bikes", ascending=False)
 except Exception as e:
@@ -122,7 +161,7 @@ top_country_bar_figure = px.bar(
 top_country_bar_figure.update_traces(textposition="outside", marker_color="#66CCFF")
 top_country_bar_figure.update_layout(plot_bgcolor="#111", paper_bgcolor="#111", font_color="white")
 
-top_networks = get_top_10_networks_by_station_count(df.to_dict(orient="records"))
+top_networks = get_top_10_networks_from_enriched(live_enriched_df)
 names = [n["name"] for n in top_networks]
 counts = [n["station_count"] for n in top_networks]
 top_networks_pie_figure = px.pie(
@@ -149,6 +188,9 @@ top_country_networks_df = pd.DataFrame({
 with st.sidebar:
     if st.button("Generate Report"):
         try:
+            # reportlab and matplotlib are only imported once a report is requested
+            from app.services.report_builder import generate_pdf_report
+
             pdf_path = generate_pdf_report(
                 df=df,
                 top_country=top_country_name,
@@ -158,7 +200,9 @@ with st.sidebar:
                 top_country_networks_df=top_country_networks_df,
                 world_map_fig=world_map_figure,
                 top_country_fig=top_country_bar_figure,        # optional: still passed but unused in matplotlib mode
-                top_networks_pie_fig=top_networks_pie_figure   # optional: still passed but unused in matplotlib mode
+                top_networks_pie_fig=top_networks_pie_figure,  # optional: still passed but unused in matplotlib mode
+                availability_df=report_availability_df,
+                feed_health=feed_health_counts
             )
             with open(pdf_path, "rb") as f:
                 st.download_button(
@@ -174,6 +218,17 @@ with st.sidebar:
 
 
 
+# === Full Station Export in Sidebar (built only when downloaded) ===
+with st.sidebar:
+    all_export_fmt = st.selectbox("Export All Stations As", list(EXPORT_MIME_TYPES.keys()), index=1)
+    st.download_button(
+        label="Download All Stations",
+        data=lambda: export_table(current_station_table(df["id"]), all_export_fmt),
+        file_name=f"all_stations.{all_export_fmt}",
+        mime=EXPORT_MIME_TYPES[all_export_fmt]
+    )
+
+
 # === Modal UI Logic ===
 if st.session_state.get("show_report_modal", False):
     st.markdown("""
@@ -232,6 +287,8 @@ if st.session_state.get("generate_pdf"):
     st.success("Generating PDF...")
 
     try:
+        from app.services.report_builder import generate_pdf_report
+
         pdf_path = generate_pdf_report(
             df=df,
             top_country=top_country_name,
@@ -244,7 +301,9 @@ if st.session_state.get("generate_pdf"):
             top_networks_pie_fig=top_networks_pie_figure if selected["charts"] else None,
             include_summary=selected["summary"],
             include_charts=selected["charts"],
-            include_map=selected["map"]
+            include_map=selected["map"],
+            availability_df=report_availability_df,
+            feed_health=feed_health_counts
         )
 
         with open(pdf_path, "rb") as f:
@@ -312,6 +371,7 @@ with left_col:
         .metric-card:nth-child(2) { animation-delay: 0.1s; }
         .metric-card:nth-child(3) { animation-delay: 0.2s; }
         .metric-card:nth-child(4) { animation-delay: 0.3s; }
+        .metric-card:nth-child(5) { animation-delay: 0.4s; }
 
         .metric-card:hover {
             transform: scale(1.02);
@@ -362,6 +422,8 @@ with left_col:
         ("Top Network", top_network_name),
         ("Total Stations", total_stations)
     ]
+    if feed_health_counts:
+        metrics.append(("Live Feeds", f"{feed_health_counts['live_networks']} / {feed_health_counts['networks']}"))
 
     st.markdown("<div style='width: 100%; display: flex; justify-content: center;'>", unsafe_allow_html=True)
 
@@ -430,7 +492,9 @@ with right_col:
             """, unsafe_allow_html=True)
 
             try:
-                top_networks = get_top_10_networks_by_station_count(df.to_dict(orient="records"))
+                top_networks = get_top_10_networks_from_enriched(
+                    enriched_full_df[~enriched_full_df["id"].isin(unhealthy_ids)]
+                )
 
                 if top_networks:
                     names = [n["name"] for n in top_networks]
@@ -553,6 +617,151 @@ with flag_col:
         """, unsafe_allow_html=True)
 
 
+# === Station Availability: empty / full / offline stations per network ===
+if not availability_df.empty:
+    scope_df = filter_index.select(df, selected_country, selected_network)
+    scope_label = selected_network if selected_network != "ALL" else (
+        selected_country if selected_country != "ALL" else "All Countries"
+    )
+
+    st.markdown(f"""
+        <div style='font-size: 30px; font-weight: bold; color: white; text-align:center;padding:20px;'>
+             Station Availability: {scope_label}
+        </div>
+    """, unsafe_allow_html=True)
+
+    try:
+        in_scope = availability_df["network_id"].isin(scope_df["id"])
+        scoped = availability_df[in_scope & ~availability_df["network_id"].isin(unhealthy_ids)]
+        overall = overall_availability(scoped)
+
+        a1, a2, a3, a4 = st.columns(4)
+        a1.metric("Empty Stations", f"{overall['empty_pct']:.1f}%")
+        a2.metric("Full Stations", f"{overall['full_pct']:.1f}%")
+        a3.metric("Offline Stations", f"{overall['offline_pct']:.1f}%")
+        a4.metric("Bike-to-Dock Ratio", f"{overall['bike_dock_ratio']:.2f}")
+        excluded = int(in_scope.sum()) - len(scoped)
+        if excluded:
+            st.caption(f"{excluded} network{'s' if excluded != 1 else ''} with stale or empty feeds "
+                       f"left out of these figures and rankings.")
+
+        # Distributions come from the snapshot's quantile sketches
+        sketches = load_sketches()
+        if sketches is not None:
+            quantiles = scope_distribution(sketches, scope_df["id"])
+            d1, d2 = st.columns(2)
+            d1.metric("Median Free Bikes per Station", f"{quantiles[0.5]:.0f}")
+            d2.metric("P90 Free Bikes per Station", f"{quantiles[0.9]:.0f}")
+
+            with st.expander("Distribution by Country"):
+                st.dataframe(
+                    distribution_by_country(sketches),
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        "country": "Country", "networks": "Networks",
+                        "median_stations": st.column_config.NumberColumn("Median Stations/Network", format="%.0f"),
+                        "p90_stations": st.column_config.NumberColumn("P90 Stations/Network", format="%.0f"),
+                        "median_free_bikes": st.column_config.NumberColumn("Median Free Bikes/Station", format="%.0f"),
+                        "p90_free_bikes": st.column_config.NumberColumn("P90 Free Bikes/Station", format="%.0f"),
+                    }
+                )
+
+        if len(scoped) > 1:
+            r1, r2 = st.columns([2, 1])
+            rank_label = r1.selectbox("Rank Networks By", list(RANKING_METRICS.keys()), index=0)
+            rank_order = r2.selectbox("Order", ["Highest first", "Lowest first"], index=0, key="availability_order")
+
+            ranked = rank_networks(
+                scoped, scope_df, by=RANKING_METRICS[rank_label],
+                ascending=rank_order == "Lowest first", limit=15, min_stations=5
+            )
+            st.dataframe(
+                ranked[["name", "city", "country", "stations", "empty_pct", "full_pct", "offline_pct", "bike_dock_ratio"]],
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "name": "Network", "city": "City", "country": "Country", "stations": "Stations",
+                    "empty_pct": st.column_config.NumberColumn("Empty %", format="%.1f"),
+                    "full_pct": st.column_config.NumberColumn("Full %", format="%.1f"),
+                    "offline_pct": st.column_config.NumberColumn("Offline %", format="%.1f"),
+                    "bike_dock_ratio": st.column_config.NumberColumn("Bikes/Docks", format="%.2f"),
+                }
+            )
+    except Exception as e:
+        st.warning(f"Error displaying station availability: {e}")
+
+
+# === Station Density: heatmap and city breakdown from the precomputed rollups ===
+try:
+    geo_rollups = load_geo_rollups(df)
+except Exception as e:
+    geo_rollups = None
+    st.warning(f"Could not build geographic rollups: {e}")
+
+if geo_rollups is not None:
+    density_country = selected_country if selected_country != "ALL" else None
+
+    st.markdown(f"""
+        <div style='font-size: 30px; font-weight: bold; color: white; text-align:center;padding:20px;'>
+             Station Density: {density_country or 'All Countries'}
+        </div>
+    """, unsafe_allow_html=True)
+
+    heat_col, city_col = st.columns([2, 1])
+
+    with heat_col:
+        try:
+            # Coarser cells for the world view, ~39 km cells within a country
+            cells = cells_for(geo_rollups, 4 if density_country else 3, country=density_country)
+            fig = plot_station_density_heatmap(cells, zoom=4 if density_country else 1)
+            if fig:
+                st.plotly_chart(fig, use_container_width=True, config={"scrollZoom": True})
+            else:
+                st.info("No station coordinates available for this selection.")
+        except Exception as e:
+            st.warning(f"Error displaying station density heatmap: {e}")
+
+    with city_col:
+        try:
+            cities = geo_rollups["city"]
+            if density_country:
+                cities = cities[cities["country"] == density_country]
+            st.markdown("#### Top Cities by Stations")
+            st.dataframe(
+                cities.head(15)[["city", "country", "networks", "stations", "free_bikes", "docks"]],
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "city": "City", "country": "Country", "networks": "Networks",
+                    "stations": "Stations", "free_bikes": "Free Bikes", "docks": "Docks",
+                }
+            )
+        except Exception as e:
+            st.warning(f"Error displaying city breakdown: {e}")
+
+    try:
+        coverage_cities = load_coverage(df)["cities"]
+        if density_country:
+            coverage_cities = coverage_cities[coverage_cities["country"] == density_country]
+        st.markdown(f"#### Walking Coverage ({COVERAGE_RADIUS_M:.0f} m of a station)")
+        st.dataframe(
+            coverage_cities.head(25)[["city", "country", "stations", "area_km2", "coverage_pct",
+                                      "mean_spacing_m", "dense_stations", "isolated_stations"]],
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "city": "City", "country": "Country", "stations": "Stations",
+                "area_km2": st.column_config.NumberColumn("Extent (km²)", format="%.1f"),
+                "coverage_pct": st.column_config.ProgressColumn("Covered", format="%.0f%%", min_value=0, max_value=100),
+                "mean_spacing_m": st.column_config.NumberColumn("Mean Spacing (m)", format="%.0f"),
+                "dense_stations": "Dense Stations", "isolated_stations": "Isolated Stations",
+            }
+        )
+    except Exception as e:
+        st.warning(f"Error displaying walking coverage: {e}")
+
+
 
 
 
@@ -692,11 +901,10 @@ with col2:
                         # Show paginated data
                         st.dataframe(paginated_df, use_container_width=True)
 
-                        # Download button for full data
-                        csv = display_df.to_csv(index=False).encode("utf-8")
+                        # Download button for full data (serialized only on click)
                         st.download_button(
                             label=f" Download CSV for {entry['country']}",
-                            data=csv,
+                            data=lazy_export(display_df, "csv"),
                             file_name=f"{entry['country']}_bike_networks.csv",
                             mime="text/csv"
                         )
@@ -706,18 +914,139 @@ with col2:
             st.error(f" Error generating country-level details: {e}")
 
 
+# === Station-Level Drill-Down for the Selected Network ===
+if selected_network != "ALL":
+    st.markdown(f"""
+        <div style='font-size: 26px; font-weight: bold; color: white; text-align:center; padding: 20px 0 10px 0;'>
+             Stations in {selected_network}
+        </div>
+    """, unsafe_allow_html=True)
 
+    try:
+        network_ids = filtered_df.loc[filtered_df["name"] == selected_network, "id"]
+        station_df = load_network_stations(network_ids.iloc[0]) if not network_ids.empty else pd.DataFrame()
+
+        if not station_df.empty:
+            station_filters = {
+                "All stations": [],
+                "No free bikes": [("free_bikes", "==", 0)],
+                "No empty slots": [("empty_slots", "==", 0)],
+            }
 
+            f1, f2, f3 = st.columns(3)
+            station_filter = f1.selectbox("Show", list(station_filters.keys()), key="station_filter")
+            station_sort = f2.selectbox("Sort Stations By", ["name", "free_bikes", "empty_slots", "slots"], key="station_sort")
+            station_order = f3.selectbox("Order", ["Ascending", "Descending"], key="station_order")
+
+            station_page_size = 25
+            current_page = st.session_state.get("station_page", 1)
+            page_df, total_rows = query_stations(
+                station_df,
+                filters=station_filters[station_filter],
+                sort_by=station_sort,
+                ascending=station_order == "Ascending",
+                page=current_page,
+                page_size=station_page_size
+            )
 
+            total_pages = max((total_rows + station_page_size - 1) // station_page_size, 1)
+            if current_page > total_pages:
+                current_page = total_pages
+                page_df, total_rows = query_stations(
+                    station_df,
+                    filters=station_filters[station_filter],
+                    sort_by=station_sort,
+                    ascending=station_order == "Ascending",
+                    page=current_page,
+                    page_size=station_page_size
+                )
 
+            st.caption(f"{total_rows} of {len(station_df)} stations match")
+            st.dataframe(
+                page_df[["name", "free_bikes", "empty_slots", "slots", "latitude", "longitude", "timestamp"]],
+                use_container_width=True,
+                hide_index=True
+            )
 
+            export_fmt = st.selectbox("Export Format", list(EXPORT_MIME_TYPES.keys()), key="station_export_fmt")
+            st.download_button(
+                label=f" Download {total_rows} stations",
+                data=lazy_export(station_df, export_fmt, station_filters[station_filter]),
+                file_name=f"{network_ids.iloc[0]}_stations.{export_fmt}",
+                mime=EXPORT_MIME_TYPES[export_fmt]
+            )
 
+            # Expander bodies run even when collapsed, so the plan is only built once asked for
+            with st.expander("Rebalancing Suggestions"):
+                if not st.toggle("Suggest rebalancing moves", key="show_rebalancing",
+                                 help="Planning takes a few seconds for the largest networks"):
+                    st.caption("Turn on to plan bike moves for this network.")
+                else:
+                    plan = load_rebalancing(network_ids.iloc[0])
+                    summary = plan["summary"]
+                    r1, r2, r3, r4 = st.columns(4)
+                    r1.metric("Bikes to Move", summary["moved_bikes"])
+                    r2.metric("Moves", summary["moves"])
+                    r3.metric("Bike-km", f"{summary['bike_km']:.1f}")
+                    r4.metric("Unmet Demand", summary["unmet_bikes"],
+                              help="Bikes still needed after these moves: no spare bikes left at the nearest "
+                                   f"stations within {MAX_MOVE_DISTANCE_M / 1000:.0f} km")
+                    if plan["moves"].empty:
+                        st.info("Stations are already balanced.")
+                    else:
+                        st.dataframe(
+                            plan["moves"][["from_name", "to_name", "bikes", "distance_m"]],
+                            hide_index=True,
+                            use_container_width=True,
+                            column_config={
+                                "from_name": "From", "to_name": "To", "bikes": "Bikes",
+                                "distance_m": st.column_config.NumberColumn("Distance (m)", format="%.0f"),
+                            }
+                        )
 
-
-
-
-
-
-
-
-
+            new_page = render_pagination_ui(current_page, total_pages, "stations")
+            if new_page != current_page:
+                st.session_state["station_page"] = new_page
+                st.rerun()
+        else:
+            st.info("No station data available for this network.")
+    except Exception as e:
+        st.error(f" Error loading station table: {e}")
+
+
+
+# === Hidden Debug Panel (open with ?debug=1) ===
+observe("dashboard_rerun", time.perf_counter() - rerun_started)
+profile_path = stop_rerun_profile(st.session_state)
+if profile_path:
+    st.caption(f"Profile of this rerun written to {profile_path}")
+
+if st.query_params.get("debug") == "1":
+    with st.expander("Debug: timings and counters", expanded=True):
+        debug_metrics = get_metrics()
+        st.markdown("**Stage timings**")
+        st.dataframe(pd.DataFrame(debug_metrics["timings"]), use_container_width=True, hide_index=True)
+        st.markdown("**Counters**")
+        st.dataframe(pd.DataFrame(debug_metrics["counters"]), use_container_width=True, hide_index=True)
+        usage = memory_usage()
+        budget = get_budget()
+        st.markdown(f"**Cache memory** ({usage['bytes'].sum() / 1e6:.1f} MB"
+                    f"{f' of {budget / 1e6:.0f} MB budget' if budget else ', no budget'})")
+        st.dataframe(usage.assign(MB=(usage["bytes"] / 1e6).round(2)), use_container_width=True, hide_index=True)
+
+        st.markdown("**Memory per stage** (tracemalloc, bytes above the start of each stage)")
+        if debug_metrics["memory"]:
+            st.dataframe(pd.DataFrame(debug_metrics["memory"]), use_container_width=True, hide_index=True)
+        # Tracing slows every session of this process, so it can be stopped again from here
+        if is_memory_tracing():
+            if st.button("Stop memory tracing"):
+                stop_memory_tracing()
+                st.rerun()
+            if st.button("Show top allocation sites"):
+                st.caption("Change is relative to the previous time this table was shown.")
+                st.dataframe(pd.DataFrame(allocation_sites()), use_container_width=True, hide_index=True)
+        elif st.button("Start memory tracing", help="Applies to every session of this process until stopped"):
+            start_memory_tracing(frames=1)
+            st.rerun()
+        else:
+            st.caption("Not tracing. Set TRACE_MEMORY=1, or start tracing here; stages are recorded from the next rerun.")
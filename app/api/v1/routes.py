@@ -6,19 +6,48 @@ from app.services.analytics import (
     get_top_country,
     get_top_network
 )
+from app.services.rebalancing import load_rebalancing
+from app.services.refresher import refresh_snapshot_async, sync_shared_snapshot, wait_for_refresh
+from app.services.snapshot import get_current_snapshot, is_stale
 import pandas as pd
 import logging
+import os
 
 logging.basicConfig(level=logging.INFO)
 
-def load_dashboard():
+# How long a rerun without a snapshot waits for the first background refresh
+FIRST_SNAPSHOT_WAIT = float(os.environ.get("FIRST_SNAPSHOT_WAIT", 300))
+
+def load_base_networks():
+    # Serve the booted snapshot (refreshing it in the background once stale),
+    # otherwise wait for the first background refresh, which crawls every
+    # network anyway; only if it fails is the network list fetched live
+    sync_shared_snapshot()
+    snapshot = get_current_snapshot()
+    if snapshot is not None:
+        if is_stale(snapshot):
+            refresh_snapshot_async()
+        return snapshot["networks"]
+
+    refresh_snapshot_async()
+    wait_for_refresh(FIRST_SNAPSHOT_WAIT)
+    snapshot = get_current_snapshot()
+    if snapshot is not None:
+        return snapshot["networks"]
+
     networks = fetch_network_data()
 
     if not networks:
         logging.warning("No network data fetched.")
-        return pd.DataFrame(), None, None, pd.DataFrame(), pd.DataFrame()
+        return None
+
+    return process_data(networks)
 
-    df = process_data(networks)
+def load_dashboard():
+    df = load_base_networks()
+
+    if df is None:
+        return pd.DataFrame(), None, None, pd.DataFrame(), pd.DataFrame()
 
     if df.empty:
         logging.warning("Processed DataFrame is empty.")
@@ -51,3 +80,17 @@ def load_dashboard():
     return df, bar_chart, summary, top_country, top_network
 
 
+def load_rebalancing_plan(network_id):
+    """
+    Suggested bike moves for one network of the current snapshot.
+
+    Returns:
+        tuple: (moves DataFrame, summary dict); empty on failure.
+    """
+    sync_shared_snapshot()
+    try:
+        plan = load_rebalancing(network_id)
+    except Exception as e:
+        logging.error(f"Error planning rebalancing for {network_id}: {e}")
+        return pd.DataFrame(), {}
+    return plan["moves"], plan["summary"]
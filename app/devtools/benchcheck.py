@@ -0,0 +1,65 @@
+"""
+Runs the benchmark suite and fails on regressions against a saved baseline:
+
+    python -m app.devtools.benchcheck --save     # record a baseline
+    python -m app.devtools.benchcheck            # compare; exits non-zero on a regression
+
+A run fails when any benchmark's median is more than --threshold percent
+(default 25) slower than in the newest saved baseline. Extra arguments after
+"--" are passed on to pytest, e.g. "-- -k process_data".
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BENCHMARK_DIR = os.path.join("tests", "benchmarks")
+STORAGE_DIR = ".benchmarks"
+BASELINE_NAME = "baseline"
+DEFAULT_THRESHOLD = 25
+
+
+def latest_baseline(storage=STORAGE_DIR):
+    """Run number (e.g. "0003") of the newest saved baseline, or None if there is none."""
+    saved = glob.glob(os.path.join(REPO_ROOT, storage, "*", f"*_{BASELINE_NAME}.json"))
+    if not saved:
+        return None
+    return os.path.basename(max(saved, key=os.path.getmtime)).split("_", 1)[0]
+
+
+def pytest_command(save=False, baseline=None, threshold=DEFAULT_THRESHOLD, extra=()):
+    command = [sys.executable, "-m", "pytest", BENCHMARK_DIR, "--benchmark-only"]
+    if save:
+        command.append(f"--benchmark-save={BASELINE_NAME}")
+    else:
+        command += [f"--benchmark-compare={baseline}", f"--benchmark-compare-fail=median:{threshold:g}%"]
+    return command + list(extra)
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    extra = argv[argv.index("--") + 1:] if "--" in argv else []
+    argv = argv[:argv.index("--")] if "--" in argv else argv
+
+    parser = argparse.ArgumentParser(description="Run the benchmarks and fail on regressions against a baseline.")
+    parser.add_argument("--save", action="store_true", help="Record a new baseline instead of comparing")
+    parser.add_argument("--baseline", help="Run number to compare against (default: the newest baseline)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed median slowdown in percent")
+    args = parser.parse_args(argv)
+
+    baseline = args.baseline
+    if not args.save and baseline is None:
+        baseline = latest_baseline()
+        if baseline is None:
+            parser.error("no saved baseline; record one with --save first")
+
+    command = pytest_command(args.save, baseline, args.threshold, extra)
+    env = dict(os.environ, RUN_BENCHMARKS="1")
+    return subprocess.run(command, cwd=REPO_ROOT, env=env).returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
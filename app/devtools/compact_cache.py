@@ -0,0 +1,57 @@
+"""
+Converts legacy plain-JSON network cache files to checksummed, compressed entries:
+
+    python -m app.devtools.compact_cache --codec zstd
+
+Each <id>.json becomes <id>.cache (written atomically); the JSON file is only
+removed with --remove-legacy, since the mock server still serves from it.
+"""
+import argparse
+import glob
+import json
+import os
+
+from app.services import fetcher
+from app.services.cache_io import CODECS, resolve_codec
+
+
+def compact_cache(cache_dir=None, codec=None, remove_legacy=False):
+    """
+    Rewrites every legacy entry in cache_dir.
+
+    Returns:
+        tuple: (entries converted, bytes before, bytes after).
+    """
+    cache_dir = cache_dir or fetcher.CACHE_DIR
+    converted, before, after = 0, 0, 0
+    for legacy_path in sorted(glob.glob(os.path.join(cache_dir, f"*{fetcher.LEGACY_CACHE_SUFFIX}"))):
+        network_id = os.path.basename(legacy_path)[:-len(fetcher.LEGACY_CACHE_SUFFIX)]
+        with open(legacy_path, "r") as f:
+            data = json.load(f)
+
+        entry_path = os.path.join(cache_dir, f"{network_id}{fetcher.CACHE_SUFFIX}")
+        fetcher.write_cache_entry(entry_path, data, codec or fetcher.CACHE_COMPRESSION)
+
+        before += os.path.getsize(legacy_path)
+        after += os.path.getsize(entry_path)
+        converted += 1
+        if remove_legacy:
+            os.remove(legacy_path)
+    return converted, before, after
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact the network file cache.")
+    parser.add_argument("--cache-dir", default=fetcher.CACHE_DIR)
+    parser.add_argument("--codec", choices=CODECS, default=fetcher.CACHE_COMPRESSION)
+    parser.add_argument("--remove-legacy", action="store_true", help="Delete the .json files once converted")
+    args = parser.parse_args(argv)
+
+    converted, before, after = compact_cache(args.cache_dir, args.codec, args.remove_legacy)
+    ratio = after / before if before else 0
+    print(f"Converted {converted} entries with {resolve_codec(args.codec)}: "
+          f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB ({ratio:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load test for the fetcher against the local mock citybik.es server.
+
+Measures one end-to-end refresh (network list, process_data, then every
+network's details) under injected latency and faults, and reports wall time,
+per-network latency percentiles and the fetcher's HTTP and cache counters:
+
+    python -m app.devtools.loadtest --networks 200 --concurrency 8 \
+        --latency 0.05 --rate-limit-rate 0.05 --retry-after 0 --truncate-rate 0.02
+"""
+import argparse
+import logging
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.devtools.mock_citybikes import DEFAULT_CACHE_DIR, add_fault_arguments, faults_from_args, start_mock_server
+from app.services import fetcher, metrics
+from app.services.processor import process_data
+
+
+def run_refresh(base_url, network_limit=None, concurrency=8, max_retries=None, backoff_factor=None):
+    """
+    Runs one cold refresh against base_url with empty memory and file caches.
+
+    Returns:
+        dict: Timing, latency percentiles, failure count and fetcher counters.
+    """
+    metrics.reset()
+    fetcher.BASE_URL = base_url.rstrip("/")
+    fetcher.network_detail_cache.clear()
+    if max_retries is not None:
+        fetcher.MAX_RETRIES = max_retries
+    if backoff_factor is not None:
+        fetcher.BACKOFF_FACTOR = backoff_factor
+
+    latencies = []
+
+    def fetch_one(network_id):
+        start = time.perf_counter()
+        details = fetcher.fetch_network_details(network_id)
+        latencies.append(time.perf_counter() - start)
+        return bool(details)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        fetcher.CACHE_DIR = cache_dir
+        started = time.perf_counter()
+
+        networks = fetcher.fetch_network_data()
+        list_seconds = time.perf_counter() - started
+        df = process_data(networks)
+        network_ids = list(df["id"])[:network_limit] if not df.empty else []
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch_one, network_ids))
+
+        total_seconds = time.perf_counter() - started
+
+    latency = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "networks": len(network_ids),
+        "failed": results.count(False),
+        "list_seconds": round(list_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "networks_per_second": round(len(network_ids) / total_seconds, 1) if total_seconds else 0.0,
+        "latency_p50_ms": round(float(np.percentile(latency, 50)) * 1000, 1),
+        "latency_p95_ms": round(float(np.percentile(latency, 95)) * 1000, 1),
+        "latency_max_ms": round(float(latency.max()) * 1000, 1),
+        "counters": metrics.get_metrics()["counters"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the fetcher against a mock citybik.es API.")
+    parser.add_argument("--networks", type=int, default=None, help="Limit the number of networks fetched")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Fetcher request timeout in seconds")
+    parser.add_argument("--max-retries", type=int, default=None)
+    parser.add_argument("--backoff-factor", type=float, default=None)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Data served by the mock server")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.ERROR)
+    fetcher.REQUEST_TIMEOUT = args.timeout
+    server = start_mock_server(cache_dir=args.cache_dir, faults=faults_from_args(args))
+    try:
+        report = run_refresh(server.base_url, args.networks, args.concurrency, args.max_retries, args.backoff_factor)
+    finally:
+        server.shutdown()
+
+    counters = report.pop("counters")
+    for key, value in report.items():
+        print(f"{key:>22}: {value}")
+    print(f"{'server outcomes':>22}: {server.outcomes}")
+    for counter in counters:
+        labels = ", ".join(f"{k}={v}" for k, v in counter.items() if k not in ("metric", "value"))
+        print(f"{counter['metric']:>22}: {labels} -> {counter['value']:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Local stand-in for the citybik.es v2 API, served from network_cache/.
+
+Run it and point the dashboard at it:
+
+    python -m app.devtools.mock_citybikes --port 8800 --latency 0.05 --rate-limit-rate 0.1
+    CITYBIKES_BASE_URL=http://localhost:8800/v2/networks streamlit run DashBoardUi.py
+
+Faults are injected per request: fixed plus jittered latency, 500 errors,
+429 responses with Retry-After, bodies trickled out slowly, and bodies cut
+off before Content-Length is reached.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CACHE_DIR = "network_cache"
+API_PREFIX = "/v2/networks"
+
+OUTCOMES = ("ok", "error", "429", "slow", "truncated")
+
+
+class FaultConfig:
+    """
+    Fault injection settings for the mock server.
+
+    Args:
+        latency (float): Seconds added to every response.
+        jitter (float): Extra random latency, uniform in [0, jitter].
+        error_rate (float): Share of requests answered with 500.
+        rate_limit_rate (float): Share of requests answered with 429.
+        retry_after (int): Retry-After header value sent with 429s.
+        slow_rate (float): Share of bodies sent in small delayed chunks.
+        slow_chunk_delay (float): Delay between slow chunks, in seconds.
+        truncate_rate (float): Share of bodies cut off halfway.
+        script (list): Outcomes forced in order before random draws,
+            e.g. ["429", "ok"]; used for deterministic tests.
+        seed (int): Seed for the fault random generator.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1,
+                 slow_rate=0.0, slow_chunk_delay=0.05, truncate_rate=0.0, script=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.slow_rate = slow_rate
+        self.slow_chunk_delay = slow_chunk_delay
+        self.truncate_rate = truncate_rate
+        self.script = list(script or [])
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_outcome(self) -> str:
+        with self._lock:
+            if self.script:
+                return self.script.pop(0)
+            draw = self._random.random()
+        for outcome, rate in (("error", self.error_rate), ("429", self.rate_limit_rate),
+                              ("slow", self.slow_rate), ("truncated", self.truncate_rate)):
+            if draw < rate:
+                return outcome
+            draw -= rate
+        return "ok"
+
+    def delay(self) -> float:
+        with self._lock:
+            return self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+
+class NetworkStore:
+    """Serves network payloads from a network_cache/ directory, loading each file once."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._payloads = {}
+        self._list_body = None
+        self._lock = threading.Lock()
+
+    def network_ids(self):
+        return sorted(f[:-5] for f in os.listdir(self.cache_dir) if f.endswith(".json"))
+
+    def detail_body(self, network_id: str):
+        with self._lock:
+            if network_id not in self._payloads:
+                path = os.path.join(self.cache_dir, f"{network_id}.json")
+                if not os.path.isfile(path):
+                    return None
+                with open(path, "r") as f:
+                    data = json.load(f)
+                self._payloads[network_id] = json.dumps({"network": data}).encode("utf-8")
+            return self._payloads[network_id]
+
+    def list_body(self):
+        with self._lock:
+            if self._list_body is None:
+                networks = []
+                for network_id in self.network_ids():
+                    with open(os.path.join(self.cache_dir, f"{network_id}.json"), "r") as f:
+                        data = json.load(f)
+                    networks.append({k: v for k, v in data.items() if k != "stations"})
+                self._list_body = json.dumps({"networks": networks}).encode("utf-8")
+            return self._list_body
+
+
+class MockCityBikesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.split("?", 1)[0].rstrip("/")
+
+        if path == API_PREFIX:
+            body = server.store.list_body()
+        elif path.startswith(API_PREFIX + "/"):
+            body = server.store.detail_body(path[len(API_PREFIX) + 1:])
+        else:
+            body = None
+
+        time.sleep(server.faults.delay())
+        outcome = server.faults.next_outcome()
+        server.record(outcome)
+
+        if body is None:
+            self._send_simple(404, b'{"error": "not found"}')
+        elif outcome == "error":
+            self._send_simple(500, b'{"error": "injected failure"}')
+        elif outcome == "429":
+            self._send_simple(429, b'{"error": "rate limited"}',
+                              {"Retry-After": str(server.faults.retry_after)})
+        elif outcome == "slow":
+            self._send_headers(200, len(body))
+            step = max(len(body) // 10, 1)
+            for start in range(0, len(body), step):
+                self.wfile.write(body[start:start + step])
+                self.wfile.flush()
+                time.sleep(server.faults.slow_chunk_delay)
+        elif outcome == "truncated":
+            self._send_headers(200, len(body))
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+        else:
+            self._send_headers(200, len(body))
+            self.wfile.write(body)
+
+    def _send_headers(self, status, length, extra_headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(length))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _send_simple(self, status, body, extra_headers=None):
+        self._send_headers(status, len(body), extra_headers)
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockCityBikesServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store: NetworkStore, faults: FaultConfig):
+        super().__init__(address, MockCityBikesHandler)
+        self.store = store
+        self.faults = faults
+        self.outcomes = {outcome: 0 for outcome in OUTCOMES}
+        self._lock = threading.Lock()
+
+    def record(self, outcome):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+
+def start_mock_server(port=0, cache_dir=DEFAULT_CACHE_DIR, faults=None, host="127.0.0.1"):
+    """
+    Starts the mock API on a background thread.
+
+    Returns:
+        MockCityBikesServer: The running server; use .base_url and .shutdown().
+    """
+    server = MockCityBikesServer((host, port), NetworkStore(cache_dir), faults or FaultConfig())
+    threading.Thread(target=server.serve_forever, name="mock-citybikes", daemon=True).start()
+    return server
+
+
+def add_fault_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 500 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of 429 responses")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Share of slowly trickled bodies")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Share of truncated bodies")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for fault injection")
+
+
+def faults_from_args(args) -> FaultConfig:
+    return FaultConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        slow_rate=args.slow_rate, truncate_rate=args.truncate_rate, seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve network_cache/ as a mock citybik.es API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockCityBikesServer((args.host, args.port), NetworkStore(args.cache_dir), faults_from_args(args))
+    logging.info(f"Mock citybik.es API at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Container entry point: ``python -m app.main``.
+
+Loads the last persisted snapshot before Streamlit starts serving, so the
+first visitor after a restart is rendered from local disk instead of waiting
+for the API and a full enrichment. A stale or missing snapshot is refreshed
+in the background.
+"""
+import logging
+import os
+import sys
+import time
+
+from app.services.metrics import start_memory_tracing
+from app.services.refresher import refresh_snapshot_async, sync_shared_snapshot
+from app.services.snapshot import SNAPSHOT_DIR, get_current_snapshot, is_stale, load_snapshot, set_current_snapshot
+
+DASHBOARD_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "DashBoardUi.py")
+
+
+def boot():
+    """Loads the persisted snapshot into this process and schedules a refresh if needed."""
+    started = time.perf_counter()
+
+    # Another replica may already have published a shared snapshot
+    if sync_shared_snapshot():
+        snapshot = get_current_snapshot()
+        logging.info(f"Attached shared snapshot {snapshot['generation']} in {time.perf_counter() - started:.3f}s.")
+        if is_stale(snapshot):
+            refresh_snapshot_async()
+        return snapshot
+
+    snapshot = load_snapshot()
+
+    if snapshot is None:
+        logging.info(f"No snapshot in {SNAPSHOT_DIR}; building one in the background.")
+        refresh_snapshot_async()
+        return None
+
+    set_current_snapshot(snapshot)
+    logging.info(f"Loaded snapshot with {len(snapshot['networks'])} networks in {time.perf_counter() - started:.3f}s.")
+    if is_stale(snapshot):
+        refresh_snapshot_async()
+    return snapshot
+
+
+def main(argv=None):
+    from streamlit.web import bootstrap
+
+    # Before boot, so the snapshot load and first refresh are traced too
+    start_memory_tracing()
+    boot()
+
+    flag_options = {
+        "server_port": int(os.environ.get("PORT", 8501)),
+        "server_enableCORS": False,
+    }
+    bootstrap.load_config_options(flag_options=flag_options)
+    bootstrap.run(DASHBOARD_SCRIPT, False, list(argv if argv is not None else sys.argv[1:]), flag_options)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,258 @@
+"""
+Nightly report pack: ``python -m app.report_pack --out reports``.
+
+Writes one PDF per country, and with --networks one per network, from a
+single snapshot:
+
+    <out>/countries/<country>.pdf
+    <out>/networks/<country>/<network id>.pdf
+
+The snapshot is loaded, and its availability table and per-network station
+positions built, once in the parent before the worker pool starts; forked
+workers inherit them instead of reloading. Charts that are the same in every
+report (the global country bar chart) are rendered once and handed to the
+workers as PNG bytes, and a country's pie chart is reused by its network
+reports. Each task is one country, or one slice of a large country's
+networks, so the work spreads evenly over the workers.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app.services.availability import rank_networks, snapshot_availability
+from app.services.metrics import instrumented
+from app.services.report_builder import bar_chart_png, generate_pdf_report, pie_chart_png, static_map_png
+from app.services.snapshot import SNAPSHOT_DIR, load_snapshot
+
+# Network reports per task; larger countries are split into several tasks
+NETWORKS_PER_TASK = 25
+
+# State shared with the workers: set in the parent before forking, or by
+# _init_worker when workers are spawned
+_worker_state = {}
+
+
+def _safe_name(value) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(value)).strip("._") or "unknown"
+
+
+def shared_chart_images(snapshot: dict) -> dict:
+    """Renders the charts that appear unchanged in every report."""
+    counts = snapshot["networks"]["country"].astype(str).value_counts().head(10)
+    return {"bar": bar_chart_png(counts.rename_axis("name").reset_index(name="station_count"))}
+
+
+def _prepare(snapshot: dict) -> dict:
+    stations = snapshot.get("stations")
+    return {
+        "snapshot": snapshot,
+        "availability": snapshot_availability(snapshot) if stations is not None else None,
+        "station_positions": stations.groupby("network_id", sort=False).indices if stations is not None else {},
+    }
+
+
+def _init_worker(snapshot_path, images):
+    if "snapshot" not in _worker_state:
+        # Spawned rather than forked: nothing was inherited
+        _worker_state.update(_prepare(load_snapshot(snapshot_path)))
+    _worker_state["images"] = images
+
+
+def plan_tasks(snapshot: dict, countries=None, include_networks=False, per_task=NETWORKS_PER_TASK) -> list:
+    """
+    Splits the pack into tasks, largest countries first.
+
+    Returns:
+        list: (country, include_country_report, network ids) tuples.
+    """
+    enriched = snapshot["enriched"]
+    totals = enriched.groupby("country", observed=True)["station_count"].sum().sort_values(ascending=False)
+    if countries:
+        totals = totals[totals.index.isin(countries)]
+
+    tasks = []
+    for country in totals.index:
+        if not include_networks:
+            tasks.append((country, True, []))
+            continue
+        ids = enriched.loc[enriched["country"] == country, "id"].tolist()
+        for start in range(0, max(len(ids), 1), per_task):
+            tasks.append((country, start == 0, ids[start:start + per_task]))
+    return tasks
+
+
+def _country_report(country, country_df, availability, pie_png, out_dir) -> str:
+    top = country_df.sort_values("station_count", ascending=False, kind="stable")
+    ranked = None
+    if availability is not None:
+        ranked = rank_networks(availability, country_df, by="empty_pct", limit=10, min_stations=5)
+
+    path = os.path.join(out_dir, "countries", f"{_safe_name(country)}.pdf")
+    return generate_pdf_report(
+        country_df, country, len(country_df), int(country_df["station_count"].sum()),
+        str(top.iloc[0]["name"]), top.head(10)[["name", "station_count"]],
+        availability_df=ranked, output_path=path, title=f"City Bike Network Report: {country}",
+        map_title=f"Bike Networks in {country}",
+        chart_images=_chart_images(pie_png, static_map_png(country_df, title=f"Bike Networks in {country}")),
+    )
+
+
+def _network_report(network, country, top_networks, availability, pie_png, out_dir) -> str:
+    snapshot = _worker_state["snapshot"]
+    positions = _worker_state["station_positions"].get(network["id"])
+    if positions is not None:
+        points = snapshot["stations"].take(positions)
+    else:
+        points = network.to_frame().T
+
+    ranked = None
+    if availability is not None:
+        ranked = rank_networks(availability, network.to_frame().T, by="empty_pct", min_stations=1)
+
+    path = os.path.join(out_dir, "networks", _safe_name(country), f"{_safe_name(network['id'])}.pdf")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return generate_pdf_report(
+        points, country, 1, int(network["station_count"]), str(network["name"]), top_networks,
+        availability_df=ranked, output_path=path,
+        title=f"{network['name']} ({network['city']}, {country})", map_title="Station Map",
+        chart_images=_chart_images(pie_png, static_map_png(points, title=f"{network['name']} Stations")),
+    )
+
+
+def _pie_png(top_networks):
+    with_stations = top_networks[top_networks["station_count"] > 0]
+    if with_stations.empty:
+        return None
+    try:
+        return pie_chart_png(with_stations)
+    except Exception as e:
+        logging.warning(f"Could not render pie chart: {e}")
+        return None
+
+
+def _chart_images(pie_png, map_png) -> dict:
+    images = dict(_worker_state["images"], map=map_png)
+    if pie_png is not None:
+        images["pie"] = pie_png
+    return images
+
+
+def run_task(task, out_dir) -> tuple:
+    """
+    Writes the reports of one task.
+
+    Returns:
+        tuple: (paths written, number of reports that failed).
+    """
+    country, include_country_report, network_ids = task
+    enriched = _worker_state["snapshot"]["enriched"]
+    availability = _worker_state["availability"]
+
+    country_df = enriched[enriched["country"] == country]
+    top_networks = country_df.nlargest(10, "station_count")[["name", "station_count"]]
+    pie_png = _pie_png(top_networks)
+
+    written, failed = [], 0
+    if include_country_report:
+        try:
+            written.append(_country_report(country, country_df, availability, pie_png, out_dir))
+        except Exception as e:
+            logging.error(f"Report for country {country} failed: {e}")
+            failed += 1
+
+    by_id = country_df.set_index("id", drop=False)
+    for network_id in network_ids:
+        try:
+            written.append(_network_report(by_id.loc[network_id], country, top_networks, availability,
+                                           pie_png, out_dir))
+        except Exception as e:
+            logging.error(f"Report for network {network_id} failed: {e}")
+            failed += 1
+    return written, failed
+
+
+def _pool_context():
+    # fork lets the workers share the parent's loaded snapshot copy-on-write
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+@instrumented("report_pack")
+def run_report_pack(out_dir, snapshot=None, snapshot_path=SNAPSHOT_DIR, countries=None,
+                    include_networks=False, workers=None) -> dict:
+    """
+    Generates the report pack into out_dir.
+
+    Args:
+        out_dir (str): Destination directory.
+        snapshot (dict): Snapshot to report on; loaded from snapshot_path if omitted.
+        countries (list): Only these country codes; all countries if omitted.
+        include_networks (bool): Also write one report per network.
+        workers (int): Worker processes; defaults to the CPU count. 1 runs in-process.
+
+    Returns:
+        dict: {"reports": paths written, "failed": count, "seconds": elapsed}.
+    """
+    started = time.perf_counter()
+    if snapshot is None:
+        snapshot = load_snapshot(snapshot_path)
+    if snapshot is None:
+        raise RuntimeError(f"No snapshot in {snapshot_path}; run the dashboard or app.main once first")
+
+    os.makedirs(os.path.join(out_dir, "countries"), exist_ok=True)
+    tasks = plan_tasks(snapshot, countries, include_networks)
+    _worker_state.update(_prepare(snapshot))
+    images = shared_chart_images(snapshot)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+
+    reports, failed = [], 0
+    try:
+        if workers == 1:
+            _init_worker(snapshot_path, images)
+            for task in tasks:
+                written, task_failed = run_task(task, out_dir)
+                reports.extend(written)
+                failed += task_failed
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(),
+                                     initializer=_init_worker, initargs=(snapshot_path, images)) as pool:
+                futures = {pool.submit(run_task, task, out_dir): task for task in tasks}
+                for future in as_completed(futures):
+                    try:
+                        written, task_failed = future.result()
+                    except Exception as e:
+                        country, _, network_ids = futures[future]
+                        logging.error(f"Report task for {country} failed: {e}")
+                        written, task_failed = [], int(futures[future][1]) + len(network_ids)
+                    reports.extend(written)
+                    failed += task_failed
+    finally:
+        _worker_state.clear()
+
+    return {"reports": sorted(reports), "failed": failed, "seconds": time.perf_counter() - started}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate per-country (and per-network) PDF reports.")
+    parser.add_argument("--out", default="reports", help="Output directory")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--countries", nargs="*", help="Country codes to report on (default: all)")
+    parser.add_argument("--networks", action="store_true", help="Also write one report per network")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    result = run_report_pack(args.out, snapshot_path=args.snapshot_dir, countries=args.countries,
+                             include_networks=args.networks, workers=args.workers)
+    print(f"Wrote {len(result['reports'])} reports to {args.out} in {result['seconds']:.1f}s "
+          f"({result['failed']} failed)")
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
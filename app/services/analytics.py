@@ -1,14 +1,15 @@
-import plotly.express as px
 import pandas as pd
-import streamlit as st
 
 from app.services.fetcher import fetch_network_details
+from app.services.metrics import instrumented
 
 
 
 
 
 def plot_station_counts(df):
+    import plotly.express as px
+
     if df.empty or 'station_count' not in df.columns:
         return None
 
@@ -32,7 +33,7 @@ def plot_station_counts(df):
     )
 
 def summary_by_country(df):
-    return df.groupby("country")["station_count"].agg(["mean", "max", "count"]).reset_index()
+    return df.groupby("country", observed=True)["station_count"].agg(["mean", "max", "count"]).reset_index()
 
 def get_top_country(df):
     if "country" not in df.columns:
@@ -42,7 +43,7 @@ def get_top_country(df):
         print("DataFrame is empty.")
         return pd.DataFrame(columns=["country", "station_count"])
 
-    country_df = df.groupby("country")["station_count"].sum().reset_index()
+    country_df = df.groupby("country", observed=True)["station_count"].sum().reset_index()
     return country_df.sort_values(by="station_count", ascending=False).head(5)
 
 def get_top_network(df):
@@ -51,6 +52,14 @@ def get_top_network(df):
         return f"{max_row['name']} ({max_row['station_count']} stations)"
     return "N/A"
 
+def get_top_10_networks_from_enriched(enriched_df) -> list:
+    """Same result as get_top_10_networks_by_station_count, read from an enriched frame."""
+    if enriched_df.empty or "station_count" not in enriched_df.columns:
+        return []
+    top = enriched_df.nlargest(10, "station_count")
+    return [{"name": name, "station_count": int(count)} for name, count in zip(top["name"], top["station_count"])]
+
+@instrumented("get_top_10_networks_by_station_count")
 def get_top_10_networks_by_station_count(networks: list) -> list:
     top_networks = []
 
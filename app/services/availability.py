@@ -0,0 +1,162 @@
+"""
+Station availability metrics per network.
+
+A station is
+    offline  when it reports neither bikes nor empty docks,
+    empty    when it is online but has no bikes,
+    full     when it is online but has no empty docks.
+
+Docks are the reported slot count, or bikes + empty docks where that is
+larger or no slot count is given. Everything is computed in one pass over the
+columnar station table (see station_store) with np.bincount over the
+network codes, so the cost is linear in stations and independent of the
+number of networks.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.services.memory_governor import governed_cache
+from app.services.metrics import instrumented
+from app.services.snapshot import derived_table, get_current_snapshot
+from app.services.station_store import load_station_table
+
+AVAILABILITY_COLUMNS = [
+    "network_id", "stations", "free_bikes", "empty_slots", "docks",
+    "empty_stations", "full_stations", "offline_stations",
+    "empty_pct", "full_pct", "offline_pct", "bike_dock_ratio",
+]
+
+# Label shown in the UI -> column ranked by
+RANKING_METRICS = {
+    "Empty Stations %": "empty_pct",
+    "Full Stations %": "full_pct",
+    "Offline Stations %": "offline_pct",
+    "Bike-to-Dock Ratio": "bike_dock_ratio",
+}
+
+
+def _percent(part, whole):
+    return np.divide(part * 100.0, whole, out=np.zeros(len(whole)), where=whole > 0)
+
+
+@instrumented("availability_by_network")
+def availability_by_network(stations: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes availability metrics for every network in a station table.
+
+    Args:
+        stations (pd.DataFrame): Columnar station table with network_id,
+            free_bikes, empty_slots and slots.
+
+    Returns:
+        pd.DataFrame: One row per network with AVAILABILITY_COLUMNS.
+    """
+    if stations is None or stations.empty:
+        return pd.DataFrame(columns=AVAILABILITY_COLUMNS)
+
+    codes, network_ids = pd.factorize(stations["network_id"], sort=False)
+    n = len(network_ids)
+
+    bikes = stations["free_bikes"].to_numpy(dtype=np.int64)
+    empties = stations["empty_slots"].to_numpy(dtype=np.int64)
+    docks = np.maximum(stations["slots"].to_numpy(dtype=np.int64), bikes + empties)
+
+    offline = (bikes + empties) == 0
+    empty = ~offline & (bikes == 0)
+    full = ~offline & (empties == 0)
+
+    def total(weights=None):
+        return np.bincount(codes, weights=weights, minlength=n).astype(np.int64)
+
+    station_counts = total()
+    bike_totals = total(bikes)
+    dock_totals = total(docks)
+
+    result = pd.DataFrame({
+        "network_id": np.asarray(network_ids, dtype=object),
+        "stations": station_counts,
+        "free_bikes": bike_totals,
+        "empty_slots": total(empties),
+        "docks": dock_totals,
+        "empty_stations": total(empty),
+        "full_stations": total(full),
+        "offline_stations": total(offline),
+    })
+    result["empty_pct"] = _percent(result["empty_stations"].to_numpy(), station_counts)
+    result["full_pct"] = _percent(result["full_stations"].to_numpy(), station_counts)
+    result["offline_pct"] = _percent(result["offline_stations"].to_numpy(), station_counts)
+    result["bike_dock_ratio"] = np.divide(
+        bike_totals, dock_totals, out=np.zeros(n), where=dock_totals > 0
+    )
+    return result[AVAILABILITY_COLUMNS]
+
+
+def overall_availability(availability: pd.DataFrame) -> dict:
+    """Rolls the per-network table up to network-wide totals and percentages."""
+    stations = int(availability["stations"].sum()) if not availability.empty else 0
+    docks = int(availability["docks"].sum()) if not availability.empty else 0
+
+    def pct(column):
+        return float(availability[column].sum() * 100.0 / stations) if stations else 0.0
+
+    return {
+        "stations": stations,
+        "empty_pct": pct("empty_stations"),
+        "full_pct": pct("full_stations"),
+        "offline_pct": pct("offline_stations"),
+        "bike_dock_ratio": float(availability["free_bikes"].sum() / docks) if docks else 0.0,
+    }
+
+
+def rank_networks(availability: pd.DataFrame, networks_df: pd.DataFrame, by="empty_pct",
+                  ascending=False, limit=None, min_stations=1) -> pd.DataFrame:
+    """
+    Ranks networks by one availability metric.
+
+    Args:
+        availability (pd.DataFrame): Output of availability_by_network.
+        networks_df (pd.DataFrame): Processed networks (id, name, city, country),
+            used both for display names and to restrict the ranking.
+        by (str): Column to rank by, e.g. one of RANKING_METRICS' values.
+        ascending (bool): Rank lowest first.
+        limit (int): Keep only the first rows.
+        min_stations (int): Skip networks with fewer stations than this.
+
+    Returns:
+        pd.DataFrame: Ranked rows with name, city and country added.
+    """
+    if by not in AVAILABILITY_COLUMNS:
+        raise ValueError(f"Unknown availability metric: {by}")
+
+    info = networks_df[["id", "name", "city", "country"]].drop_duplicates("id")
+    ranked = availability.merge(info, left_on="network_id", right_on="id", how="inner").drop(columns="id")
+    ranked = ranked[ranked["stations"] >= min_stations]
+    ranked = ranked.sort_values([by, "stations"], ascending=[ascending, False], kind="stable")
+    if limit is not None:
+        ranked = ranked.head(limit)
+    return ranked.reset_index(drop=True)
+
+
+@governed_cache("live_availability", max_entries=8)
+@st.cache_data(max_entries=8)
+def _live_availability(network_ids: tuple) -> pd.DataFrame:
+    return availability_by_network(load_station_table(network_ids))
+
+
+def snapshot_availability(snapshot: dict) -> pd.DataFrame:
+    """Availability metrics for a snapshot's stations, computed once per snapshot."""
+    return derived_table(snapshot, "availability", lambda: availability_by_network(snapshot["stations"]))
+
+
+def load_availability(network_ids) -> pd.DataFrame:
+    """
+    Returns availability metrics for every network.
+
+    Computed once per snapshot and kept with it; before the first snapshot
+    exists the station table is built from the network details instead.
+    """
+    snapshot = get_current_snapshot()
+    if snapshot is not None and snapshot.get("stations") is not None:
+        return snapshot_availability(snapshot)
+    return _live_availability(tuple(network_ids))
@@ -0,0 +1,113 @@
+"""
+Crash-safe cache files.
+
+Every write goes to a unique temp file in the target directory, is fsynced
+and then renamed over the destination, so readers see either the old or the
+new file and concurrent writers never interleave.
+
+Cache entries are stored as one header line followed by the payload:
+
+    citybike-cache v1 <codec> <blake2b hex digest of the payload>\n<payload>
+
+where the payload is JSON, optionally gzip- or zstd-compressed. A truncated
+or corrupted entry fails its checksum and is treated as a cache miss.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+MAGIC = b"citybike-cache"
+FORMAT_VERSION = b"v1"
+CODECS = ("none", "gzip", "zstd")
+
+
+class CacheIntegrityError(ValueError):
+    """Raised when a cache entry is truncated, corrupted or in an unknown format."""
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """Writes data to path via a temp file in the same directory and an atomic rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def resolve_codec(codec: str) -> str:
+    """Returns the codec to write with, falling back to gzip when zstandard is not installed."""
+    codec = (codec or "none").lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unknown cache codec: {codec}")
+    if codec == "zstd" and zstandard is None:
+        return "gzip"
+    return codec
+
+
+def _checksum(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16).hexdigest().encode("ascii")
+
+
+def encode_entry(obj, codec="none") -> bytes:
+    """Serializes obj as a checksummed cache entry."""
+    codec = resolve_codec(codec)
+    payload = json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    if codec == "gzip":
+        payload = gzip.compress(payload, compresslevel=6)
+    elif codec == "zstd":
+        payload = zstandard.ZstdCompressor(level=6, write_checksum=True).compress(payload)
+    header = b" ".join([MAGIC, FORMAT_VERSION, codec.encode("ascii"), _checksum(payload)])
+    return header + b"\n" + payload
+
+
+def decode_entry(data: bytes):
+    """
+    Parses a cache entry, verifying its checksum.
+
+    Raises:
+        CacheIntegrityError: If the entry is damaged or not a cache entry.
+    """
+    header, sep, payload = data.partition(b"\n")
+    parts = header.split(b" ")
+    if not sep or len(parts) != 4 or parts[0] != MAGIC or parts[1] != FORMAT_VERSION:
+        raise CacheIntegrityError("not a cache entry")
+
+    codec, checksum = parts[2].decode("ascii"), parts[3]
+    if _checksum(payload) != checksum:
+        raise CacheIntegrityError("checksum mismatch (truncated or corrupted entry)")
+
+    if codec == "gzip":
+        payload = gzip.decompress(payload)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise CacheIntegrityError("entry is zstd-compressed but zstandard is not installed")
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec != "none":
+        raise CacheIntegrityError(f"unknown codec {codec}")
+    return json.loads(payload)
+
+
+def write_cache_entry(path: str, obj, codec="none"):
+    atomic_write_bytes(path, encode_entry(obj, codec))
+
+
+def read_cache_entry(path: str):
+    with open(path, "rb") as f:
+        return decode_entry(f.read())
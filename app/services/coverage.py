@@ -0,0 +1,274 @@
+"""
+Walking-distance coverage and station spacing per city.
+
+Built once per snapshot from the station coordinates (see
+snapshot.derived_table) and kept with it:
+
+    stations  one row per station of the snapshot's station table, in the
+              same order: distance to the nearest other station of the
+              same city, stations within COVERAGE_RADIUS_M and a density
+              class ("dense", "isolated" or "regular")
+    cities    one row per (country, city): the share of the stations'
+              extent within COVERAGE_RADIUS_M of a station, mean and median
+              nearest-neighbor spacing, and dense / isolated station counts
+
+Distances are great-circle (haversine) distances. Nearest neighbors are
+found by an all-pairs scan within each city, in chunks of at most
+PAIR_CHUNK distances; the haversine term is computed from unit vectors
+(a = |p - q|^2 / 4), which needs no trigonometry per pair. Coverage is
+measured on a CELL_SIZE_M grid laid over each city's stations: a cell is
+covered if its center lies within COVERAGE_RADIUS_M of a station.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.services.memory_governor import governed_cache
+from app.services.metrics import instrumented
+from app.services.refresher import add_refresh_listener
+from app.services.snapshot import derived_table, get_current_snapshot
+from app.services.station_store import load_station_table
+
+EARTH_RADIUS_M = 6_371_008.8
+METERS_PER_DEGREE = np.pi * EARTH_RADIUS_M / 180
+
+# Walking distance a station is considered to serve
+COVERAGE_RADIUS_M = 300.0
+
+CELL_SIZE_M = 50.0
+
+# Stations with at least this many others within COVERAGE_RADIUS_M are "dense"
+DENSE_NEIGHBORS = 5
+
+# Stations whose nearest neighbor is further than this are "isolated": their service areas do not touch
+ISOLATED_DISTANCE_M = 2 * COVERAGE_RADIUS_M
+
+# Pairwise distances evaluated per chunk (8 bytes each, a few temporaries per chunk)
+PAIR_CHUNK = 2_000_000
+
+# Cities with fewer located stations get no coverage share: their extent is not an area
+MIN_COVERAGE_STATIONS = 3
+
+# Extent trimmed to these coordinate quantiles in larger cities, so one misplaced station does not inflate it
+EXTENT_QUANTILES = (0.01, 0.99)
+TRIM_EXTENT_STATIONS = 100
+
+CITY_COLUMNS = [
+    "country", "city", "networks", "stations", "area_km2", "covered_km2", "coverage_pct",
+    "mean_spacing_m", "median_spacing_m", "dense_stations", "isolated_stations",
+]
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters between coordinates in degrees; broadcasts like numpy."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _unit_vectors(latitude, longitude) -> np.ndarray:
+    lat = np.radians(np.asarray(latitude, dtype=np.float64))
+    lon = np.radians(np.asarray(longitude, dtype=np.float64))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _haversine_term(meters):
+    # a = sin^2(d / 2R), the quantity the chord form yields directly
+    return np.sin(np.asarray(meters, dtype=np.float64) / (2 * EARTH_RADIUS_M)) ** 2
+
+
+def nearest_neighbors(latitude, longitude, radius_m=COVERAGE_RADIUS_M, chunk=PAIR_CHUNK):
+    """
+    Distance to the nearest other point and the count of others within radius_m.
+
+    Scans all pairs, chunk distances at a time, so it suits one city's
+    stations rather than the whole world at once.
+
+    Returns:
+        tuple: (nearest distance in meters, NaN for a lone point; neighbor counts).
+    """
+    points = _unit_vectors(latitude, longitude)
+    n = len(points)
+    nearest = np.full(n, np.nan)
+    neighbors = np.zeros(n, dtype=np.int32)
+    if n < 2:
+        return nearest, neighbors
+
+    limit = 4 * _haversine_term(radius_m)  # compared against squared chords
+    rows = max(1, chunk // n)
+    for start in range(0, n, rows):
+        block = points[start:start + rows]
+        chord2 = np.zeros((len(block), n))
+        for axis in range(3):
+            diff = block[:, axis, None] - points[None, :, axis]
+            chord2 += diff * diff
+        chord2[np.arange(len(block)), np.arange(start, start + len(block))] = np.inf  # not its own neighbor
+
+        neighbors[start:start + rows] = np.count_nonzero(chord2 <= limit, axis=1)
+        a = np.minimum(chord2.min(axis=1) / 4, 1.0)
+        nearest[start:start + rows] = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+    return nearest, neighbors
+
+
+def _disk_offsets(radius_m, cell_m):
+    # Cell offsets that can hold a covered center, whatever the station's position within its cell
+    reach = int(np.ceil(radius_m / cell_m)) + 1
+    dy, dx = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+    near = (np.maximum(np.abs(dx) - 1, 0) ** 2 + np.maximum(np.abs(dy) - 1, 0) ** 2) * cell_m ** 2 <= radius_m ** 2
+    return dx[near].ravel(), dy[near].ravel()
+
+
+def grid_coverage(latitude, longitude, radius_m=COVERAGE_RADIUS_M, cell_m=CELL_SIZE_M, chunk=PAIR_CHUNK):
+    """
+    Area of the points' extent and the part of it within radius_m of a point.
+
+    The extent is the bounding box of the points in a local equirectangular
+    projection (trimmed to EXTENT_QUANTILES for larger sets), divided into
+    cell_m cells; a cell counts as covered if its center is within radius_m
+    of any point.
+
+    Returns:
+        tuple: (extent area in km2, covered area in km2).
+    """
+    lat = np.asarray(latitude, dtype=np.float64)
+    lon = np.asarray(longitude, dtype=np.float64)
+    if len(lat) == 0:
+        return 0.0, 0.0
+
+    y = lat * METERS_PER_DEGREE
+    x = lon * METERS_PER_DEGREE * np.cos(np.radians(lat.mean()))
+    if len(lat) >= TRIM_EXTENT_STATIONS:
+        (x0, x1), (y0, y1) = np.quantile(x, EXTENT_QUANTILES), np.quantile(y, EXTENT_QUANTILES)
+    else:
+        x0, x1, y0, y1 = x.min(), x.max(), y.min(), y.max()
+    nx = int((x1 - x0) // cell_m) + 1
+    ny = int((y1 - y0) // cell_m) + 1
+
+    x, y = x - x0, y - y0
+    col, row = np.floor(x / cell_m).astype(np.int64), np.floor(y / cell_m).astype(np.int64)
+    dx, dy = _disk_offsets(radius_m, cell_m)
+
+    covered = []
+    rows = max(1, chunk // len(dx))
+    for start in range(0, len(x), rows):
+        cx = col[start:start + rows, None] + dx
+        cy = row[start:start + rows, None] + dy
+        ex = (cx + 0.5) * cell_m - x[start:start + rows, None]
+        ey = (cy + 0.5) * cell_m - y[start:start + rows, None]
+        inside = (ex * ex + ey * ey <= radius_m ** 2) & (cx >= 0) & (cx < nx) & (cy >= 0) & (cy < ny)
+        covered.append(cy[inside] * nx + cx[inside])
+
+    cell_km2 = cell_m * cell_m / 1e6
+    return nx * ny * cell_km2, len(np.unique(np.concatenate(covered))) * cell_km2
+
+
+def _density(nearest, neighbors) -> pd.Categorical:
+    labels = np.full(len(nearest), "regular", dtype=object)
+    labels[neighbors >= DENSE_NEIGHBORS] = "dense"
+    labels[~(nearest <= ISOLATED_DISTANCE_M)] = "isolated"  # includes a city's only station
+    return pd.Categorical(labels, categories=["dense", "regular", "isolated"])
+
+
+@instrumented("build_coverage")
+def build_coverage(stations: pd.DataFrame, networks_df: pd.DataFrame) -> dict:
+    """
+    Computes station spacing and coverage for every city.
+
+    Stations are grouped by their network's (country, city), so networks
+    sharing a city are measured together. Stations without coordinates, or
+    of networks missing from networks_df, get NaN distances and no class.
+
+    Returns:
+        dict: {"stations": DataFrame aligned with stations, "cities": DataFrame}.
+    """
+    n = len(stations)
+    nearest = np.full(n, np.nan)
+    neighbors = np.zeros(n, dtype=np.int32)
+
+    info = networks_df.drop_duplicates("id").set_index("id")[["country", "city"]].astype(object)
+    network_ids = stations["network_id"].astype(object).to_numpy()
+    place = info.reindex(network_ids)
+    lat = stations["latitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+    lon = stations["longitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+    located = np.isfinite(lat) & np.isfinite(lon) & place["country"].notna().to_numpy()
+
+    keys = pd.MultiIndex.from_arrays([place["country"].fillna(""), place["city"].fillna("")])
+    city_codes, cities = pd.factorize(keys)
+    city_codes = np.where(located, city_codes, -1)
+
+    # Stations sorted by city, so each city's rows are one contiguous slice
+    order = np.argsort(city_codes, kind="stable")
+    order = order[city_codes[order] >= 0]
+    bounds = np.flatnonzero(np.diff(city_codes[order])) + 1
+
+    rows = []
+    for members in np.split(order, bounds) if len(order) else []:
+        city_lat, city_lon = lat[members], lon[members]
+        nearest[members], neighbors[members] = nearest_neighbors(city_lat, city_lon)
+        if len(members) >= MIN_COVERAGE_STATIONS:
+            area, covered = grid_coverage(city_lat, city_lon)
+        else:
+            area = covered = np.nan
+        country, city = cities[city_codes[members[0]]]
+        spacing = nearest[members]
+        rows.append({
+            "country": country,
+            "city": city,
+            "networks": len(pd.unique(network_ids[members])),
+            "stations": len(members),
+            "area_km2": area,
+            "covered_km2": covered,
+            "coverage_pct": covered / area * 100 if area > 0 else np.nan,
+            "mean_spacing_m": np.nanmean(spacing) if len(members) > 1 else np.nan,
+            "median_spacing_m": np.nanmedian(spacing) if len(members) > 1 else np.nan,
+        })
+
+    density = _density(nearest, neighbors)
+    density[~located] = np.nan
+    station_table = pd.DataFrame(
+        {"nearest_m": nearest.astype(np.float32), "neighbors": neighbors, "density": density},
+        index=stations.index,
+    )
+
+    city_table = pd.DataFrame(rows, columns=CITY_COLUMNS[:-2])
+    if not city_table.empty:
+        counted = pd.DataFrame({"city": city_codes[order], "density": density[order]})
+        counts = pd.crosstab(counted["city"], counted["density"]).reindex(columns=["dense", "isolated"], fill_value=0)
+        city_table["dense_stations"] = counts["dense"].to_numpy()
+        city_table["isolated_stations"] = counts["isolated"].to_numpy()
+    else:
+        city_table = pd.DataFrame(columns=CITY_COLUMNS)
+    city_table = city_table.sort_values("stations", ascending=False, kind="stable").reset_index(drop=True)
+    return {"stations": station_table, "cities": city_table[CITY_COLUMNS]}
+
+
+def snapshot_coverage(snapshot: dict) -> dict:
+    """Coverage for a snapshot, built once and kept with it."""
+    return derived_table(snapshot, "coverage", lambda: build_coverage(snapshot["stations"], snapshot["networks"]))
+
+
+def _precompute_coverage(snapshot, changed, removed):
+    # Runs on the refresh thread, so the first rerun after a swap finds it ready
+    if snapshot.get("stations") is not None:
+        snapshot_coverage(snapshot)
+
+
+add_refresh_listener(_precompute_coverage)
+
+
+@governed_cache("live_coverage", max_entries=4)
+@st.cache_data(max_entries=4)
+def _live_coverage(network_ids: tuple, networks_df: pd.DataFrame) -> dict:
+    return build_coverage(load_station_table(network_ids), networks_df)
+
+
+def load_coverage(networks_df: pd.DataFrame) -> dict:
+    """
+    Returns the coverage tables for the current snapshot.
+
+    Before the first snapshot exists they are built from the network details.
+    """
+    snapshot = get_current_snapshot()
+    if snapshot is not None and snapshot.get("stations") is not None:
+        return snapshot_coverage(snapshot)
+    return _live_coverage(tuple(networks_df["id"]), networks_df)
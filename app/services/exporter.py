@@ -0,0 +1,121 @@
+import csv
+import gzip
+import io
+import itertools
+import tempfile
+
+import pandas as pd
+
+from app.services.station_store import filter_positions
+
+EXPORT_CHUNK_ROWS = 50_000
+
+# Exports stay in memory up to this size and spill to a temp file beyond it
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+EXPORT_MIME_TYPES = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def iter_export_chunks(table: pd.DataFrame, filters=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Yields the filtered rows of a table in fixed-size chunks.
+
+    Only the matching row positions are computed up front; each chunk is taken
+    from the table when it is requested.
+    """
+    positions = filter_positions(table, filters)
+    for start in range(0, len(positions), chunk_rows):
+        yield table.take(positions[start:start + chunk_rows])
+
+
+def write_csv(table: pd.DataFrame, out, filters=None, compress=False, chunk_rows=EXPORT_CHUNK_ROWS) -> int:
+    """
+    Streams the filtered rows of a table into a binary file object as CSV.
+
+    Args:
+        table (pd.DataFrame): Network or station table to export.
+        out (BinaryIO): Destination opened in binary mode.
+        filters (list): (column, operator, value) tuples.
+        compress (bool): Gzip the output.
+        chunk_rows (int): Rows serialized per chunk.
+
+    Returns:
+        int: Number of rows written.
+    """
+    raw = gzip.GzipFile(fileobj=out, mode="wb") if compress else out
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    rows = 0
+    try:
+        csv.writer(text).writerow(table.columns)
+        for chunk in iter_export_chunks(table, filters, chunk_rows):
+            chunk.to_csv(text, header=False, index=False)
+            rows += len(chunk)
+        text.flush()
+    finally:
+        text.detach()
+        if compress:
+            raw.close()
+    return rows
+
+
+def write_parquet(table: pd.DataFrame, out, filters=None, compress=False, chunk_rows=EXPORT_CHUNK_ROWS) -> int:
+    """
+    Streams the filtered rows of a table into a binary file object as Parquet.
+
+    Each chunk becomes one row group, so the whole result is never held as a
+    single Arrow table.
+
+    Returns:
+        int: Number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Types come from the first chunk: an empty object column would be typed as null
+    chunks = iter_export_chunks(table, filters, chunk_rows)
+    first = next(chunks, table.iloc[:0])
+    schema = pa.Schema.from_pandas(first, preserve_index=False)
+    rows = 0
+    with pq.ParquetWriter(out, schema, compression="gzip" if compress else "snappy") as writer:
+        for chunk in itertools.chain([first], chunks):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+def export_table(table: pd.DataFrame, fmt="csv", filters=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Exports a table into a spooled temporary file.
+
+    Args:
+        fmt (str): One of "csv", "csv.gz" or "parquet".
+
+    Returns:
+        SpooledTemporaryFile: The export, rewound to the start.
+    """
+    if fmt not in EXPORT_MIME_TYPES:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    if fmt == "parquet":
+        write_parquet(table, out, filters, chunk_rows=chunk_rows)
+    else:
+        write_csv(table, out, filters, compress=fmt == "csv.gz", chunk_rows=chunk_rows)
+    out.seek(0)
+    return out
+
+
+def lazy_export(table: pd.DataFrame, fmt="csv", filters=None):
+    """
+    Returns a zero-argument callable that builds the export on demand.
+
+    Pass the result as ``data`` to ``st.download_button`` so nothing is
+    serialized until the user actually clicks download.
+    """
+    def _build():
+        return export_table(table, fmt, filters)
+    return _build
@@ -0,0 +1,186 @@
+"""
+Feed health: which networks' feeds stopped updating or report nothing.
+
+Built once per snapshot in one vectorized pass over the station table (see
+snapshot.derived_table):
+
+    stations  one flag per station of the snapshot's station table: its
+              timestamp is older than STALE_AFTER_SECONDS, or missing
+    networks  one row per network with stations: its newest station
+              timestamp, that update's age, the count of stale stations
+              and a status: "stale" when even the newest station is older
+              than STALE_AFTER_SECONDS, "no_availability" when no station
+              reports a bike or a free dock, "ok" otherwise
+
+Ages are measured against the newest timestamp in the snapshot rather than
+the wall clock, so a snapshot loaded from disk or served by the mock API is
+judged against its own time, and a live feed is one that keeps up with the
+others.
+
+Unhealthy networks are left out of the rankings, and the refresher only
+refetches them every DEAD_FEED_RECHECK_SECONDS (see deferred_feeds).
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.services.memory_governor import governed_cache
+from app.services.metrics import instrumented, set_gauge
+from app.services.refresher import add_refresh_listener
+from app.services.snapshot import derived_table, get_current_snapshot
+from app.services.station_store import load_station_table
+
+STALE_AFTER_SECONDS = float(os.environ.get("FEED_STALE_AFTER", 3 * 3600))
+
+# Unhealthy feeds are refetched at most this often; in between the cached payload is reused
+DEAD_FEED_RECHECK_SECONDS = float(os.environ.get("DEAD_FEED_RECHECK", 6 * 3600))
+
+STATUSES = ["ok", "no_availability", "stale"]
+NETWORK_COLUMNS = ["network_id", "stations", "stale_stations", "last_update", "age_seconds", "status"]
+
+
+def parse_timestamps(values) -> pd.Series:
+    """
+    Parses station timestamps to UTC datetimes; missing or malformed ones become NaT.
+
+    The API writes both "...+00:00" and "...+00:00Z"; the doubled zone is
+    normalized before parsing.
+    """
+    text = pd.Series(values, dtype="object").astype("str")
+    text = text.str.replace(r"(?:[+-]00:00)?Z$", "+00:00", regex=True)
+    return pd.to_datetime(text, utc=True, format="ISO8601", errors="coerce")
+
+
+@instrumented("build_feed_health")
+def build_feed_health(stations: pd.DataFrame, stale_after=STALE_AFTER_SECONDS, reference=None) -> dict:
+    """
+    Flags stale stations and stale or empty networks.
+
+    Args:
+        stations (pd.DataFrame): Station table with network_id, timestamp, free_bikes and empty_slots.
+        stale_after (float): Age in seconds beyond which a timestamp is stale.
+        reference (pd.Timestamp | None): Time ages are measured from; the newest timestamp by default.
+
+    Returns:
+        dict: {"stations": bool Series aligned with stations, "networks": DataFrame, "reference": Timestamp}.
+    """
+    stamps = parse_timestamps(stations["timestamp"].to_numpy(dtype=object))
+    nanos = stamps.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    known = ~np.isnat(stamps.to_numpy(dtype="datetime64[ns]"))
+
+    if reference is None:
+        reference = stamps.max() if known.any() else pd.Timestamp.now(tz="UTC")
+    reference = pd.Timestamp(reference)
+    reference = reference.tz_localize("UTC") if reference.tzinfo is None else reference.tz_convert("UTC")
+    cutoff = reference.value - int(stale_after * 1e9)
+    stale = ~known | (nanos < cutoff)
+
+    codes, network_ids = pd.factorize(stations["network_id"].astype(object), use_na_sentinel=True)
+    counted = codes >= 0
+    codes, n = codes[counted], len(network_ids)
+
+    # Newest update per network; the int64 minimum is NaT, left where a network has no timestamps
+    newest = np.full(n, np.iinfo(np.int64).min)
+    np.maximum.at(newest, codes[known[counted]], nanos[counted][known[counted]])
+    has_update = newest > np.iinfo(np.int64).min
+    bikes = np.bincount(codes, weights=stations["free_bikes"].to_numpy(dtype=np.int64)[counted], minlength=n)
+    docks = np.bincount(codes, weights=stations["empty_slots"].to_numpy(dtype=np.int64)[counted], minlength=n)
+
+    status = np.where(~has_update | (newest < cutoff), "stale", np.where(bikes + docks == 0, "no_availability", "ok"))
+    networks = pd.DataFrame({
+        "network_id": np.asarray(network_ids, dtype=object),
+        "stations": np.bincount(codes, minlength=n),
+        "stale_stations": np.bincount(codes, weights=stale[counted], minlength=n).astype(np.int64),
+        "last_update": pd.to_datetime(newest.view("datetime64[ns]"), utc=True),
+        "age_seconds": np.where(has_update, (reference.value - newest) / 1e9, np.nan),
+        "status": pd.Categorical(status, categories=STATUSES),
+    }, columns=NETWORK_COLUMNS)
+    networks = networks.sort_values(["status", "age_seconds"], ascending=[False, False], kind="stable")
+
+    return {
+        "stations": pd.Series(stale, index=stations.index, name="stale"),
+        "networks": networks.reset_index(drop=True),
+        "reference": reference,
+    }
+
+
+def health_summary(health: dict) -> dict:
+    """Counts for the metric cards and the report."""
+    status = health["networks"]["status"].value_counts().reindex(STATUSES, fill_value=0)
+    return {
+        "networks": int(len(health["networks"])),
+        "live_networks": int(status["ok"]),
+        "stale_networks": int(status["stale"]),
+        "no_availability_networks": int(status["no_availability"]),
+        "stations": int(len(health["stations"])),
+        "stale_stations": int(health["stations"].sum()),
+    }
+
+
+def unhealthy_network_ids(health: dict) -> set:
+    """Networks whose feed is stale or reports no availability."""
+    networks = health["networks"]
+    return set(networks.loc[networks["status"] != "ok", "network_id"])
+
+
+def report_health(health: dict):
+    """Publishes the network and station counts per status as gauges."""
+    summary = health_summary(health)
+    set_gauge("feed_networks", summary["live_networks"], status="ok")
+    set_gauge("feed_networks", summary["stale_networks"], status="stale")
+    set_gauge("feed_networks", summary["no_availability_networks"], status="no_availability")
+    set_gauge("stale_stations", summary["stale_stations"])
+
+
+def snapshot_health(snapshot: dict) -> dict:
+    """Feed health for a snapshot, built once and kept with it."""
+    return derived_table(snapshot, "feed_health", lambda: build_feed_health(snapshot["stations"]))
+
+
+def deferred_feeds(snapshot, last_fetched: dict, now=None) -> set:
+    """
+    Unhealthy networks of snapshot that were fetched from the API within DEAD_FEED_RECHECK_SECONDS.
+
+    The refresher serves these from the cache instead of refetching them.
+
+    Args:
+        snapshot (dict | None): The snapshot being replaced.
+        last_fetched (dict): network_id -> time.monotonic() of its last API fetch.
+    """
+    if snapshot is None or snapshot.get("stations") is None:
+        return set()
+    now = time.monotonic() if now is None else now
+    return {
+        network_id for network_id in unhealthy_network_ids(snapshot_health(snapshot))
+        if now - last_fetched.get(network_id, -np.inf) < DEAD_FEED_RECHECK_SECONDS
+    }
+
+
+def _precompute_health(snapshot, changed, removed):
+    # Runs on the refresh thread: the gauges follow every swap
+    if snapshot.get("stations") is not None:
+        report_health(snapshot_health(snapshot))
+
+
+add_refresh_listener(_precompute_health)
+
+
+@governed_cache("live_feed_health", max_entries=4)
+@st.cache_data(max_entries=4)
+def _live_health(network_ids: tuple) -> dict:
+    return build_feed_health(load_station_table(network_ids))
+
+
+def load_feed_health(network_ids) -> dict:
+    """
+    Returns feed health for the current snapshot.
+
+    Before the first snapshot exists it is built from the network details.
+    """
+    snapshot = get_current_snapshot()
+    if snapshot is not None and snapshot.get("stations") is not None:
+        return snapshot_health(snapshot)
+    return _live_health(tuple(network_ids))
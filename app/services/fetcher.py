@@ -3,68 +3,194 @@ import logging
 import time
 import json
 import os
+import hashlib
 
-BASE_URL = "http://api.citybik.es/v2/networks"
+from app.services.cache_io import CacheIntegrityError, read_cache_entry, write_cache_entry
+from app.services.memory_governor import GovernedCache
+from app.services.metrics import inc, instrumented, timed
+from app.services.singleflight import SingleFlight
+
+# Point at a mirror or a local mock server with CITYBIKES_BASE_URL
+BASE_URL = os.environ.get("CITYBIKES_BASE_URL", "http://api.citybik.es/v2/networks").rstrip("/")
+REQUEST_TIMEOUT = float(os.environ.get("CITYBIKES_TIMEOUT", 10))
 MAX_RETRIES = 5
 BACKOFF_FACTOR = 1.5
+# Longer Retry-After values are ignored in favour of the backoff, so a 429 cannot stall a thread for long
+MAX_RETRY_AFTER = float(os.environ.get("CITYBIKES_MAX_RETRY_AFTER", 30))
 CACHE_DIR = "network_cache"
 
-# Optional in-memory cache
-network_detail_cache = {}
+# Codec for new file cache entries: none, gzip or zstd (zstd needs the zstandard package)
+CACHE_COMPRESSION = os.environ.get("CACHE_COMPRESSION", "gzip")
+CACHE_SUFFIX = ".cache"
+LEGACY_CACHE_SUFFIX = ".json"
+
+# In-memory cache, accounted against the process memory budget
+network_detail_cache = GovernedCache("network_details")
+
+# Content hashes of the station data, recorded whenever details are fetched or loaded:
+# network_id -> network hash, and network_id -> {station_id: station hash}
+network_content_hashes = {}
+station_content_hashes = {}
+
+# Concurrent misses for the same network (or the list) share one in-flight fetch
+_list_flight = SingleFlight("network_list")
+_detail_flights = SingleFlight("network_details")
 
 # Ensure cache directory exists
 os.makedirs(CACHE_DIR, exist_ok=True)
 
+def _retry_after(response, default: float) -> float:
+    """Seconds to wait before retrying, honoring a numeric Retry-After header up to MAX_RETRY_AFTER."""
+    try:
+        wait = max(float(response.headers.get("Retry-After")), 0.0)
+    except (TypeError, ValueError):
+        return default
+    return wait if wait <= MAX_RETRY_AFTER else default
+
+def _digest(payload: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "big")
+
+def station_hash(station: dict) -> int:
+    """Stable hash of the fields that drive totals and maps; the timestamp is left out."""
+    return _digest(repr((
+        station.get("id"), station.get("name"),
+        station.get("latitude"), station.get("longitude"),
+        station.get("free_bikes"), station.get("empty_slots"),
+        (station.get("extra") or {}).get("slots"),
+    )).encode("utf-8"))
+
+def record_content_hashes(network_id: str, data: dict) -> int:
+    """Computes and stores the per-station and per-network hashes for a detail payload."""
+    stations = {
+        s.get("id", idx): station_hash(s)
+        for idx, s in enumerate((data or {}).get("stations") or [])
+    }
+    network_hash = _digest(b"".join(h.to_bytes(8, "big") for h in sorted(stations.values())))
+    station_content_hashes[network_id] = stations
+    network_content_hashes[network_id] = network_hash
+    return network_hash
+
+def load_cached_details(network_id: str):
+    """
+    Reads a network from the file cache.
+
+    Checksummed entries (<id>.cache) are preferred; plain <id>.json files from
+    older versions are still read. Returns None on a miss or a damaged entry.
+    """
+    cache_path = os.path.join(CACHE_DIR, f"{network_id}{CACHE_SUFFIX}")
+    legacy_path = os.path.join(CACHE_DIR, f"{network_id}{LEGACY_CACHE_SUFFIX}")
+
+    if os.path.exists(cache_path):
+        try:
+            return read_cache_entry(cache_path)
+        except (CacheIntegrityError, OSError, ValueError) as e:
+            inc("cache_corrupt_entries")
+            logging.warning(f"⚠️ Discarding damaged cache entry for {network_id}: {e}")
+
+    if os.path.exists(legacy_path):
+        try:
+            with open(legacy_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            inc("cache_corrupt_entries")
+            logging.warning(f"⚠️ Failed to load cache for {network_id}: {e}")
+
+    return None
+
+def save_cached_details(network_id: str, data: dict, codec=None):
+    """Writes a network to the file cache atomically, with a checksum."""
+    path = os.path.join(CACHE_DIR, f"{network_id}{CACHE_SUFFIX}")
+    write_cache_entry(path, data, codec or CACHE_COMPRESSION)
+    return path
+
+@instrumented("fetch_network_data")
 def fetch_network_data():
-    """Fetch the list of all networks."""
+    """Fetch the list of all networks; concurrent callers share one request."""
+    return _list_flight.do("networks", _fetch_network_list)
+
+def _fetch_network_list():
     url = BASE_URL
     try:
-        response = requests.get(url, timeout=10)
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        inc("http_responses", endpoint="networks", code=response.status_code)
         response.raise_for_status()
-        return response.json().get('networks', [])
+        with timed("parse_json", endpoint="networks"):
+            return response.json().get('networks', [])
     except requests.RequestException as e:
         logging.error(f" Error fetching network list: {e}")
         return []
 
-def fetch_network_details(network_id: str) -> dict:
-    """Fetch detailed station data for a given network ID, with retry, memory and file caching."""
+@instrumented("fetch_network_details")
+def fetch_network_details(network_id: str, force_refresh: bool = False) -> dict:
+    """
+    Fetch detailed station data for a given network ID, with retry, memory and file caching.
+
+    force_refresh skips both cache tiers and goes to the API; the fresh
+    payload then replaces the cached one.
+    """
 
     # Check in-memory cache
-    if network_id in network_detail_cache:
-        return network_detail_cache[network_id]
+    data = None if force_refresh else network_detail_cache.get(network_id)
+    if data is not None:
+        inc("cache_requests", tier="memory", result="hit")
+        return data
+    inc("cache_requests", tier="memory", result="miss")
+
+    # Concurrent misses for this network wait for the first one's result
+    return _detail_flights.do((network_id, force_refresh), _load_network_details, network_id, force_refresh)
+
+def _remember(network_id, data, started):
+    # Cost to rebuild is what this load took: a file read, or the HTTP round trips.
+    # The benchmarks swap in a plain dict, which has no cost bookkeeping.
+    cache = network_detail_cache
+    if isinstance(cache, GovernedCache):
+        cache.put(network_id, data, cost=time.perf_counter() - started)
+    else:
+        cache[network_id] = data
+
+def _load_network_details(network_id: str, force_refresh: bool) -> dict:
+    # A fetch that finished just before this one started may have filled the cache
+    data = None if force_refresh else network_detail_cache.get(network_id)
+    if data is not None:
+        return data
+    started = time.perf_counter()
 
     # Check file cache
-    cache_path = os.path.join(CACHE_DIR, f"{network_id}.json")
-    if os.path.exists(cache_path):
-        try:
-            with open(cache_path, "r") as f:
-                data = json.load(f)
-                network_detail_cache[network_id] = data
-                return data
-        except Exception as e:
-            logging.warning(f"⚠️ Failed to load cache for {network_id}: {e}")
+    if not force_refresh:
+        with timed("file_cache_load"):
+            data = load_cached_details(network_id)
+        if data is not None:
+            _remember(network_id, data, started)
+            record_content_hashes(network_id, data)
+            inc("cache_requests", tier="file", result="hit")
+            return data
+    inc("cache_requests", tier="file", result="miss")
 
     url = f"{BASE_URL}/{network_id}"
     retries = 0
 
     while retries < MAX_RETRIES:
         try:
-            response = requests.get(url, timeout=10)
+            with timed("http_get", endpoint="network"):
+                response = requests.get(url, timeout=REQUEST_TIMEOUT)
+            inc("http_responses", endpoint="network", code=response.status_code)
             if response.status_code == 429:
-                wait_time = BACKOFF_FACTOR ** retries
+                wait_time = _retry_after(response, BACKOFF_FACTOR ** retries)
                 logging.warning(f"🚦 Rate limit hit (429) for {network_id}, retrying in {wait_time:.1f}s...")
                 time.sleep(wait_time)
                 retries += 1
                 continue
 
             response.raise_for_status()
-            data = response.json().get("network", {})
-            network_detail_cache[network_id] = data
+            with timed("parse_json", endpoint="network"):
+                data = response.json().get("network", {})
+            _remember(network_id, data, started)
+            record_content_hashes(network_id, data)
 
             # Write to file cache
             try:
-                with open(cache_path, "w") as f:
-                    json.dump(data, f)
+                with timed("file_cache_save"):
+                    save_cached_details(network_id, data)
             except Exception as e:
                 logging.warning(f"⚠️ Failed to save cache for {network_id}: {e}")
 
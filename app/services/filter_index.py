@@ -0,0 +1,108 @@
+"""
+Sidebar filter index over the network table.
+
+Built once per snapshot: row positions per country and per network name,
+the presorted option lists for both select boxes, and a rank array per sort
+column. Filtering then costs O(result size) and takes only the matching
+rows, instead of comparing every row and copying the frame on each rerun.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.services.memory_governor import governed_cache
+from app.services.refresher import add_refresh_listener
+from app.services.snapshot import derived_table, get_current_snapshot
+
+ALL = "ALL"
+
+# Sidebar "Sort By" labels -> network table columns
+SORT_COLUMNS = {"name": "name", "city": "city", "station count": "station_count"}
+
+_EMPTY = np.array([], dtype=np.intp)
+
+
+class FilterIndex:
+    """Precomputed positions and option lists for one network table."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.size = len(df)
+        self.country_positions = df.groupby("country", observed=True, sort=True).indices
+        self.name_positions = df.groupby("name", sort=True).indices
+
+        self.country_options = [ALL] + list(self.country_positions)
+        names = df["name"].to_numpy()
+        self.network_options = {ALL: [ALL] + list(self.name_positions)}
+        for country, positions in self.country_positions.items():
+            self.network_options[country] = [ALL] + sorted({n for n in names[positions] if isinstance(n, str)})
+
+        # rank[position] = place of that row in a stable sort by the column, NaN last
+        self.sort_ranks = {}
+        for column in SORT_COLUMNS.values():
+            if column in df.columns:
+                order = df[column].reset_index(drop=True).sort_values(kind="stable").index.to_numpy()
+                rank = np.empty(self.size, dtype=np.intp)
+                rank[order] = np.arange(self.size)
+                self.sort_ranks[column] = rank
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the position and rank arrays, for the memory governor."""
+        groups = list(self.country_positions.values()) + list(self.name_positions.values())
+        return sum(a.nbytes for a in groups) + sum(a.nbytes for a in self.sort_ranks.values())
+
+    def networks_for(self, country=ALL) -> list:
+        """Network select box options for a country (or ALL)."""
+        return self.network_options.get(country, [ALL])
+
+    def positions(self, country=ALL, network=ALL, sort_by="") -> np.ndarray:
+        """Row positions matching the sidebar selection, in display order."""
+        positions = None
+        if country and country != ALL:
+            positions = self.country_positions.get(country, _EMPTY)
+        if network and network != ALL:
+            by_name = self.name_positions.get(network, _EMPTY)
+            positions = by_name if positions is None else np.intersect1d(positions, by_name, assume_unique=True)
+
+        if sort_by:
+            if positions is None:
+                positions = np.arange(self.size)
+            rank = self.sort_ranks[SORT_COLUMNS.get(sort_by, sort_by)]
+            positions = positions[np.argsort(rank[positions], kind="stable")]
+        return positions
+
+    def select(self, df: pd.DataFrame, country=ALL, network=ALL, sort_by="") -> pd.DataFrame:
+        """
+        Returns the rows of df matching the selection.
+
+        With no filter and no sort this is df itself, not a copy.
+        """
+        positions = self.positions(country, network, sort_by)
+        return df if positions is None else df.take(positions)
+
+
+def snapshot_filter_index(snapshot: dict) -> FilterIndex:
+    return derived_table(snapshot, "filter_index", lambda: FilterIndex(snapshot["networks"]))
+
+
+def _precompute_filter_index(snapshot, changed, removed):
+    snapshot_filter_index(snapshot)
+
+
+add_refresh_listener(_precompute_filter_index)
+
+
+# Shared, not copied: the index is never mutated. Keyed on the network ids, so the
+# table itself is neither hashed nor pickled on every rerun.
+@governed_cache("live_filter_index", max_entries=1)
+@st.cache_resource(max_entries=1)
+def _live_filter_index(network_ids: tuple, _df: pd.DataFrame) -> FilterIndex:
+    return FilterIndex(_df)
+
+
+def load_filter_index(df: pd.DataFrame) -> FilterIndex:
+    """Returns the index for df: the snapshot's own when df is the snapshot's network table."""
+    snapshot = get_current_snapshot()
+    if snapshot is not None and snapshot["networks"] is df:
+        return snapshot_filter_index(snapshot)
+    return _live_filter_index(tuple(df["id"]), _df=df)
@@ -0,0 +1,212 @@
+"""
+Precomputed geographic rollups: per city and per geohash cell.
+
+Both are built once per snapshot from the columnar station table and kept
+with the snapshot (see snapshot.derived_table), so regional views and
+heatmaps read small aggregate tables instead of scanning every station.
+
+    city   one row per (country, city): networks, stations, bikes, docks
+    cells  one row per (country, geohash) at each of GEOHASH_PRECISIONS,
+           with the station centroid for plotting
+
+Geohashes are encoded in numpy directly from the coordinate arrays; cells
+are grouped on the integer code and only unique cells are turned into
+strings.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.services.availability import availability_by_network, snapshot_availability
+from app.services.memory_governor import governed_cache
+from app.services.metrics import instrumented
+from app.services.refresher import add_refresh_listener
+from app.services.snapshot import derived_table, get_current_snapshot
+from app.services.station_store import load_station_table
+
+GEOHASH_ALPHABET = np.array(list("0123456789bcdefghjkmnpqrstuvwxyz"))
+
+# ~156 km, ~39 km and ~5 km cells: world, country and city zoom levels
+GEOHASH_PRECISIONS = (3, 4, 5)
+
+CITY_COLUMNS = ["country", "city", "networks", "stations", "free_bikes", "empty_slots", "docks"]
+CELL_COLUMNS = ["country", "geohash", "stations", "free_bikes", "empty_slots", "docks", "latitude", "longitude"]
+
+
+def geohash_codes(latitude, longitude, precision: int) -> np.ndarray:
+    """
+    Encodes coordinates as integer geohash codes (5 bits per character).
+
+    Bits alternate longitude, latitude starting with longitude, exactly as in
+    the string geohash, so geohash_strings(codes) gives the usual hashes.
+    """
+    bits = 5 * precision
+    lon_bits, lat_bits = (bits + 1) // 2, bits // 2
+
+    lat = np.asarray(latitude, dtype=np.float64)
+    lon = np.asarray(longitude, dtype=np.float64)
+    lat_q = np.clip(((lat + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), 0, (1 << lat_bits) - 1)
+    lon_q = np.clip(((lon + 180.0) / 360.0 * (1 << lon_bits)).astype(np.int64), 0, (1 << lon_bits) - 1)
+
+    codes = np.zeros(len(lat), dtype=np.int64)
+    for i in range(bits):
+        # Even positions (from the most significant bit) take longitude bits
+        if i % 2 == 0:
+            bit = (lon_q >> (lon_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_q >> (lat_bits - 1 - i // 2)) & 1
+        codes = (codes << 1) | bit
+    return codes
+
+
+def geohash_strings(codes, precision: int) -> np.ndarray:
+    """Turns integer geohash codes into their base32 strings."""
+    codes = np.asarray(codes, dtype=np.int64)
+    shifts = 5 * np.arange(precision - 1, -1, -1)
+    chars = GEOHASH_ALPHABET[(codes[:, None] >> shifts) & 31]
+    return np.ascontiguousarray(chars).view(f"<U{precision}").ravel()
+
+
+def city_rollup(availability: pd.DataFrame, networks_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sums per-network totals up to (country, city).
+
+    Args:
+        availability (pd.DataFrame): Output of availability_by_network.
+        networks_df (pd.DataFrame): Processed networks with id, city and country.
+    """
+    info = networks_df[["id", "country", "city"]].drop_duplicates("id")
+    merged = availability.merge(info, left_on="network_id", right_on="id", how="inner")
+    if merged.empty:
+        return pd.DataFrame(columns=CITY_COLUMNS)
+
+    rollup = merged.groupby(["country", "city"], sort=False, observed=True).agg(
+        networks=("network_id", "size"),
+        stations=("stations", "sum"),
+        free_bikes=("free_bikes", "sum"),
+        empty_slots=("empty_slots", "sum"),
+        docks=("docks", "sum"),
+    ).reset_index()
+    return rollup.sort_values("stations", ascending=False, kind="stable").reset_index(drop=True)[CITY_COLUMNS]
+
+
+def cell_rollup(stations: pd.DataFrame, networks_df: pd.DataFrame, precision: int) -> pd.DataFrame:
+    """
+    Sums stations, bikes and docks per (country, geohash cell).
+
+    Stations without coordinates are skipped. The country comes from the
+    station's network.
+    """
+    located = stations[stations["latitude"].notna() & stations["longitude"].notna()]
+    if located.empty:
+        return pd.DataFrame(columns=CELL_COLUMNS)
+
+    countries = networks_df.drop_duplicates("id").set_index("id")["country"].astype(object)
+    network_country = pd.Categorical(
+        countries.reindex(located["network_id"].astype(object)).fillna("").to_numpy(dtype=object)
+    )
+
+    cell = geohash_codes(located["latitude"].to_numpy(), located["longitude"].to_numpy(), precision)
+    # One group per (country, cell): the country code sits above the cell bits
+    key = network_country.codes.astype(np.int64) << (5 * precision) | cell
+    keys, inverse = np.unique(key, return_inverse=True)
+    n = len(keys)
+
+    bikes = located["free_bikes"].to_numpy(dtype=np.int64)
+    empties = located["empty_slots"].to_numpy(dtype=np.int64)
+    docks = np.maximum(located["slots"].to_numpy(dtype=np.int64), bikes + empties)
+
+    counts = np.bincount(inverse, minlength=n)
+    cell_codes = keys & ((1 << (5 * precision)) - 1)
+
+    rollup = pd.DataFrame({
+        "country": np.asarray(network_country.categories, dtype=object)[keys >> (5 * precision)],
+        "geohash": geohash_strings(cell_codes, precision),
+        "stations": counts.astype(np.int64),
+        "free_bikes": np.bincount(inverse, weights=bikes, minlength=n).astype(np.int64),
+        "empty_slots": np.bincount(inverse, weights=empties, minlength=n).astype(np.int64),
+        "docks": np.bincount(inverse, weights=docks, minlength=n).astype(np.int64),
+        "latitude": np.bincount(inverse, weights=located["latitude"].to_numpy(), minlength=n) / counts,
+        "longitude": np.bincount(inverse, weights=located["longitude"].to_numpy(), minlength=n) / counts,
+    })
+    return rollup.sort_values("stations", ascending=False, kind="stable").reset_index(drop=True)
+
+
+@instrumented("build_geo_rollups")
+def build_geo_rollups(stations: pd.DataFrame, networks_df: pd.DataFrame, availability=None) -> dict:
+    """
+    Builds every rollup level.
+
+    Returns:
+        dict: {"city": DataFrame, "cells": {precision: DataFrame}}.
+    """
+    if availability is None:
+        availability = availability_by_network(stations)
+    return {
+        "city": city_rollup(availability, networks_df),
+        "cells": {precision: cell_rollup(stations, networks_df, precision) for precision in GEOHASH_PRECISIONS},
+    }
+
+
+def snapshot_rollups(snapshot: dict) -> dict:
+    """Rollups for a snapshot, built once and kept with it."""
+    return derived_table(snapshot, "geo_rollups", lambda: build_geo_rollups(
+        snapshot["stations"], snapshot["networks"], snapshot_availability(snapshot)
+    ))
+
+
+def _precompute_rollups(snapshot, changed, removed):
+    # Runs on the refresh thread, so the first rerun after a swap finds them ready
+    if snapshot.get("stations") is not None:
+        snapshot_rollups(snapshot)
+
+
+add_refresh_listener(_precompute_rollups)
+
+
+@governed_cache("live_geo_rollups", max_entries=4)
+@st.cache_data(max_entries=4)
+def _live_rollups(network_ids: tuple, networks_df: pd.DataFrame) -> dict:
+    return build_geo_rollups(load_station_table(network_ids), networks_df)
+
+
+def load_geo_rollups(networks_df: pd.DataFrame) -> dict:
+    """
+    Returns the rollups for the current snapshot.
+
+    Before the first snapshot exists they are built from the network details.
+    """
+    snapshot = get_current_snapshot()
+    if snapshot is not None and snapshot.get("stations") is not None:
+        return snapshot_rollups(snapshot)
+    return _live_rollups(tuple(networks_df["id"]), networks_df)
+
+
+def cells_for(rollups: dict, precision: int, country=None) -> pd.DataFrame:
+    """
+    Returns the cell table at one precision, for one country or merged across all.
+
+    Cells on a border appear once per country; for the global view they are
+    summed into one row with a station-weighted centroid.
+    """
+    if precision not in rollups["cells"]:
+        raise ValueError(f"No rollup at geohash precision {precision}; have {GEOHASH_PRECISIONS}")
+
+    cells = rollups["cells"][precision]
+    if country is not None:
+        return cells[cells["country"] == country].reset_index(drop=True)
+    if cells.empty or not cells["geohash"].duplicated().any():
+        return cells
+
+    weighted = cells.assign(
+        latitude=cells["latitude"] * cells["stations"],
+        longitude=cells["longitude"] * cells["stations"],
+    )
+    merged = weighted.groupby("geohash", sort=False).agg(
+        country=("country", "first"), stations=("stations", "sum"), free_bikes=("free_bikes", "sum"),
+        empty_slots=("empty_slots", "sum"), docks=("docks", "sum"),
+        latitude=("latitude", "sum"), longitude=("longitude", "sum"),
+    ).reset_index()
+    merged["latitude"] /= merged["stations"]
+    merged["longitude"] /= merged["stations"]
+    return merged[CELL_COLUMNS].sort_values("stations", ascending=False, kind="stable").reset_index(drop=True)
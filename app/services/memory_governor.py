@@ -0,0 +1,356 @@
+"""
+Process-wide memory budget for the in-memory caches.
+
+Every cache registers with the governor and reports its size in bytes:
+
+    GovernedCache     a dict whose entries carry their estimated size, the
+                      seconds it took to build them and when they were last
+                      used; the network detail cache and each snapshot's
+                      derived tables are GovernedCaches
+    governed_cache    a decorator around an st.cache_data function, tracking
+                      the size of the results it holds; evicted as a whole
+                      with its clear()
+
+When MEMORY_BUDGET (e.g. "512MB") is set and the total goes over it, entries
+are evicted until usage is back under LOW_WATERMARK of the budget, cheapest
+first: the score of an entry is its rebuild cost per byte, discounted by the
+time since it was last used, so large, quickly rebuilt, idle entries go
+first and expensive hot ones last. Without a budget nothing is evicted, but
+usage per cache is still reported (see memory_usage and the cache_bytes
+gauges).
+"""
+import functools
+import heapq
+import os
+import re
+import sys
+import threading
+import time
+import weakref
+from collections.abc import MutableMapping
+
+import numpy as np
+import pandas as pd
+
+from app.services.metrics import inc, set_gauge
+
+_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def parse_bytes(value) -> int:
+    """Parses "512MB", "1.5GB" or a plain byte count; empty means no budget (0)."""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?B?)\s*", str(value or "0").upper())
+    if not match:
+        raise ValueError(f"Invalid byte size: {value!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+MEMORY_BUDGET = parse_bytes(os.environ.get("MEMORY_BUDGET", ""))
+
+# After going over budget, evict down to this fraction of it, so one insert does not evict on every call
+LOW_WATERMARK = 0.9
+
+# Seconds of idleness that halve an entry's eviction score
+RECENCY_SECONDS = 300.0
+
+# Rebuild cost assumed when none was measured
+DEFAULT_COST = 0.01
+
+# Long lists (e.g. the stations of a network) are sized from a sample of their items
+_SAMPLE_ITEMS = 16
+
+
+def estimate_size(obj, _depth=0) -> int:
+    """
+    Estimates the memory held by obj in bytes.
+
+    DataFrames, arrays and bytes are measured exactly; nested dicts and
+    lists (API payloads) are walked, extrapolating from a sample of long
+    lists. Objects may report their own size with an nbytes attribute.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if obj is None or isinstance(obj, bool) or (isinstance(obj, int) and -5 <= obj <= 256):
+        return 0  # shared singletons
+    if isinstance(obj, (bytes, bytearray, str, int, float)):
+        return sys.getsizeof(obj)
+    if _depth > 8:
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        # String keys are shared between the dicts of one decoded payload, so only values count
+        return sys.getsizeof(obj) + sum(
+            (0 if isinstance(k, str) else estimate_size(k, _depth + 1)) + estimate_size(v, _depth + 1)
+            for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        items = list(obj) if not isinstance(obj, (list, tuple)) else obj
+        if len(items) > _SAMPLE_ITEMS:
+            step = len(items) / _SAMPLE_ITEMS
+            sample = [items[int(i * step)] for i in range(_SAMPLE_ITEMS)]
+            per_item = sum(estimate_size(i, _depth + 1) for i in sample) / _SAMPLE_ITEMS
+            return sys.getsizeof(obj) + int(per_item * len(items))
+        return sys.getsizeof(obj) + sum(estimate_size(i, _depth + 1) for i in items)
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, (int, np.integer)):
+        return int(nbytes)
+    return sys.getsizeof(obj)
+
+
+def _score(cost, size, last_used, now) -> float:
+    # Seconds of rebuild work per byte, halved every RECENCY_SECONDS of idleness
+    return (cost + 1e-6) / max(size, 1) / (1 + (now - last_used) / RECENCY_SECONDS)
+
+
+class _Governor:
+    def __init__(self, budget=0):
+        self.budget = budget
+        self._caches = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def register(self, cache):
+        with self._lock:
+            self._caches.add(cache)
+
+    def caches(self) -> list:
+        with self._lock:
+            return list(self._caches)
+
+    def total_bytes(self) -> int:
+        return sum(cache.nbytes for cache in self.caches())
+
+    def enforce(self):
+        """Evicts the lowest-scoring entries until usage is under the low watermark."""
+        if self.budget and self.total_bytes() > self.budget:
+            self._evict()
+        report_usage()
+
+    def _evict(self):
+        with self._lock:
+            caches = list(self._caches)
+            total = sum(cache.nbytes for cache in caches)
+            now = time.monotonic()
+            candidates = [
+                (_score(cost, size, last_used, now), id(cache), key, cache, size)
+                for cache in caches
+                for key, size, cost, last_used in cache.eviction_candidates()
+            ]
+            heapq.heapify(candidates)
+            target = self.budget * LOW_WATERMARK
+            while candidates and total > target:
+                _, _, key, cache, size = heapq.heappop(candidates)
+                if cache.evict(key):
+                    total -= size
+                    inc("cache_evictions", cache=cache.name)
+
+
+_governor = _Governor(MEMORY_BUDGET)
+
+
+def set_budget(budget):
+    """Sets the budget in bytes (or as "512MB"); 0 disables eviction."""
+    _governor.budget = parse_bytes(budget) if isinstance(budget, str) else int(budget or 0)
+    _governor.enforce()
+
+
+def get_budget() -> int:
+    return _governor.budget
+
+
+class GovernedCache(MutableMapping):
+    """
+    A dict that accounts its entries against the memory budget.
+
+    Reads refresh an entry's recency; put() records its rebuild cost. Plain
+    item assignment works too and assumes DEFAULT_COST.
+    """
+
+    def __init__(self, name: str, size_of=estimate_size):
+        self.name = name
+        self.size_of = size_of
+        self._data = {}
+        self._meta = {}  # key -> [size, cost, last_used]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        _governor.register(self)
+
+    # Caches are compared by identity: the governor keeps them in a WeakSet
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def put(self, key, value, cost=None):
+        """Stores value, with the seconds it took to build it as its rebuild cost."""
+        size = self.size_of(value)
+        with self._lock:
+            if key in self._meta:
+                self._bytes -= self._meta[key][0]
+            self._data[key] = value
+            self._meta[key] = [size, DEFAULT_COST if cost is None else cost, time.monotonic()]
+            self._bytes += size
+        _governor.enforce()
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._data[key]
+            self._meta[key][2] = time.monotonic()
+            return value
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+            self._bytes -= self._meta.pop(key)[0]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._meta.clear()
+            self._bytes = 0
+
+    def eviction_candidates(self) -> list:
+        with self._lock:
+            return [(key, size, cost, last_used) for key, (size, cost, last_used) in self._meta.items()]
+
+    def evict(self, key) -> bool:
+        with self._lock:
+            if key not in self._data:
+                return False
+            del self._data[key]
+            self._bytes -= self._meta.pop(key)[0]
+            return True
+
+
+class _CacheDataTracker:
+    """Sizes of the results an st.cache_data function currently holds, evicted as a unit."""
+
+    def __init__(self, name, func, max_entries):
+        self.name = name
+        self.func = func
+        self.max_entries = max_entries
+        self._entries = {}  # argument key -> [size, cost, last_used]
+        self._lock = threading.Lock()
+        _governor.register(self)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(size for size, _, _ in self._entries.values())
+
+    def record(self, key, result, elapsed):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2] = now
+                return
+            self._entries[key] = [estimate_size(result), elapsed, now]
+            # st.cache_data drops its oldest entries beyond max_entries; mirror that
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        _governor.enforce()
+
+    def eviction_candidates(self) -> list:
+        # Streamlit caches can only be cleared as a whole: offer them as one entry
+        with self._lock:
+            if not self._entries:
+                return []
+            sizes, costs, used = zip(*self._entries.values())
+            return [(None, sum(sizes), sum(costs), max(used))]
+
+    def evict(self, key) -> bool:
+        self.clear()
+        return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self.func.clear()
+        with self._lock:
+            self._entries.clear()
+
+
+def _argument_key(value):
+    # Frames are keyed by content, as st.cache_data keys them: a new frame per rerun
+    # holding the same networks must map to the same entry
+    if isinstance(value, pd.DataFrame):
+        if "id" in value.columns:
+            return ("DataFrame", tuple(value.columns), tuple(value["id"]))
+        return ("DataFrame", tuple(value.columns), int(pd.util.hash_pandas_object(value, index=False).sum()))
+    return value
+
+
+def _arguments_key(args, kwargs):
+    key = (
+        tuple(_argument_key(value) for value in args),
+        tuple(sorted((name, _argument_key(value)) for name, value in kwargs.items() if not name.startswith("_"))),
+    )
+    try:
+        return hash(key)
+    except TypeError:
+        return hash(repr(key))
+
+
+def governed_cache(name: str, max_entries=None):
+    """
+    Accounts an st.cache_data or st.cache_resource function's results against the memory budget.
+
+    Apply above the Streamlit decorator; clear() on the wrapper clears both.
+    Keyword arguments starting with an underscore are left out of the key,
+    as Streamlit leaves them out of its own.
+    """
+    def decorator(func):
+        tracker = _CacheDataTracker(name, func, max_entries)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            tracker.record(_arguments_key(args, kwargs), result, time.perf_counter() - start)
+            return result
+
+        wrapper.clear = tracker.clear
+        wrapper.tracker = tracker
+        return wrapper
+    return decorator
+
+
+def _usage() -> dict:
+    usage = {}
+    for cache in _governor.caches():
+        row = usage.setdefault(cache.name, {"cache": cache.name, "entries": 0, "bytes": 0})
+        row["entries"] += len(cache)
+        row["bytes"] += cache.nbytes
+    return usage
+
+
+def memory_usage() -> pd.DataFrame:
+    """Current usage per cache name, largest first."""
+    df = pd.DataFrame(list(_usage().values()), columns=["cache", "entries", "bytes"])
+    return df.sort_values("bytes", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def report_usage():
+    """Publishes usage per cache and the budget as gauges."""
+    for row in _usage().values():
+        set_gauge("cache_bytes", row["bytes"], cache=row["cache"])
+        set_gauge("cache_entries", row["entries"], cache=row["cache"])
+    set_gauge("cache_budget_bytes", _governor.budget)
@@ -0,0 +1,337 @@
+import functools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "citybike"
+
+_lock = threading.Lock()
+
+# (name, sorted label items) -> value
+_counters = defaultdict(float)
+
+# (name, sorted label items) -> [count, total_seconds, max_seconds]
+_timings = defaultdict(lambda: [0, 0.0, 0.0])
+
+# (name, sorted label items) -> last value
+_gauges = {}
+
+# (name, sorted label items) -> [count, max peak bytes, total retained bytes, last retained bytes]
+_memory = defaultdict(lambda: [0, 0, 0, 0])
+
+# Memory spans in progress on any thread, by id(span): [bytes traced at start, highest traced since]
+_active_memory_spans = {}
+_previous_allocations = None
+
+# Set TRACE_MEMORY=1 (or a stack depth, e.g. 5) to record per-stage memory with tracemalloc
+TRACE_MEMORY = os.environ.get("TRACE_MEMORY", "")
+
+# Stages whose peak exceeds this many bytes are logged
+MEMORY_LOG_THRESHOLD = int(os.environ.get("MEMORY_LOG_THRESHOLD", 20 * 1024 * 1024))
+
+_server = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increments a counter, e.g. inc("cache_requests", tier="file", result="hit")."""
+    with _lock:
+        _counters[_key(name, labels)] += amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    """Sets a gauge to its current value, e.g. set_gauge("cache_bytes", 1024, cache="network_details")."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, seconds: float, **labels):
+    """Records one duration for a timing span."""
+    with _lock:
+        entry = _timings[_key(name, labels)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+
+def observe_memory(name: str, peak: int, retained: int, **labels):
+    """Records the peak and retained allocation of one span, in bytes above its start."""
+    with _lock:
+        entry = _memory[_key(name, labels)]
+        entry[0] += 1
+        entry[1] = max(entry[1], peak)
+        entry[2] += retained
+        entry[3] = retained
+    if peak >= MEMORY_LOG_THRESHOLD:
+        logging.info(f"Memory {name}: peak +{peak / 1e6:.1f} MB, retained {retained / 1e6:+.1f} MB")
+
+
+def _start_memory_span():
+    if not tracemalloc.is_tracing():
+        return None
+    with _lock:
+        current, peak = tracemalloc.get_traced_memory()
+        # The peak counter is process-wide: fold it into the open spans before resetting it
+        for span in _active_memory_spans.values():
+            span[1] = max(span[1], peak)
+        tracemalloc.reset_peak()
+        span = [current, current]
+        _active_memory_spans[id(span)] = span
+        return span
+
+
+def _finish_memory_span(span):
+    with _lock:
+        current, peak = tracemalloc.get_traced_memory()
+        # By identity: spans of other threads may hold equal values
+        _active_memory_spans.pop(id(span), None)
+        return max(span[1], peak) - span[0], current - span[0]
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """
+    Times the enclosed block as one span of the given stage.
+
+    While tracemalloc is tracing (see start_memory_tracing), the span's peak
+    and retained allocation are recorded too. Both are process-wide, so work
+    on other threads during the span is counted with it.
+    """
+    span = _start_memory_span()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+        if span is not None and tracemalloc.is_tracing():
+            observe_memory(name, *_finish_memory_span(span), **labels)
+
+
+def instrumented(name: str):
+    """Decorator form of timed()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def reset():
+    """Clears all recorded metrics."""
+    global _previous_allocations
+    with _lock:
+        _previous_allocations = None
+        _counters.clear()
+        _timings.clear()
+        _gauges.clear()
+        _memory.clear()
+
+
+def get_metrics() -> dict:
+    """
+    Returns a copy of the current metrics for display.
+
+    Returns:
+        dict: {"counters": [...], "timings": [...], "gauges": [...], "memory": [...]}
+        with one dict per series.
+    """
+    with _lock:
+        counters = [
+            {"metric": name, **dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        timings = [
+            {
+                "stage": name, **dict(labels),
+                "count": count,
+                "total_s": round(total, 4),
+                "mean_ms": round(total / count * 1000, 2) if count else 0.0,
+                "max_ms": round(peak * 1000, 2),
+            }
+            for (name, labels), (count, total, peak) in sorted(_timings.items())
+        ]
+        gauges = [
+            {"metric": name, **dict(labels), "value": value}
+            for (name, labels), value in sorted(_gauges.items())
+        ]
+        memory = [
+            {
+                "stage": name, **dict(labels),
+                "count": count,
+                "peak_mb": round(peak / 1e6, 2),
+                "last_retained_mb": round(last / 1e6, 2),
+                "mean_retained_mb": round(total / count / 1e6, 2) if count else 0.0,
+            }
+            for (name, labels), (count, peak, total, last) in sorted(_memory.items())
+        ]
+    return {"counters": counters, "timings": timings, "gauges": gauges, "memory": memory}
+
+
+def start_memory_tracing(frames=None) -> bool:
+    """
+    Starts tracemalloc if TRACE_MEMORY is set (or frames is given), once per process.
+
+    Returns:
+        bool: True if memory is being traced.
+    """
+    if not tracemalloc.is_tracing():
+        depth = frames if frames is not None else (TRACE_MEMORY if TRACE_MEMORY not in ("", "0") else None)
+        if depth is None:
+            return False
+        tracemalloc.start(max(int(depth), 1))
+        logging.info(f"Tracing memory allocations ({max(int(depth), 1)} frames per site)")
+    return True
+
+
+def stop_memory_tracing() -> bool:
+    """
+    Stops tracemalloc; stage numbers recorded so far are kept.
+
+    Returns:
+        bool: True if tracing was running.
+    """
+    global _previous_allocations
+    if not tracemalloc.is_tracing():
+        return False
+    tracemalloc.stop()
+    _previous_allocations = None
+    logging.info("Stopped tracing memory allocations")
+    return True
+
+
+def is_memory_tracing() -> bool:
+    return tracemalloc.is_tracing()
+
+
+def allocation_sites(limit=15, group_by="lineno") -> list:
+    """
+    The source lines holding the most traced memory, with the change since the previous call.
+
+    Returns:
+        list: One dict per site: site, size_mb, count, size_diff_mb.
+    """
+    global _previous_allocations
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    if _previous_allocations is not None:
+        stats = snapshot.compare_to(_previous_allocations, group_by)
+    else:
+        stats = snapshot.statistics(group_by)
+    _previous_allocations = snapshot
+
+    return [
+        {
+            "site": str(stat.traceback),
+            "size_mb": round(stat.size / 1e6, 3),
+            "count": stat.count,
+            "size_diff_mb": round(getattr(stat, "size_diff", stat.size) / 1e6, 3),
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def render_prometheus() -> str:
+    """Renders all metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counter_names = sorted({name for name, _ in _counters})
+        for name in counter_names:
+            metric = f"{METRIC_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (n, labels), value in sorted(_counters.items()):
+                if n == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+
+        if _timings:
+            metric = f"{METRIC_PREFIX}_stage_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for (name, labels), (count, total, _) in sorted(_timings.items()):
+                stage = _format_labels(labels, [("stage", name)])
+                lines.append(f"{metric}_count{stage} {count}")
+                lines.append(f"{metric}_sum{stage} {total:.6f}")
+
+            metric = f"{METRIC_PREFIX}_stage_seconds_max"
+            lines.append(f"# TYPE {metric} gauge")
+            for (name, labels), (_, _, peak) in sorted(_timings.items()):
+                lines.append(f"{metric}{_format_labels(labels, [('stage', name)])} {peak:.6f}")
+
+        if _memory:
+            for metric, index in ((f"{METRIC_PREFIX}_stage_peak_bytes", 1),
+                                  (f"{METRIC_PREFIX}_stage_retained_bytes", 3)):
+                lines.append(f"# TYPE {metric} gauge")
+                for (name, labels), entry in sorted(_memory.items()):
+                    lines.append(f"{metric}{_format_labels(labels, [('stage', name)])} {entry[index]}")
+
+        for name in sorted({name for name, _ in _gauges}):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            for (n, labels), value in sorted(_gauges.items()):
+                if n == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=None):
+    """
+    Serves /metrics on a background thread, once per process.
+
+    The port comes from the METRICS_PORT environment variable when not given;
+    without either, no server is started.
+
+    Returns:
+        ThreadingHTTPServer | None: The running server, if any.
+    """
+    global _server
+    port = port if port is not None else os.environ.get("METRICS_PORT")
+    if port in (None, ""):
+        return None
+
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+            except OSError as e:
+                logging.warning(f"Could not start metrics endpoint on port {port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            logging.info(f"Metrics endpoint listening on :{port}/metrics")
+    return _server
@@ -1,4 +1,3 @@
-import plotly.express as px
 import streamlit as st
 
 
@@ -1,10 +1,12 @@
-import plotly.express as px
 import pandas as pd
-import plotly.graph_objects as go
-import streamlit as st
 
+from app.services.metrics import instrumented
 
+
+@instrumented("plot_world_station_map")
 def plot_world_station_map(df: pd.DataFrame, filters_applied: bool = False):
+    import plotly.express as px
+
     try:
         if df.empty or not {"latitude", "longitude"}.issubset(df.columns):
             return None
@@ -57,10 +59,45 @@ def plot_world_station_map(df: pd.DataFrame, filters_applied: bool = False):
         return None
 
 
+@instrumented("plot_station_density_heatmap")
+def plot_station_density_heatmap(cells_df: pd.DataFrame, zoom: float = 1):
+    """
+    Renders a station density heatmap from a geohash cell rollup.
+
+    Args:
+        cells_df (pd.DataFrame): Rows of geo_rollups.cells_for, one per cell.
+        zoom (float): Initial map zoom.
+
+    Returns:
+        go.Figure | None: The heatmap, or None if there are no cells.
+    """
+    import plotly.express as px
+
+    if cells_df is None or cells_df.empty:
+        return None
+
+    fig = px.density_map(
+        cells_df,
+        lat="latitude",
+        lon="longitude",
+        z="stations",
+        radius=18,
+        hover_name="geohash",
+        hover_data={"stations": True, "free_bikes": True, "docks": True, "latitude": False, "longitude": False},
+        center={"lat": float(cells_df["latitude"].mean()), "lon": float(cells_df["longitude"].mean())},
+        zoom=zoom,
+        height=500,
+        map_style="carto-darkmatter"
+    )
+    fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0}, paper_bgcolor="#111", font_color="white")
+    return fig
+
+
+@instrumented("generate_country_summary")
 def generate_country_summary(filtered_df, fetch_func):
     summary_by_country = []
 
-    grouped = filtered_df.groupby("country")
+    grouped = filtered_df.groupby("country", observed=True)
     for country, group in grouped:
         total_stations = 0
         total_free_bikes = 0
@@ -110,6 +147,7 @@ def generate_country_summary(filtered_df, fetch_func):
     return summary_by_country
 
 
+@instrumented("render_global_network_donut_chart")
 def render_global_network_donut_chart(selected_network, enriched_df, full_df):
     """
     Renders a donut chart showing the selected network's station percentage.
@@ -122,6 +160,8 @@ def render_global_network_donut_chart(selected_network, enriched_df, full_df):
     Returns:
         go.Figure: A Plotly donut chart figure.
     """
+    import plotly.graph_objects as go
+
     selected = enriched_df[enriched_df["name"] == selected_network]
     full_total = full_df["station_count"].sum()
     selected_count = selected["station_count"].sum()
@@ -154,6 +194,7 @@ def render_global_network_donut_chart(selected_network, enriched_df, full_df):
     return fig
 
 
+@instrumented("render_network_donut_chart")
 def render_network_donut_chart(selected_network, selected_country, full_df):
     """
     Renders a donut chart showing how much a selected network contributes to 
@@ -167,6 +208,8 @@ def render_network_donut_chart(selected_network, selected_country, full_df):
     Returns:
         go.Figure: A Plotly donut chart figure.
     """
+    import plotly.graph_objects as go
+
     country_df = full_df[full_df["country"] == selected_country]
     selected = country_df[country_df["name"] == selected_network]
 
@@ -201,12 +244,19 @@ def render_network_donut_chart(selected_network, selected_country, full_df):
     return fig
 
 
+@instrumented("plot_network_distribution")
 def plot_network_distribution(df):
-    counts = df["country"].value_counts().reset_index()
+    import plotly.express as px
+
+    # Filtered frames keep every country as a category; only count the ones present
+    counts = df["country"].astype("category").cat.remove_unused_categories().value_counts().reset_index()
     counts.columns = ["country", "network_count"]
     return px.pie(counts, names="country", values="network_count", title="Networks Distribution by Country")
 
+@instrumented("plot_station_map")
 def plot_station_map(network, selected_station_name=None):
+    import plotly.express as px
+
     if not network or 'stations' not in network:
         return None
 
@@ -238,7 +288,10 @@ def plot_station_map(network, selected_station_name=None):
     fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
     return fig
 
+@instrumented("plot_station_map_all_networks")
 def plot_station_map_all_networks(networks_data, selected_network_id=None, selected_station_name=None):
+    import plotly.express as px
+
     stations = []
 
     for network in networks_data:
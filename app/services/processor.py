@@ -1,79 +1,163 @@
+import numpy as np
 import pandas as pd
 import logging
 import streamlit as st
 import os
 from app.services.fetcher import fetch_network_details
+from app.services.memory_governor import governed_cache
+from app.services.metrics import inc, instrumented
+from app.services.snapshot import enriched_subset, get_current_snapshot, load_snapshot
 
 logging.basicConfig(level=logging.INFO)
 
+# Output schema of process_data
+NETWORK_DTYPES = {
+    # "string" keeps a null name as NA; "str" turns it into "None" on pandas < 3
+    "id": "string",
+    "name": "string",
+    "city": "category",
+    "country": "category",
+    "latitude": "float32",
+    "longitude": "float32",
+    "station_count": "int32",
+}
+
+VALIDATION_COLUMNS = ["position", "id", "name", "reason"]
+
+
+def _slots(extra) -> int:
+    slots = extra.get("slots") if isinstance(extra, dict) else None
+    return slots if isinstance(slots, (int, float)) and slots == slots else 0
+
+
+def normalize_networks(networks):
+    """
+    Builds the network table column by column and validates every entry.
+
+    An entry is dropped if it is not an object, has no country, or has
+    missing, non-numeric or out-of-range coordinates.
+
+    Args:
+        networks (list): Network entries as returned by fetch_network_data.
+
+    Returns:
+        tuple: (DataFrame with NETWORK_DTYPES, validation report with one
+        row per dropped entry: position, id, name and reason).
+    """
+    networks = networks or []
+    positions = np.arange(len(networks))
+    is_entry = np.fromiter((isinstance(net, dict) for net in networks), dtype=bool, count=len(networks))
+    entries = [net if ok else {} for net, ok in zip(networks, is_entry)]
+    locations = [net.get("location") if isinstance(net.get("location"), dict) else {} for net in entries]
+
+    ids = [net.get("id", f"unknown-{idx}") for idx, net in enumerate(entries)]
+    names = [net.get("name", "Unknown") for net in entries]
+    cities = [loc.get("city", "Unknown") for loc in locations]
+    countries = pd.Series([loc.get("country") for loc in locations], dtype="object")
+    latitude = pd.to_numeric(pd.Series([loc.get("latitude") for loc in locations], dtype="object"), errors="coerce")
+    longitude = pd.to_numeric(pd.Series([loc.get("longitude") for loc in locations], dtype="object"), errors="coerce")
+    station_count = pd.to_numeric(pd.Series([_slots(net.get("extra")) for net in entries], dtype="object"))
+
+    lat, lon = latitude.to_numpy(dtype=np.float64), longitude.to_numpy(dtype=np.float64)
+    reason = np.select(
+        [
+            ~is_entry,
+            countries.isna().to_numpy(),
+            np.isnan(lat) | np.isnan(lon),
+            (np.abs(lat) > 90) | (np.abs(lon) > 180),
+        ],
+        ["not a network object", "missing country", "missing or non-numeric coordinates", "coordinates out of range"],
+        default="",
+    )
+    keep = reason == ""
+
+    df = pd.DataFrame({
+        "id": pd.Series(ids, dtype="object")[keep],
+        "name": pd.Series(names, dtype="object")[keep],
+        "city": pd.Series(cities, dtype="object")[keep],
+        "country": countries[keep],
+        "latitude": lat[keep],
+        "longitude": lon[keep],
+        "station_count": station_count.fillna(0).to_numpy()[keep],
+    }, columns=list(NETWORK_DTYPES)).reset_index(drop=True).astype(NETWORK_DTYPES)
+
+    report = pd.DataFrame({
+        "position": positions[~keep],
+        "id": [ids[i] for i in positions[~keep]],
+        "name": [names[i] for i in positions[~keep]],
+        "reason": reason[~keep],
+    }, columns=VALIDATION_COLUMNS)
+    return df, report
+
+
+@instrumented("process_data")
 def process_data(networks):
-    processed = []
-
-    for idx, net in enumerate(networks):
-        try:
-            location = net.get("location", {})
-            extra = net.get("extra", {})
-
-            row = {
-                "id": net.get("id", f"unknown-{idx}"),
-                "name": net.get("name", "Unknown"),
-                "city": location.get("city", "Unknown"),
-                "country": location.get("country", None),
-                "latitude": location.get("latitude", None),
-                "longitude": location.get("longitude", None),
-                "station_count": extra.get("slots") if isinstance(extra.get("slots"), (int, float)) else 0
-            }
-
-            processed.append(row)
-
-        except Exception as e:
-            logging.warning(f"Skipping entry {idx} due to error: {e}")
-            continue
-
-    df = pd.DataFrame(processed)
-
-    required_columns = ["country", "latitude", "longitude"]
-    if all(col in df.columns for col in required_columns):
-        df = df.dropna(subset=required_columns)
-    else:
-        logging.warning(f"One or more required columns missing: {required_columns}")
-
-    if "station_count" in df.columns:
-        df["station_count"] = pd.to_numeric(df["station_count"], errors='coerce').fillna(0).astype(int)
-    else:
-        logging.warning("Missing 'station_count' column; creating with default value 0.")
-        df["station_count"] = 0
+    """
+    Normalizes the network list into the typed network table.
+
+    Dropped entries are logged and counted by reason; use normalize_networks
+    to get the full validation report.
+    """
+    df, report = normalize_networks(networks)
+
+    if not report.empty:
+        for reason, count in report["reason"].value_counts().items():
+            inc("process_data_dropped", int(count), reason=reason)
+        logging.warning(
+            f"Dropped {len(report)} of {len(report) + len(df)} networks: "
+            + ", ".join(f"{count} {reason}" for reason, count in report["reason"].value_counts().items())
+        )
 
     return df
 
+# Read-only fallback shipped with the repo; snapshots are persisted by the refresher
 CACHE_FILE = "cached_station_data.csv"
 
-@st.cache_data(show_spinner="🔄 Fetching live station data...", max_entries=1)
-def enrich_with_station_data(df: pd.DataFrame) -> pd.DataFrame:
-    try:
-        df = df.copy()
-        df["station_count"] = 0
-        df["free_bikes"] = 0
-        df["empty_slots"] = 0
+@instrumented("compute_station_totals")
+def compute_station_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Adds station_count, free_bikes and empty_slots from each network's station list."""
+    df = df.copy()
+    df["station_count"] = 0
+    df["free_bikes"] = 0
+    df["empty_slots"] = 0
+
+    for idx, row in df.iterrows():
+        network_id = row.get("id")
+        if not network_id:
+            continue
 
-        for idx, row in df.iterrows():
-            network_id = row.get("id")
-            if not network_id:
-                continue
+        details = fetch_network_details(network_id)
+        stations = details.get("stations", [])
 
-            details = fetch_network_details(network_id)
-            stations = details.get("stations", [])
+        df.at[idx, "station_count"] = len(stations)
+        df.at[idx, "free_bikes"] = sum(int(s.get("free_bikes") or 0) for s in stations)
+        df.at[idx, "empty_slots"] = sum(int(s.get("empty_slots") or 0) for s in stations)
 
-            df.at[idx, "station_count"] = len(stations)
-            df.at[idx, "free_bikes"] = sum(int(s.get("free_bikes") or 0) for s in stations)
-            df.at[idx, "empty_slots"] = sum(int(s.get("empty_slots") or 0) for s in stations)
+    return df
 
-        df.to_csv(CACHE_FILE, index=False)
-        return df
+@governed_cache("enriched_networks", max_entries=1)
+@st.cache_data(show_spinner="🔄 Fetching live station data...", max_entries=1)
+@instrumented("enrich_with_station_data")
+def enrich_with_station_data(df: pd.DataFrame) -> pd.DataFrame:
+    # Serve from the boot snapshot when it covers every requested network
+    from_snapshot = enriched_subset(get_current_snapshot(), df)
+    if from_snapshot is not None:
+        return from_snapshot
+
+    try:
+        return compute_station_totals(df)
 
     except Exception as e:
         st.warning(f" Live data failed: {e}")
 
+        # Fall back to the last persisted snapshot, then to the bundled CSV
+        persisted = load_snapshot()
+        if persisted is not None:
+            from_persisted = enriched_subset(persisted, df)
+            if from_persisted is not None:
+                st.info(" Loading from the last saved snapshot...")
+                return from_persisted
+
         if os.path.exists(CACHE_FILE):
             st.info(" Loading from cached data...")
             return pd.read_csv(CACHE_FILE)
@@ -83,6 +167,7 @@ def enrich_with_station_data(df: pd.DataFrame) -> pd.DataFrame:
 
 
 # === Enrich full dataset once and cache it for static metrics ===
+@governed_cache("static_enriched_networks", max_entries=1)
 @st.cache_data(show_spinner=" Preparing static enriched dataset...", max_entries=1)
 def enrich_static_data():
     from app.api.v1.routes import load_dashboard
@@ -0,0 +1,269 @@
+"""
+Opt-in profiling of dashboard reruns and background refreshes.
+
+    ?profile=1           profiles every rerun of that browser session
+    PROFILE=rerun        profiles every rerun of every session
+    PROFILE=refresh      profiles background snapshot refreshes
+                         (PROFILE=rerun,refresh or PROFILE=all for both)
+
+Each profiled run writes three files to PROFILE_DIR (default "profiles"):
+
+    <stamp>-<name>.prof       cProfile stats (python -m pstats, snakeviz)
+    <stamp>-<name>.collapsed  sampled stacks, one "frame;frame;frame count"
+                              line per stack (flamegraph.pl, speedscope)
+    <stamp>-<name>.svg        a flamegraph of the sampled stacks
+
+cProfile gives exact call counts and times per function; the sampler walks
+the profiled thread's stack every PROFILE_INTERVAL seconds, which is what
+shows where the time of one rerun actually went (enrichment, Plotly
+serialization, country summaries, ...). Only the newest PROFILE_KEEP
+profiles are kept.
+"""
+import cProfile
+import html
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+
+from app.services.metrics import inc
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_TARGETS = {t.strip() for t in os.environ.get("PROFILE", "").lower().split(",") if t.strip()}
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+PROFILE_KEEP = 20
+
+# A sampler left running (e.g. a rerun that never reached stop()) gives up after this long
+MAX_PROFILE_SECONDS = 600
+
+PROFILE_SUFFIXES = (".prof", ".collapsed", ".svg")
+
+
+def profiling_enabled(target: str, query_params=None) -> bool:
+    """True if runs of target ("rerun" or "refresh") should be profiled."""
+    if target in PROFILE_TARGETS or "all" in PROFILE_TARGETS:
+        return True
+    return query_params is not None and query_params.get("profile") == "1"
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's call stack on a background thread."""
+
+    def __init__(self, thread_id: int, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        deadline = time.monotonic() + MAX_PROFILE_SECONDS
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break  # the profiled thread has finished
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+
+def collapsed_stacks(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed format: one "outer;...;inner count" line per stack."""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+def flamegraph_svg(stacks: Counter, title="Flame Graph", width=1200, row_height=16) -> str:
+    """
+    Renders sampled stacks as a flamegraph: the root spans the full width at
+    the bottom, and each frame is as wide as the samples it appears in.
+    """
+    root = {"children": {}, "count": 0}
+    for stack, count in stacks.items():
+        node = root
+        node["count"] += count
+        for frame in stack:
+            node = node["children"].setdefault(frame, {"children": {}, "count": 0})
+            node["count"] += count
+
+    def depth(node):
+        return 1 + max((depth(c) for c in node["children"].values()), default=0)
+
+    total = max(root["count"], 1)
+    levels = depth(root) - 1
+    height = (levels + 2) * row_height + 10
+    scale = (width - 20) / total
+    rects = []
+
+    def draw(node, x, level):
+        for frame, child in sorted(node["children"].items()):
+            w = child["count"] * scale
+            if w >= 0.5:
+                y = height - (level + 2) * row_height
+                hue = zlib.crc32(frame.encode("utf-8")) % 60
+                tooltip = html.escape(f"{frame} ({child['count']} samples, {child['count'] * 100 / total:.1f}%)")
+                text = html.escape(frame[:int(w / 7)]) if w > 21 else ""
+                rects.append(
+                    f'<g><title>{tooltip}</title>'
+                    f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row_height - 1}" '
+                    f'fill="hsl({hue}, 85%, 60%)" rx="2"/>'
+                    f'<text x="{x + 3:.1f}" y="{y + row_height - 4}">{text}</text></g>'
+                )
+                draw(child, x, level + 1)
+            x += w
+
+    draw(root, 10, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="Verdana" font-size="11">'
+        f'<rect width="100%" height="100%" fill="#fafafa"/>'
+        f'<text x="{width / 2}" y="16" text-anchor="middle" font-size="14">{html.escape(title)}</text>'
+        + "".join(rects) + "</svg>"
+    )
+
+
+def _prune(out_dir, keep=PROFILE_KEEP):
+    stems = sorted({name.rsplit(".", 1)[0] for name in os.listdir(out_dir) if name.endswith(PROFILE_SUFFIXES)})
+    for stem in stems[:-keep]:
+        for suffix in PROFILE_SUFFIXES:
+            try:
+                os.remove(os.path.join(out_dir, stem + suffix))
+            except FileNotFoundError:
+                pass
+
+
+class Profile:
+    """
+    Profiles the calling thread between start() and stop().
+
+    Usable as a context manager; stop() writes the profile files and
+    returns the path of the flamegraph.
+    """
+
+    def __init__(self, name: str, out_dir=None, interval=PROFILE_INTERVAL):
+        self.name = name
+        self.out_dir = out_dir or PROFILE_DIR
+        self.interval = interval
+        self.path = None
+        self._profiler = None
+        self._sampler = None
+        self._thread_id = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = StackSampler(self._thread_id, self.interval).start()
+        self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one active cProfile per process: sample only
+            logging.info(f"cProfile unavailable for {self.name} ({e}); writing sampled stacks only.")
+            self._profiler = None
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self):
+        """Stops profiling and writes the files; returns the .svg path (None if not running)."""
+        if self._sampler is None:
+            return None
+        sampler, profiler = self._sampler, self._profiler
+        self._sampler = self._profiler = None
+        if profiler is not None and threading.get_ident() != self._thread_id and sys.version_info < (3, 12):
+            # Before 3.12, disable() only unhooks the calling thread. The starting thread
+            # keeps its hook until it exits, so its cProfile data is incomplete: drop it
+            logging.info(f"Profile {self.name} stopped on another thread; writing sampled stacks only.")
+            profiler = None
+        if profiler is not None:
+            profiler.disable()
+        sampler.stop()
+        elapsed = time.perf_counter() - self._started
+
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            # Timestamped to the nanosecond, so names sort by age for _prune
+            stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}"
+            stem = os.path.join(self.out_dir, f"{stamp}-{self.name}")
+            if profiler is not None:
+                profiler.dump_stats(stem + ".prof")
+            with open(stem + ".collapsed", "w", encoding="utf-8") as f:
+                f.write(collapsed_stacks(sampler.stacks))
+            with open(stem + ".svg", "w", encoding="utf-8") as f:
+                f.write(flamegraph_svg(sampler.stacks, title=f"{self.name}: {elapsed:.2f}s, "
+                                       f"{sum(sampler.stacks.values())} samples"))
+            _prune(self.out_dir)
+        except OSError as e:
+            logging.warning(f"Could not write profile {self.name}: {e}")
+            return None
+
+        inc("profiles_written", target=self.name)
+        logging.info(f"Profiled {self.name} ({elapsed:.2f}s): {stem}.svg")
+        self.path = stem + ".svg"
+        return self.path
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+class _NoProfile:
+    path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def start_rerun_profile(query_params, session_state):
+    """
+    Starts profiling this rerun if requested; returns the Profile or None.
+
+    A profile left running by a rerun that was interrupted before its
+    stop() is written out first; that usually happens on another script
+    thread, so only its sampled stacks are kept.
+    """
+    leftover = session_state.get("_rerun_profile")
+    if leftover is not None:
+        del session_state["_rerun_profile"]
+        leftover.stop()
+    if not profiling_enabled("rerun", query_params):
+        return None
+    profile = Profile("rerun").start()
+    session_state["_rerun_profile"] = profile
+    return profile
+
+
+def stop_rerun_profile(session_state):
+    """Stops this rerun's profile; returns the flamegraph path, or None if not profiling."""
+    profile = session_state.get("_rerun_profile")
+    if profile is None:
+        return None
+    del session_state["_rerun_profile"]
+    return profile.stop()
+
+
+def profiled(target: str, query_params=None):
+    """A Profile of the enclosed block if target is being profiled, else a no-op context."""
+    return Profile(target) if profiling_enabled(target, query_params) else _NoProfile()
@@ -0,0 +1,237 @@
+"""
+Embedded, read-only SQL over a snapshot's tables.
+
+    networks      one row per network, with station totals (the enriched table)
+    stations      one row per station (see station_store)
+    availability  per-network availability metrics (see availability)
+
+DuckDB (in requirements.txt) registers the tables as-is and runs queries as
+vectorized columnar scans over the DataFrames, without a copy. Only where it
+cannot be installed are the tables loaded into an in-memory SQLite database
+once per snapshot instead. Either way, only a single SELECT (or WITH ... SELECT) statement is
+accepted, nothing outside the registered tables can be read, and queries
+are cut off after QUERY_TIMEOUT seconds and QUERY_MAX_ROWS rows.
+
+Common rollups are kept as named templates; parameters are always bound,
+never formatted into the SQL:
+
+    run_template("top_networks", country="FR", limit=5)
+    query("SELECT country, SUM(station_count) FROM networks GROUP BY country")
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from app.services.availability import snapshot_availability
+from app.services.metrics import inc, instrumented
+from app.services.snapshot import derived_table, get_current_snapshot, load_snapshot, set_current_snapshot
+
+try:
+    import duckdb
+except ImportError:  # fallback only: row-oriented SQLite copies of every table
+    duckdb = None
+
+QUERY_TIMEOUT = float(os.environ.get("QUERY_TIMEOUT", 10))
+QUERY_MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", 10_000))
+
+# name -> (parameter names, SQL with one ? per parameter, in order)
+QUERY_TEMPLATES = {
+    "stations_by_country": ((), """
+        SELECT n.country, COUNT(DISTINCT n.id) AS networks, COUNT(*) AS stations,
+               SUM(s.free_bikes) AS free_bikes, SUM(s.empty_slots) AS empty_slots
+        FROM stations s JOIN networks n ON n.id = s.network_id
+        GROUP BY n.country
+        ORDER BY stations DESC
+    """),
+    "stations_by_city": (("country",), """
+        SELECT n.city, COUNT(DISTINCT n.id) AS networks, COUNT(*) AS stations,
+               SUM(s.free_bikes) AS free_bikes, SUM(s.empty_slots) AS empty_slots
+        FROM stations s JOIN networks n ON n.id = s.network_id
+        WHERE n.country = ?
+        GROUP BY n.city
+        ORDER BY stations DESC
+    """),
+    "top_networks": (("country", "limit"), """
+        SELECT id, name, city, country, station_count, free_bikes, empty_slots
+        FROM networks
+        WHERE country = ?
+        ORDER BY station_count DESC, name
+        LIMIT ?
+    """),
+    "empty_stations": (("network_id",), """
+        SELECT id, name, latitude, longitude, empty_slots, timestamp
+        FROM stations
+        WHERE network_id = ? AND free_bikes = 0 AND empty_slots > 0
+        ORDER BY name
+    """),
+    "country_availability": ((), """
+        SELECT n.country, SUM(a.stations) AS stations,
+               SUM(a.empty_stations) * 100.0 / SUM(a.stations) AS empty_pct,
+               SUM(a.full_stations) * 100.0 / SUM(a.stations) AS full_pct,
+               SUM(a.offline_stations) * 100.0 / SUM(a.stations) AS offline_pct,
+               SUM(a.free_bikes) * 1.0 / NULLIF(SUM(a.docks), 0) AS bike_dock_ratio
+        FROM availability a JOIN networks n ON n.id = a.network_id
+        GROUP BY n.country
+        HAVING SUM(a.stations) > 0
+        ORDER BY empty_pct DESC
+    """),
+}
+
+
+class QueryError(ValueError):
+    """Raised for rejected, failing or timed-out queries."""
+
+
+# SQLite actions a query may perform; everything else (writes, ATTACH, PRAGMA) is denied
+_SQLITE_READ_ACTIONS = {
+    sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+
+def _sqlite_authorizer(action, arg1, arg2, db_name, trigger):
+    return sqlite3.SQLITE_OK if action in _SQLITE_READ_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _sqlite_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Categorical and Arrow-backed string columns go in as plain text
+    converted = {c: object for c, dtype in df.dtypes.items()
+                 if isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype))}
+    return df.astype(converted) if converted else df
+
+
+class QueryEngine:
+    """A read-only SQL connection over a fixed set of DataFrames."""
+
+    def __init__(self, tables: dict, backend=None):
+        self.backend = backend or ("duckdb" if duckdb is not None else "sqlite")
+        self.table_names = sorted(tables)
+        self._lock = threading.Lock()
+        # Memory the engine holds beyond the DataFrames; DuckDB scans them in place
+        self.nbytes = 0
+
+        if self.backend == "duckdb":
+            self._con = duckdb.connect(":memory:")
+            for name, df in tables.items():
+                self._con.register(name, df)
+            # Registered tables only: no files, URLs or extensions from here on
+            self._con.execute("SET enable_external_access = false")
+            self._con.execute("SET lock_configuration = true")
+        elif self.backend == "sqlite":
+            self._con = sqlite3.connect(":memory:", check_same_thread=False)
+            for name, df in tables.items():
+                _sqlite_frame(df).to_sql(name, self._con, index=False)
+            for table, column in (("networks", "id"), ("networks", "country"), ("stations", "network_id"),
+                                  ("availability", "network_id")):
+                if table in tables and column in tables[table].columns:
+                    self._con.execute(f'CREATE INDEX "{table}_{column}" ON "{table}" ("{column}")')
+            page_count, = self._con.execute("PRAGMA page_count").fetchone()
+            page_size, = self._con.execute("PRAGMA page_size").fetchone()
+            self.nbytes = page_count * page_size
+            self._con.set_authorizer(_sqlite_authorizer)
+        else:
+            raise ValueError(f"Unknown query backend: {self.backend}")
+
+    def _check_statement(self, sql: str):
+        if self.backend != "duckdb":
+            return  # sqlite3 runs one statement per execute, and the authorizer rejects anything but reads
+        try:
+            statements = self._con.extract_statements(sql)
+        except duckdb.Error as e:
+            raise QueryError(str(e)) from e
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise QueryError("Only a single SELECT statement is allowed")
+
+    def _execute(self, sql, params, max_rows, deadline):
+        if self.backend == "duckdb":
+            timer = threading.Timer(max(deadline - time.monotonic(), 0), self._con.interrupt)
+            timer.start()
+            try:
+                result = self._con.execute(sql, list(params))
+                columns = [d[0] for d in result.description]
+                return columns, result.fetchmany(max_rows + 1)
+            finally:
+                timer.cancel()
+
+        self._con.set_progress_handler(lambda: int(time.monotonic() > deadline), 10_000)
+        try:
+            cursor = self._con.execute(sql, tuple(params))
+            columns = [d[0] for d in cursor.description or ()]
+            return columns, cursor.fetchmany(max_rows + 1)
+        finally:
+            self._con.set_progress_handler(None, 0)
+
+    @instrumented("query")
+    def query(self, sql: str, params=(), max_rows=QUERY_MAX_ROWS, timeout=QUERY_TIMEOUT) -> pd.DataFrame:
+        """
+        Runs one read-only query and returns its rows.
+
+        Args:
+            sql (str): A single SELECT; use ? placeholders for values.
+            params (sequence): Values bound to the placeholders.
+            max_rows (int): Rows returned at most; df.attrs["truncated"] tells if more matched.
+            timeout (float): Seconds before the query is interrupted.
+
+        Raises:
+            QueryError: If the statement is not a single read-only query, fails or times out.
+        """
+        with self._lock:
+            self._check_statement(sql)
+            try:
+                columns, rows = self._execute(sql, params, max_rows, time.monotonic() + timeout)
+            except QueryError:
+                raise
+            except Exception as e:
+                inc("query_errors", backend=self.backend)
+                raise QueryError(str(e)) from e
+
+        df = pd.DataFrame.from_records(rows[:max_rows], columns=columns)
+        df.attrs["truncated"] = len(rows) > max_rows
+        return df
+
+    def run_template(self, name: str, **params) -> pd.DataFrame:
+        """Runs one of QUERY_TEMPLATES with its parameters bound by name."""
+        if name not in QUERY_TEMPLATES:
+            raise QueryError(f"Unknown query template: {name}")
+        names, sql = QUERY_TEMPLATES[name]
+        missing = [n for n in names if n not in params]
+        if missing or set(params) - set(names):
+            raise QueryError(f"Template {name} takes parameters {list(names)}, got {sorted(params)}")
+        return self.query(sql, [params[n] for n in names])
+
+
+def snapshot_tables(snapshot: dict) -> dict:
+    tables = {"networks": snapshot["enriched"]}
+    if snapshot.get("stations") is not None:
+        tables["stations"] = snapshot["stations"]
+        tables["availability"] = snapshot_availability(snapshot)
+    return tables
+
+
+def snapshot_engine(snapshot: dict) -> QueryEngine:
+    """The query engine over a snapshot, created on first use and kept with it."""
+    return derived_table(snapshot, "query_engine", lambda: QueryEngine(snapshot_tables(snapshot)))
+
+
+def _current_engine() -> QueryEngine:
+    snapshot = get_current_snapshot()
+    if snapshot is None:
+        # Outside the dashboard (e.g. a notebook): use the last persisted snapshot
+        snapshot = load_snapshot()
+        if snapshot is None:
+            raise QueryError("No snapshot loaded or persisted yet")
+        set_current_snapshot(snapshot)
+    return snapshot_engine(snapshot)
+
+
+def query(sql: str, params=(), max_rows=QUERY_MAX_ROWS, timeout=QUERY_TIMEOUT) -> pd.DataFrame:
+    """Runs a read-only query against the current (or last persisted) snapshot."""
+    return _current_engine().query(sql, params, max_rows=max_rows, timeout=timeout)
+
+
+def run_template(name: str, **params) -> pd.DataFrame:
+    """Runs a named template against the current (or last persisted) snapshot."""
+    return _current_engine().run_template(name, **params)
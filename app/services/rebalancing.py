@@ -0,0 +1,303 @@
+"""
+Rebalancing suggestions: which bikes to move between stations of a network.
+
+Every station with a known capacity gets a target of the network's overall
+fill ratio (or a given target_fill) times its capacity. Stations above it
+have bikes to give, stations below it need bikes, up to their free docks:
+
+    1. candidate_edges links each giving station to its
+       CANDIDATES_PER_STATION nearest needing stations within
+       MAX_MOVE_DISTANCE_M, and each needing station to its nearest givers,
+       so the graph stays sparse for networks of thousands of stations
+    2. min_cost_flow moves as many bikes as the edges allow for the least
+       total bike-meters, in COST_RESOLUTION_M units (successive shortest
+       paths with potentials, augmenting a blocking flow per Dijkstra phase)
+
+The result is a table of moves (from, to, bikes, distance) and a summary;
+unmet_bikes counts the deficit no linked station has spare bikes for.
+Plans are kept with the snapshot per network (see snapshot.derived_table).
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.services.coverage import haversine_m
+from app.services.memory_governor import governed_cache
+from app.services.metrics import instrumented
+from app.services.snapshot import derived_table, get_current_snapshot
+from app.services.station_store import load_network_stations
+
+# Moves longer than this are not suggested: a van round trip, not a cross-city transfer
+MAX_MOVE_DISTANCE_M = 3000.0
+
+# Each station is linked to this many nearest stations on the other side
+CANDIDATES_PER_STATION = 8
+
+# Stations compared per chunk when looking for candidates
+CANDIDATE_CHUNK = 2_000_000
+
+# Move costs are counted in units of this many meters: fewer distinct path
+# lengths mean far fewer solver phases, for at most half a unit more per bike
+COST_RESOLUTION_M = 25.0
+
+MOVE_COLUMNS = ["from_id", "from_name", "to_id", "to_name", "bikes", "distance_m"]
+
+
+def station_imbalance(stations: pd.DataFrame, target_fill=None) -> pd.DataFrame:
+    """
+    Target bikes and the surplus or deficit of each station.
+
+    Capacity is the larger of the station's slots and its bikes plus free
+    docks; stations with no capacity or no coordinates are left out of the
+    plan. A deficit never exceeds the station's free docks.
+
+    Args:
+        stations (pd.DataFrame): Station table with coordinates, free_bikes, empty_slots and slots.
+        target_fill (float | None): Share of capacity to fill; defaults to the network's current fill.
+    """
+    bikes = stations["free_bikes"].to_numpy(dtype=np.int64)
+    empties = stations["empty_slots"].to_numpy(dtype=np.int64)
+    capacity = np.maximum(stations["slots"].to_numpy(dtype=np.int64), bikes + empties)
+    usable = (capacity > 0) & stations["latitude"].notna().to_numpy() & stations["longitude"].notna().to_numpy()
+
+    if target_fill is None:
+        total = capacity[usable].sum()
+        target_fill = bikes[usable].sum() / total if total else 0.0
+    target = np.where(usable, target_fill * capacity, 0.0)
+
+    return pd.DataFrame({
+        "capacity": capacity,
+        "target": target,
+        "surplus": np.where(usable, np.maximum(np.floor(bikes - target), 0), 0).astype(np.int64),
+        "deficit": np.where(usable, np.minimum(np.maximum(np.floor(target - bikes), 0), empties), 0).astype(np.int64),
+    }, index=stations.index)
+
+
+def candidate_edges(src_lat, src_lon, dst_lat, dst_lon, max_distance_m=MAX_MOVE_DISTANCE_M,
+                    k=CANDIDATES_PER_STATION, chunk=CANDIDATE_CHUNK):
+    """
+    Sparse links between two station sets: each station's k nearest on the other side within max_distance_m.
+
+    Returns:
+        tuple: (source positions, destination positions, distances in meters), unique pairs.
+    """
+    src_lat, src_lon = np.asarray(src_lat, dtype=np.float64), np.asarray(src_lon, dtype=np.float64)
+    dst_lat, dst_lon = np.asarray(dst_lat, dtype=np.float64), np.asarray(dst_lon, dtype=np.float64)
+    if len(src_lat) == 0 or len(dst_lat) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float64)
+
+    def nearest(a_lat, a_lon, b_lat, b_lon):
+        # Positions (a, b) of each a's k nearest b within range
+        kk = min(k, len(b_lat))
+        rows = max(1, chunk // len(b_lat))
+        pairs_a, pairs_b = [], []
+        for start in range(0, len(a_lat), rows):
+            d = haversine_m(a_lat[start:start + rows, None], a_lon[start:start + rows, None], b_lat, b_lon)
+            idx = np.argpartition(d, kk - 1, axis=1)[:, :kk] if kk < len(b_lat) else \
+                np.broadcast_to(np.arange(len(b_lat)), d.shape)
+            a = np.repeat(np.arange(start, start + len(d)), idx.shape[1])
+            b = idx.ravel()
+            keep = d[a - start, b] <= max_distance_m
+            pairs_a.append(a[keep])
+            pairs_b.append(b[keep])
+        return np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+    forward_src, forward_dst = nearest(src_lat, src_lon, dst_lat, dst_lon)
+    backward_dst, backward_src = nearest(dst_lat, dst_lon, src_lat, src_lon)
+    pairs = np.unique(np.stack([
+        np.concatenate([forward_src, backward_src]), np.concatenate([forward_dst, backward_dst])
+    ]), axis=1)
+    src, dst = pairs[0].astype(np.int64), pairs[1].astype(np.int64)
+    return src, dst, haversine_m(src_lat[src], src_lon[src], dst_lat[dst], dst_lon[dst])
+
+
+def min_cost_flow(supply, demand, src, dst, cost):
+    """
+    Ships as much of supply to demand as the edges allow, at minimum total cost.
+
+    A transport problem: edges (src[e] -> dst[e]) have unlimited capacity
+    and a non-negative integer cost per unit. Solved by successive shortest
+    paths on the residual graph: each phase runs Dijkstra on reduced costs
+    to update the node potentials, then pushes a blocking flow along the
+    edges whose reduced cost is zero.
+
+    Returns:
+        np.ndarray: Units shipped along each edge.
+    """
+    supply = [int(v) for v in supply]
+    demand = [int(v) for v in demand]
+    n_src, n_dst = len(supply), len(demand)
+    source, sink = n_src + n_dst, n_src + n_dst + 1
+    n = n_src + n_dst + 2
+    unlimited = sum(supply)
+
+    # Residual graph as flat edge lists; edge e and e ^ 1 are each other's reverse
+    head, cap, weight, adj = [], [], [], [[] for _ in range(n)]
+
+    def add_edge(u, v, c, w):
+        adj[u].append(len(head))
+        head.append(v), cap.append(c), weight.append(w)
+        adj[v].append(len(head))
+        head.append(u), cap.append(0), weight.append(-w)
+
+    for i, s in enumerate(supply):
+        if s > 0:
+            add_edge(source, i, s, 0)
+    for j, d in enumerate(demand):
+        if d > 0:
+            add_edge(n_src + j, sink, d, 0)
+    first_transport = len(head)
+    for i, j, w in zip(np.asarray(src).tolist(), np.asarray(dst).tolist(), np.asarray(cost).tolist()):
+        add_edge(i, n_src + j, unlimited, int(w))
+
+    potential = [0] * n
+    infinity = float("inf")
+    while True:
+        dist = [infinity] * n
+        dist[source] = 0
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u == sink:
+                break  # nodes not settled yet are at least this far: min(dist, bound) below still holds
+            if d > dist[u]:
+                continue
+            pu = potential[u]
+            for e in adj[u]:
+                if cap[e] > 0:
+                    v = head[e]
+                    nd = d + weight[e] + pu - potential[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+        if dist[sink] == infinity:
+            break
+        bound = dist[sink]
+        potential = [p + (d if d < bound else bound) for p, d in zip(potential, dist)]
+
+        # Blocking flow over zero reduced-cost edges, layered by BFS so it cannot cycle
+        level = [-1] * n
+        level[source] = 0
+        layered = [[] for _ in range(n)]
+        queue = [source]
+        for u in queue:
+            if u == sink:
+                continue
+            pu, next_level, out = potential[u], level[u] + 1, layered[u]
+            for e in adj[u]:
+                v = head[e]
+                if cap[e] > 0 and weight[e] + pu == potential[v]:
+                    if level[v] < 0:
+                        level[v] = next_level
+                        queue.append(v)
+                    if level[v] == next_level:
+                        out.append(e)
+
+        arc = [0] * n
+        while True:
+            path, u = [], source
+            while u != sink:
+                edges = layered[u]
+                while arc[u] < len(edges):
+                    e = edges[arc[u]]
+                    if cap[e] > 0 and level[head[e]] >= 0:
+                        break
+                    arc[u] += 1
+                else:
+                    # Dead end: retreat and skip the edge that led here
+                    if u == source:
+                        break
+                    level[u] = -1
+                    u = head[path.pop() ^ 1]
+                    arc[u] += 1
+                    continue
+                path.append(e)
+                u = head[e]
+            if u != sink:
+                break
+            pushed = min(cap[e] for e in path)
+            for e in path:
+                cap[e] -= pushed
+                cap[e ^ 1] += pushed
+
+    return np.asarray(cap[first_transport + 1::2], dtype=np.int64)
+
+
+@instrumented("plan_rebalancing")
+def plan_rebalancing(stations: pd.DataFrame, max_distance_m=MAX_MOVE_DISTANCE_M, target_fill=None) -> dict:
+    """
+    Suggests bike moves that bring a network's stations to their target fill.
+
+    Args:
+        stations (pd.DataFrame): One network's station table.
+        max_distance_m (float): Longest move suggested.
+        target_fill (float | None): See station_imbalance.
+
+    Returns:
+        dict: {"moves": DataFrame of MOVE_COLUMNS, most bikes first, "summary": dict}.
+    """
+    imbalance = station_imbalance(stations, target_fill)
+    givers = np.flatnonzero(imbalance["surplus"].to_numpy() > 0)
+    takers = np.flatnonzero(imbalance["deficit"].to_numpy() > 0)
+    lat = stations["latitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+    lon = stations["longitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    src, dst, distance = candidate_edges(lat[givers], lon[givers], lat[takers], lon[takers], max_distance_m)
+    flow = min_cost_flow(
+        imbalance["surplus"].to_numpy()[givers], imbalance["deficit"].to_numpy()[takers],
+        src, dst, np.rint(distance / COST_RESOLUTION_M).astype(np.int64),
+    )
+
+    used = flow > 0
+    origin, destination = givers[src[used]], takers[dst[used]]
+    moves = pd.DataFrame({
+        "from_id": stations["id"].to_numpy(dtype=object)[origin],
+        "from_name": stations["name"].to_numpy(dtype=object)[origin],
+        "to_id": stations["id"].to_numpy(dtype=object)[destination],
+        "to_name": stations["name"].to_numpy(dtype=object)[destination],
+        "bikes": flow[used],
+        "distance_m": distance[used].round(0),
+    }, columns=MOVE_COLUMNS)
+    moves = moves.sort_values(["bikes", "distance_m"], ascending=[False, True], kind="stable").reset_index(drop=True)
+
+    moved = int(moves["bikes"].sum())
+    deficit = int(imbalance["deficit"].sum())
+    summary = {
+        "stations": len(stations),
+        "surplus_bikes": int(imbalance["surplus"].sum()),
+        "deficit_bikes": deficit,
+        "moved_bikes": moved,
+        "unmet_bikes": deficit - moved,
+        "moves": len(moves),
+        "bike_km": float((moves["bikes"] * moves["distance_m"]).sum() / 1000),
+    }
+    return {"moves": moves, "summary": summary}
+
+
+def snapshot_rebalancing(snapshot: dict, network_id: str) -> dict:
+    """A network's plan for a snapshot, built on first use and kept with it."""
+    def build():
+        stations = snapshot["stations"]
+        return plan_rebalancing(stations[stations["network_id"] == network_id].reset_index(drop=True))
+    return derived_table(snapshot, f"rebalancing:{network_id}", build)
+
+
+@governed_cache("live_rebalancing", max_entries=16)
+@st.cache_data(show_spinner=False, max_entries=16)
+def _live_rebalancing(network_id: str) -> dict:
+    return plan_rebalancing(load_network_stations(network_id))
+
+
+def load_rebalancing(network_id: str) -> dict:
+    """
+    Returns the rebalancing plan for one network of the current snapshot.
+
+    Before the first snapshot exists it is built from the network's details.
+    """
+    snapshot = get_current_snapshot()
+    if snapshot is not None and snapshot.get("stations") is not None:
+        return snapshot_rebalancing(snapshot, network_id)
+    return _live_rebalancing(network_id)
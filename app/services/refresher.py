@@ -0,0 +1,255 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from app.services import fetcher, shared_snapshot
+from app.services.fetcher import fetch_network_data, fetch_network_details
+from app.services.metrics import inc, instrumented
+from app.services.processor import compute_station_totals, enrich_with_station_data, process_data
+from app.services.profiling import profiled
+from app.services.snapshot import (
+    enriched_subset, get_current_snapshot, make_snapshot, save_snapshot_async, set_current_snapshot
+)
+from app.services.station_store import build_station_table, load_network_stations, load_station_table
+
+_refresh_lock = threading.Lock()
+
+# Set while no background refresh runs
+_refresh_idle = threading.Event()
+_refresh_idle.set()
+
+# After a failed background refresh, no new one starts for this long
+REFRESH_RETRY_SECONDS = float(os.environ.get("REFRESH_RETRY_SECONDS", 60))
+_last_failure = None
+
+# Network details fetched concurrently during a refresh
+REFRESH_WORKERS = int(os.environ.get("REFRESH_WORKERS", 8))
+
+# Callbacks run after every snapshot swap as callback(snapshot, changed_ids, removed_ids)
+_refresh_listeners = []
+
+# network_id -> time.monotonic() of its last fetch from the API during a refresh
+_last_fetched = {}
+
+
+def add_refresh_listener(callback):
+    """Registers a callback to update derived state from the changed networks only."""
+    if callback not in _refresh_listeners:
+        _refresh_listeners.append(callback)
+
+
+def detect_changes(previous_hashes: dict, current_hashes: dict):
+    """
+    Compares two network_id -> content hash maps.
+
+    Returns:
+        tuple: (changed ids in current order, removed ids). New networks and
+        networks without a known hash count as changed.
+    """
+    changed = [
+        network_id for network_id, content_hash in current_hashes.items()
+        if content_hash is None or previous_hashes.get(network_id) != content_hash
+    ]
+    removed = [network_id for network_id in previous_hashes if network_id not in current_hashes]
+    return changed, removed
+
+
+def _merge_enriched(previous, networks_df, changed_ids):
+    changed_mask = networks_df["id"].isin(changed_ids)
+    parts = []
+    if changed_mask.any():
+        parts.append(compute_station_totals(networks_df[changed_mask]))
+    if (~changed_mask).any():
+        parts.append(enriched_subset(previous, networks_df[~changed_mask]))
+    return pd.concat(parts).loc[networks_df.index]
+
+
+def _merge_stations(previous, networks_df, changed_ids, removed_ids):
+    fresh = build_station_table(changed_ids)
+    kept = previous["stations"]
+    dropped = set(changed_ids) | set(removed_ids)
+    if dropped:
+        kept = kept[~kept["network_id"].isin(dropped)]
+    table = pd.concat([kept.astype({"network_id": "object"}), fresh.astype({"network_id": "object"})],
+                      ignore_index=True)
+    table = table[table["network_id"].isin(networks_df["id"])]
+    table["network_id"] = table["network_id"].astype("category")
+    return table.reset_index(drop=True)
+
+
+def _fetch_details(network_ids, force_refresh: bool):
+    with ThreadPoolExecutor(max_workers=max(REFRESH_WORKERS, 1), thread_name_prefix="refresh-fetch") as pool:
+        list(pool.map(lambda network_id: fetch_network_details(network_id, force_refresh=force_refresh), network_ids))
+
+
+@instrumented("refresh_snapshot")
+def refresh_snapshot(persist=True):
+    """
+    Fetches the network list and every network's details, then swaps in a new snapshot.
+
+    The first snapshot of a process is built from the detail caches (the
+    shipped network_cache/ included), so it is ready without a full crawl;
+    refresh_snapshot_async follows it up with a refetch. Every later refresh
+    refetches details from the API, REFRESH_WORKERS at a time, and compares
+    them by content hash: station totals and station rows are only rebuilt
+    for the networks whose stations changed, and everything else is carried
+    over. Networks whose feed is dead are only refetched every
+    feed_health.DEAD_FEED_RECHECK_SECONDS.
+
+    Returns:
+        dict | None: The new snapshot, or None if the network list was empty.
+    """
+    networks = fetch_network_data()
+    if not networks:
+        logging.warning("Snapshot refresh skipped: no network data fetched.")
+        return None
+
+    networks_df = process_data(networks)
+    if networks_df.empty:
+        logging.warning("Snapshot refresh skipped: processed DataFrame is empty.")
+        return None
+
+    previous = get_current_snapshot()
+    incremental = previous is not None and previous.get("stations") is not None and bool(previous.get("hashes"))
+
+    if previous is None:
+        # Seed from the caches; misses still go to the API
+        _fetch_details(networks_df["id"], force_refresh=False)
+    else:
+        # The detail caches never expire, so later refreshes go to the API; only
+        # dead feeds (see feed_health) are served from the cache between rechecks
+        from app.services.feed_health import deferred_feeds
+        deferred = deferred_feeds(previous, _last_fetched)
+        refetch = [network_id for network_id in networks_df["id"] if network_id not in deferred]
+        _fetch_details(refetch, force_refresh=True)
+        now = time.monotonic()
+        _last_fetched.update((network_id, now) for network_id in refetch)
+        if deferred:
+            inc("refresh_deferred_feeds", len(deferred))
+    hashes = {network_id: fetcher.network_content_hashes.get(network_id) for network_id in networks_df["id"]}
+
+    if incremental:
+        changed, removed = detect_changes(previous["hashes"], hashes)
+        enriched = _merge_enriched(previous, networks_df, changed)
+        stations = _merge_stations(previous, networks_df, changed, removed)
+    else:
+        changed, removed = list(networks_df["id"]), []
+        enriched = compute_station_totals(networks_df)
+        stations = build_station_table(networks_df["id"])
+
+    inc("refresh_networks", len(changed), result="changed")
+    inc("refresh_networks", len(networks_df) - len(changed), result="unchanged")
+
+    snapshot = make_snapshot(networks_df, enriched, stations=stations, hashes=hashes)
+
+    if shared_snapshot.SHARED_SNAPSHOT_DIR:
+        try:
+            generation = shared_snapshot.publish_snapshot(snapshot)
+            # Serve the mapped copy so this process shares pages with the other workers
+            snapshot = shared_snapshot.map_snapshot(generation) or snapshot
+        except Exception as e:
+            logging.warning(f"Failed to publish shared snapshot: {e}")
+
+    swap_snapshot(snapshot, changed, removed, previous)
+
+    if persist:
+        # Written off this thread, and only if the content changed
+        save_snapshot_async(snapshot)
+    return snapshot
+
+
+def swap_snapshot(snapshot, changed, removed, previous=None):
+    """Makes snapshot current, drops caches derived from changed networks and notifies listeners."""
+    set_current_snapshot(snapshot)
+
+    if changed or removed or previous is None:
+        enrich_with_station_data.clear()
+        load_network_stations.clear()
+        load_station_table.clear()
+    for callback in list(_refresh_listeners):
+        try:
+            callback(snapshot, changed, removed)
+        except Exception as e:
+            logging.error(f"Refresh listener {getattr(callback, '__name__', callback)} failed: {e}")
+
+
+def sync_shared_snapshot() -> bool:
+    """
+    Switches this process to the latest shared generation, if a newer one was published.
+
+    Returns:
+        bool: True if a new generation was attached.
+    """
+    if not shared_snapshot.SHARED_SNAPSHOT_DIR:
+        return False
+
+    previous = get_current_snapshot()
+    generation = shared_snapshot.current_generation()
+    if generation is None or (previous is not None and previous.get("generation") == generation):
+        return False
+
+    snapshot = shared_snapshot.map_snapshot(generation)
+    if snapshot is None:
+        return False
+
+    if previous is not None:
+        changed, removed = detect_changes(previous.get("hashes", {}), snapshot["hashes"])
+    else:
+        changed, removed = list(snapshot["hashes"]), []
+    swap_snapshot(snapshot, changed, removed, previous)
+    inc("shared_snapshot_attach")
+    return True
+
+
+def _refresh_in_background():
+    global _last_failure
+    seeded = get_current_snapshot() is None
+    snapshot = None
+    try:
+        with profiled("refresh"):
+            snapshot = refresh_snapshot()
+    except Exception as e:
+        logging.error(f"Background snapshot refresh failed: {e}")
+    finally:
+        _last_failure = None if snapshot is not None else time.monotonic()
+        _refresh_idle.set()
+        _refresh_lock.release()
+
+    # A snapshot seeded from the caches is refetched from the API right after
+    if seeded and snapshot is not None:
+        refresh_snapshot_async()
+
+
+def refresh_snapshot_async() -> bool:
+    """
+    Starts a background refresh unless one is already running.
+
+    After a refresh that failed or fetched nothing, no new one is started
+    for REFRESH_RETRY_SECONDS. A first snapshot built from the caches is
+    followed by a second refresh that refetches from the API.
+
+    Returns:
+        bool: True if a new refresh was started.
+    """
+    # With a shared snapshot only the elected leader talks to the API
+    if shared_snapshot.SHARED_SNAPSHOT_DIR and not shared_snapshot.acquire_refresh_leadership():
+        return False
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+    if _last_failure is not None and time.monotonic() - _last_failure < REFRESH_RETRY_SECONDS:
+        _refresh_lock.release()
+        inc("snapshot_refreshes_skipped", reason="backoff")
+        return False
+    _refresh_idle.clear()
+    inc("snapshot_refreshes")
+    threading.Thread(target=_refresh_in_background, name="snapshot-refresh", daemon=True).start()
+    return True
+
+
+def wait_for_refresh(timeout=None) -> bool:
+    """Blocks until the running background refresh is done; returns False on timeout."""
+    return _refresh_idle.wait(timeout)
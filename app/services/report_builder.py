@@ -1,117 +1,155 @@
-import pandas as pd
 import io
 from datetime import datetime
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-)
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-import matplotlib.pyplot as plt
 
-from matplotlib import cm
-from matplotlib.colors import Normalize
+from app.services.metrics import instrumented
 
-from reportlab.lib import colors
+# reportlab and matplotlib are imported inside the functions that use them, so
+# importing this module stays cheap for Streamlit reruns and worker processes.
 
-from reportlab.lib.colors import HexColor
 
-from reportlab.platypus.flowables import HRFlowable
+def _pyplot():
+    """Imports pyplot on first use, with the headless Agg backend selected explicitly."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
 
+def _chart_error(kind, error):
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph
+    return Paragraph(f" Could not render {kind}: {error}", getSampleStyleSheet()["Normal"])
+
+
+def _png_image(png, width, height):
+    from reportlab.platypus import Image
+    return Image(io.BytesIO(png), width=width, height=height)
+
+
+def _figure_png(plt, fig, **savefig_kwargs) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', **savefig_kwargs)
+    plt.close(fig)
+    return buf.getvalue()
+
 
 def matplotlib_bar_chart(df, width=450, height=170):
     try:
-        fig, ax = plt.subplots(figsize=(8, 4), facecolor='#111111')
-        ax.set_facecolor('#111111')
-
-        bars = ax.barh(df['name'], df['station_count'], color='#00b4d8')
-
-        # Add value labels (smaller font, right-aligned)
-        for bar in bars:
-            ax.text(
-                bar.get_width() + 2, bar.get_y() + bar.get_height() / 2,
-                f'{int(bar.get_width())}', va='center', color='white', fontsize=8
-            )
-
-        # Refined labels and layout
-        ax.set_xlabel("Number of Networks", color='white', fontsize=9)
-        ax.set_title("Top 10 Countries by Network Count", color='white', fontsize=11, weight='bold')
-        ax.tick_params(axis='x', colors='white', labelsize=8)
-        ax.tick_params(axis='y', colors='white', labelsize=8)
-
-        # Remove unnecessary spines
-        for spine in ax.spines.values():
-            spine.set_visible(False)
-
-        plt.tight_layout()
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', facecolor=fig.get_facecolor())
-        buf.seek(0)
-        plt.close(fig)
-
-        return Image(buf, width=width, height=height)
+        return _png_image(bar_chart_png(df), width, height)
     except Exception as e:
-        return Paragraph(f" Could not render bar chart: {e}", getSampleStyleSheet()["Normal"])
+        return _chart_error("bar chart", e)
 
 
-def matplotlib_pie_chart(df, width=450, height=220):
-    try:
-        fig, ax = plt.subplots(figsize=(6.5, 4), facecolor='#111111')
-        ax.set_facecolor('#111111')
-
-        # Gradient from blue -> light
-        norm = Normalize(vmin=df['station_count'].min(), vmax=df['station_count'].max())
-        cmap = cm.get_cmap('Blues')
-        colors = [cmap(norm(v)) for v in df['station_count']]
-
-        wedges, texts, autotexts = ax.pie(
-            df['station_count'],
-            labels=None,
-            autopct='%1.1f%%',
-            startangle=140,
-            colors=colors,
-            wedgeprops=dict(width=0.25, edgecolor='#111111')
-        )
+def bar_chart_png(df) -> bytes:
+    """Renders the bar chart as PNG bytes, so one rendering can go into many reports."""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(8, 4), facecolor='#111111')
+    ax.set_facecolor('#111111')
+
+    bars = ax.barh(df['name'], df['station_count'], color='#00b4d8')
 
-        # Brighter, clearer legend
-        ax.legend(
-            wedges, df['name'],
-            title="Top Networks",
-            loc="center left",
-            bbox_to_anchor=(1, 0.5),
-            labelcolor='white',
-            facecolor='#111111',
-            edgecolor='#111111',
-            fontsize=9,
-            title_fontsize=10
+    # Add value labels (smaller font, right-aligned)
+    for bar in bars:
+        ax.text(
+            bar.get_width() + 2, bar.get_y() + bar.get_height() / 2,
+            f'{int(bar.get_width())}', va='center', color='white', fontsize=8
         )
 
-        plt.setp(autotexts, color='white', fontsize=9, weight='bold')
-        ax.set_title("Top 10 Networks by Station Count", color='white', fontsize=11, weight='bold')
+    # Refined labels and layout
+    ax.set_xlabel("Number of Networks", color='white', fontsize=9)
+    ax.set_title("Top 10 Countries by Network Count", color='white', fontsize=11, weight='bold')
+    ax.tick_params(axis='x', colors='white', labelsize=8)
+    ax.tick_params(axis='y', colors='white', labelsize=8)
+
+    # Remove unnecessary spines
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+
+    plt.tight_layout()
+    return _figure_png(plt, fig, facecolor=fig.get_facecolor())
 
-        plt.tight_layout()
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', facecolor=fig.get_facecolor(), dpi=150)
-        buf.seek(0)
-        plt.close(fig)
 
-        return Image(buf, width=width, height=height)
+def matplotlib_pie_chart(df, width=450, height=220):
+    try:
+        return _png_image(pie_chart_png(df), width, height)
     except Exception as e:
-        return Paragraph(f" Could not render pie chart: {e}", getSampleStyleSheet()["Normal"])
+        return _chart_error("pie chart", e)
+
+
+def pie_chart_png(df) -> bytes:
+    """Renders the donut chart of station counts as PNG bytes."""
+    from matplotlib import colormaps
+    from matplotlib.colors import Normalize
+
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(6.5, 4), facecolor='#111111')
+    ax.set_facecolor('#111111')
+
+    # Gradient from blue -> light
+    norm = Normalize(vmin=df['station_count'].min(), vmax=df['station_count'].max())
+    cmap = colormaps['Blues']
+    colors = [cmap(norm(v)) for v in df['station_count']]
+
+    wedges, texts, autotexts = ax.pie(
+        df['station_count'],
+        labels=None,
+        autopct='%1.1f%%',
+        startangle=140,
+        colors=colors,
+        wedgeprops=dict(width=0.25, edgecolor='#111111')
+    )
+
+    # Brighter, clearer legend
+    ax.legend(
+        wedges, df['name'],
+        title="Top Networks",
+        loc="center left",
+        bbox_to_anchor=(1, 0.5),
+        labelcolor='white',
+        facecolor='#111111',
+        edgecolor='#111111',
+        fontsize=9,
+        title_fontsize=10
+    )
+
+    plt.setp(autotexts, color='white', fontsize=9, weight='bold')
+    ax.set_title("Top 10 Networks by Station Count", color='white', fontsize=11, weight='bold')
+
+    plt.tight_layout()
+    return _figure_png(plt, fig, facecolor=fig.get_facecolor(), dpi=150)
 
 
+@instrumented("generate_pdf_report")
 def generate_pdf_report(df, top_country, total_networks, total_stations, top_network,
                         top_country_networks_df, world_map_fig=None,
                         top_country_fig=None, top_networks_pie_fig=None,
-                        include_summary=True, include_charts=True, include_map=True):
-
-    doc = SimpleDocTemplate("final_report.pdf", pagesize=A4)
+                        include_summary=True, include_charts=True, include_map=True,
+                        availability_df=None, output_path="final_report.pdf",
+                        title="City Bike Network Report", chart_images=None,
+                        map_title="World Map of Bike Stations", feed_health=None):
+    """
+    Builds the PDF report and returns its path.
+
+    chart_images maps "bar", "pie" and "map" to PNG bytes rendered earlier
+    (see bar_chart_png, pie_chart_png and static_map_png); those charts are
+    reused as-is instead of being rendered again for this report.
+    feed_health (feed_health.health_summary) adds the live and stale feed
+    counts to the summary table.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.colors import HexColor
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+    doc = SimpleDocTemplate(output_path, pagesize=A4)
+    chart_images = chart_images or {}
     styles = getSampleStyleSheet()
     story = []
 
     # === Add Title ===
     story.append(Paragraph(
-        "<para align='center'><font size=16 color='#1d4ed8'><b>City Bike Network Report</b></font></para>",
+        f"<para align='center'><font size=16 color='#1d4ed8'><b>{title}</b></font></para>",
         styles["Normal"]
     ))
     story.append(Spacer(1, 25))
@@ -143,6 +181,15 @@ def generate_pdf_report(df, top_country, total_networks, total_stations, top_net
         [Paragraph("<b>Top Country:</b>", summary_style), top_country],
         [Paragraph("<b>Top Network:</b>", summary_style), top_network]
     ]
+    if feed_health:
+        summary_data += [
+            [Paragraph("<b>Live Feeds:</b>", summary_style),
+             f"{feed_health['live_networks']} of {feed_health['networks']} networks"],
+            [Paragraph("<b>Stale Feeds:</b>", summary_style),
+             f"{feed_health['stale_networks']} networks, {feed_health['stale_stations']} stale stations"],
+            [Paragraph("<b>Feeds Without Availability:</b>", summary_style),
+             f"{feed_health['no_availability_networks']} networks"],
+        ]
 
     # === Styled table ===
     summary_table = Table(summary_data, hAlign='CENTER', colWidths=[150, 300])
@@ -160,29 +207,47 @@ def generate_pdf_report(df, top_country, total_networks, total_stations, top_net
     story.append(summary_table)
     story.append(Spacer(1, 25))
 
+    # === Availability Section (ranked output of availability.rank_networks) ===
+    if include_summary and availability_df is not None and not availability_df.empty:
+        add_centered_section_title(story, "Networks with the Most Empty Stations")
+        try:
+            story.append(availability_table(availability_df.head(10)))
+        except Exception as e:
+            story.append(Paragraph(f"Failed to render availability table: {e}", styles["Normal"]))
+        story.append(Spacer(1, 20))
+
 
     # Charts (MATPLOTLIB ONLY)
     if include_charts:
         
         add_centered_section_title(story, "Top 10 Countries by Network Count")
         try:
-            story.append(matplotlib_bar_chart(top_country_networks_df.head(10)))
+            if "bar" in chart_images:
+                story.append(_png_image(chart_images["bar"], 450, 170))
+            else:
+                story.append(matplotlib_bar_chart(top_country_networks_df.head(10)))
         except Exception as e:
             story.append(Paragraph(f"Failed to render bar chart: {e}", styles["Normal"]))
         story.append(Spacer(1, 20))
 
         add_centered_section_title(story, "Top 10 Networks by Station Count")
         try:
-            story.append(matplotlib_pie_chart(top_country_networks_df.head(10)))
+            if "pie" in chart_images:
+                story.append(_png_image(chart_images["pie"], 450, 220))
+            else:
+                story.append(matplotlib_pie_chart(top_country_networks_df.head(10)))
         except Exception as e:
             story.append(Paragraph(f"Failed to render pie chart: {e}", styles["Normal"]))
         story.append(Spacer(1, 20))
 
     # === Map Section (Matplotlib Static Map) ===
     if include_map:
-        add_centered_section_title(story, "World Map of Bike Stations")
+        add_centered_section_title(story, map_title)
         try:
-            story.append(render_static_world_map(df))  # df must include lat/lon
+            if "map" in chart_images:
+                story.append(_png_image(chart_images["map"], 400, 250))
+            else:
+                story.append(render_static_world_map(df))  # df must include lat/lon
         except Exception as e:
             story.append(Paragraph(f"Failed to render map: {e}", styles["Normal"]))
         story.append(Spacer(1, 20))
@@ -195,28 +260,59 @@ def generate_pdf_report(df, top_country, total_networks, total_stations, top_net
     ))
 
     doc.build(story)
-    return "final_report.pdf"
+    return output_path
+
+
+def availability_table(df):
+    from reportlab.lib.colors import HexColor
+    from reportlab.platypus import Table, TableStyle
+
+    rows = [["Network", "Country", "Stations", "Empty %", "Full %", "Offline %", "Bikes/Docks"]]
+    for row in df.itertuples(index=False):
+        rows.append([
+            str(row.name)[:32], row.country, int(row.stations),
+            f"{row.empty_pct:.1f}", f"{row.full_pct:.1f}", f"{row.offline_pct:.1f}", f"{row.bike_dock_ratio:.2f}"
+        ])
+
+    table = Table(rows, hAlign='CENTER', colWidths=[150, 50, 50, 50, 50, 55, 65])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), HexColor("#1d4ed8")),
+        ('TEXTCOLOR', (0, 0), (-1, 0), HexColor("#ffffff")),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [HexColor("#f5f5f5"), HexColor("#ffffff")]),
+    ]))
+    return table
 
 
 def render_static_world_map(df, width=400, height=250):
     try:
-        fig, ax = plt.subplots(figsize=(8, 4))
-        ax.scatter(df["longitude"], df["latitude"], s=10, alpha=0.5, c='red')
-        ax.set_title("Global Bike Station Distribution")
-        ax.set_xlabel("Longitude")
-        ax.set_ylabel("Latitude")
-        ax.grid(True)
-        plt.tight_layout()
-        buf = io.BytesIO()
-        fig.savefig(buf, format="png")
-        buf.seek(0)
-        plt.close(fig)
-        return Image(buf, width=width, height=height)
+        return _png_image(static_map_png(df), width, height)
     except Exception as e:
-        return Paragraph(f" Could not render map: {e}", getSampleStyleSheet()["Normal"])
+        return _chart_error("map", e)
+
+
+def static_map_png(df, title="Global Bike Station Distribution") -> bytes:
+    """Renders a latitude/longitude scatter of df's rows as PNG bytes."""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(8, 4))
+    ax.scatter(df["longitude"], df["latitude"], s=10, alpha=0.5, c='red')
+    ax.set_title(title)
+    ax.set_xlabel("Longitude")
+    ax.set_ylabel("Latitude")
+    ax.grid(True)
+    plt.tight_layout()
+    return _figure_png(plt, fig)
 
 
 def add_centered_section_title(story, title_text):
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import Paragraph
+    from reportlab.platypus.flowables import HRFlowable
+
     # Heading text, centered and bold
     section_title_style = ParagraphStyle(
         name="SectionTitle",
@@ -0,0 +1,153 @@
+"""
+Snapshot sharing between dashboard replicas on one host.
+
+One refresher process publishes each snapshot as a generation of
+uncompressed Arrow IPC files under SHARED_SNAPSHOT_DIR (ideally on tmpfs,
+e.g. /dev/shm/citybike). Every worker memory-maps the current generation
+read-only, so the columnar station arrays live once in the page cache
+instead of once per process.
+
+A generation is written to a temp directory and renamed into place, then
+the CURRENT pointer file is replaced atomically; readers only ever follow
+the pointer to a complete generation.
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from app.services.snapshot import make_snapshot
+
+SHARED_SNAPSHOT_DIR = os.environ.get("SHARED_SNAPSHOT_DIR")
+POINTER_FILE = "CURRENT"
+LOCK_FILE = "refresh.lock"
+
+# Older generations are kept briefly so workers still reading them are unaffected
+KEEP_GENERATIONS = 3
+
+TABLES = ("networks", "enriched", "stations")
+
+_leader_lock = None
+
+
+def _write_arrow(df: pd.DataFrame, path: str):
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _map_arrow(path: str) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+    # split_blocks keeps one block per column, so columns stay views on the mapping
+    return table.to_pandas(split_blocks=True)
+
+
+def publish_snapshot(snapshot: dict, shared_dir=None) -> str:
+    """
+    Writes a snapshot as a new generation and points CURRENT at it.
+
+    Returns:
+        str: The generation name.
+    """
+    shared_dir = shared_dir or SHARED_SNAPSHOT_DIR
+    os.makedirs(shared_dir, exist_ok=True)
+
+    generation = f"gen-{time.time_ns()}"
+    tmp_dir = os.path.join(shared_dir, f".{generation}.tmp")
+    os.makedirs(tmp_dir)
+
+    for name in TABLES:
+        if snapshot.get(name) is not None:
+            _write_arrow(snapshot[name], os.path.join(tmp_dir, f"{name}.arrow"))
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"created_at": snapshot["created_at"], "hashes": snapshot.get("hashes", {})}, f)
+
+    os.replace(tmp_dir, os.path.join(shared_dir, generation))
+
+    pointer_tmp = os.path.join(shared_dir, f".{POINTER_FILE}.{os.getpid()}")
+    with open(pointer_tmp, "w") as f:
+        f.write(generation)
+    os.replace(pointer_tmp, os.path.join(shared_dir, POINTER_FILE))
+
+    _prune_generations(shared_dir)
+    return generation
+
+
+def _prune_generations(shared_dir):
+    generations = sorted(d for d in os.listdir(shared_dir) if d.startswith("gen-"))
+    for stale in generations[:-KEEP_GENERATIONS]:
+        # Workers that still map files from it keep their pages until they unmap
+        shutil.rmtree(os.path.join(shared_dir, stale), ignore_errors=True)
+
+
+def current_generation(shared_dir=None):
+    """Returns the generation CURRENT points at, or None if nothing is published."""
+    shared_dir = shared_dir or SHARED_SNAPSHOT_DIR
+    try:
+        with open(os.path.join(shared_dir, POINTER_FILE), "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def map_snapshot(generation: str, shared_dir=None):
+    """
+    Maps a published generation read-only.
+
+    Returns:
+        dict | None: A snapshot whose tables are views on the mapped files.
+    """
+    shared_dir = shared_dir or SHARED_SNAPSHOT_DIR
+    path = os.path.join(shared_dir, generation)
+    try:
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        tables = {
+            name: _map_arrow(os.path.join(path, f"{name}.arrow"))
+            for name in TABLES if os.path.exists(os.path.join(path, f"{name}.arrow"))
+        }
+        snapshot = make_snapshot(
+            tables["networks"], tables["enriched"], created_at=meta["created_at"],
+            stations=tables.get("stations"), hashes=meta.get("hashes")
+        )
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Failed to map shared snapshot {generation}: {e}")
+        return None
+
+    snapshot["generation"] = generation
+    return snapshot
+
+
+def acquire_refresh_leadership(shared_dir=None) -> bool:
+    """
+    Elects this process as the one refresher for the shared directory.
+
+    Uses a non-blocking flock held for the life of the process; when the
+    leader exits, the next worker to ask takes over.
+    """
+    global _leader_lock
+    if _leader_lock is not None:
+        return True
+
+    shared_dir = shared_dir or SHARED_SNAPSHOT_DIR
+    os.makedirs(shared_dir, exist_ok=True)
+    handle = open(os.path.join(shared_dir, LOCK_FILE), "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _leader_lock = handle
+    return True
@@ -0,0 +1,58 @@
+"""
+Request coalescing: concurrent calls for the same key share one execution.
+
+The first caller for a key runs the function; callers arriving while it is
+in flight wait for it and get the same result (or the same exception)
+instead of starting their own. Once it finishes the key is released, so
+the next call runs afresh.
+"""
+import threading
+
+from app.services.metrics import inc
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """A group of coalesced calls, counted under one name in the metrics."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) unless a call for key is already in flight, then shares its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            inc("singleflight_calls", group=self.name, role="shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        inc("singleflight_calls", group=self.name, role="leader")
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,261 @@
+"""
+Mergeable quantile sketches for station distributions.
+
+QuantileSketch is a log-bucket sketch (DDSketch-style): each positive value
+falls into bucket ceil(log_gamma(x)), zeros are counted separately, and any
+quantile is answered within RELATIVE_ACCURACY of the true value. Two
+sketches merge by adding bucket counts, so per-network sketches roll up to
+countries, and sketches from successive snapshots roll up into a history,
+without keeping the raw values. Bucket counts stay small (a few hundred for
+counts up to 10^5), so queries take effectively constant time.
+
+Per snapshot (see build_sketches):
+    free_bikes      free bikes per station, per network and per country
+    network_size    stations per network, per country
+A running history merges every snapshot's free-bike sketches.
+"""
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app.services.metrics import instrumented
+from app.services.refresher import add_refresh_listener
+from app.services.snapshot import derived_table, get_current_snapshot
+
+RELATIVE_ACCURACY = 0.01
+
+DISTRIBUTION_QUANTILES = (0.5, 0.9)
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def bucket_keys(values) -> np.ndarray:
+    """Bucket key of each positive value; callers count zeros separately."""
+    return np.ceil(np.log(np.asarray(values, dtype=np.float64)) / _LOG_GAMMA).astype(np.int64)
+
+
+class QuantileSketch:
+    """A mergeable quantile sketch over non-negative values."""
+
+    def __init__(self):
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._sorted = None
+
+    def add(self, values):
+        """Adds an array of values; negative values count as zero."""
+        values = np.clip(np.asarray(values, dtype=np.float64).ravel(), 0, None)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+
+        positive = values[values > 0]
+        keys, counts = np.unique(bucket_keys(positive), return_counts=True)
+        self._add_bins(keys, counts, len(values) - len(positive), len(values), values.min(), values.max())
+        return self
+
+    def _add_bins(self, keys, counts, zero_count, count, low, high):
+        for key, n in zip(keys.tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zero_count += int(zero_count)
+        self.count += int(count)
+        self.min = min(self.min, float(low))
+        self.max = max(self.max, float(high))
+        self._sorted = None
+
+    def merge(self, other: "QuantileSketch"):
+        """Adds another sketch's values into this one."""
+        if other.count:
+            self._add_bins(
+                np.fromiter(other.bins.keys(), dtype=np.int64, count=len(other.bins)),
+                np.fromiter(other.bins.values(), dtype=np.int64, count=len(other.bins)),
+                other.zero_count, other.count, other.min, other.max
+            )
+        return self
+
+    def quantile(self, q: float) -> float:
+        """
+        Returns the q-quantile (0 <= q <= 1), or nan for an empty sketch.
+
+        The result is within RELATIVE_ACCURACY of the true quantile value.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+        if not self.count:
+            return math.nan
+
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        if q == 1:
+            return self.max
+
+        if self._sorted is None:
+            keys = np.array(sorted(self.bins), dtype=np.int64)
+            cumulative = np.cumsum([self.bins[k] for k in keys.tolist()]) + self.zero_count
+            self._sorted = (keys, cumulative)
+        keys, cumulative = self._sorted
+
+        key = keys[min(np.searchsorted(cumulative, rank, side="right"), len(keys) - 1)]
+        value = 2 * _GAMMA ** key / (_GAMMA + 1)
+        return float(min(max(value, self.min), self.max))
+
+    def to_dict(self) -> dict:
+        return {"bins": {str(k): v for k, v in self.bins.items()}, "zero_count": self.zero_count,
+                "count": self.count, "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls()
+        sketch.bins = {int(k): int(v) for k, v in data["bins"].items()}
+        sketch.zero_count, sketch.count = int(data["zero_count"]), int(data["count"])
+        sketch.min, sketch.max = float(data["min"]), float(data["max"])
+        return sketch
+
+
+def merge_sketches(sketches) -> QuantileSketch:
+    merged = QuantileSketch()
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+
+def _sketches_by_group(codes, values, n_groups) -> list:
+    """One sketch per group code, built from a single grouped bucket count."""
+    sketches = [QuantileSketch() for _ in range(n_groups)]
+    if not len(values):
+        return sketches
+
+    values = np.clip(values.astype(np.float64), 0, None)
+    positive = values > 0
+    keys = np.zeros(len(values), dtype=np.int64)
+    keys[positive] = bucket_keys(values[positive])
+
+    # Group on (group code, zero flag, bucket key) in one pass
+    low = keys.min()
+    span = int(keys.max() - low) + 2
+    combined = codes.astype(np.int64) * span + np.where(positive, keys - low + 1, 0)
+    unique, counts = np.unique(combined, return_counts=True)
+
+    group_count = np.bincount(codes, minlength=n_groups)
+    group_min = np.full(n_groups, np.inf)
+    group_max = np.full(n_groups, -np.inf)
+    np.minimum.at(group_min, codes, values)
+    np.maximum.at(group_max, codes, values)
+
+    groups, offsets = unique // span, unique % span
+    for group in np.unique(groups).tolist():
+        mask = groups == group
+        zero = offsets[mask] == 0
+        sketch = sketches[group]
+        sketch._add_bins(
+            offsets[mask][~zero] - 1 + low, counts[mask][~zero], counts[mask][zero].sum(),
+            group_count[group], group_min[group], group_max[group]
+        )
+    return sketches
+
+
+@instrumented("build_sketches")
+def build_sketches(stations: pd.DataFrame, networks_df: pd.DataFrame) -> dict:
+    """
+    Builds the per-network and per-country sketches for one snapshot.
+
+    Returns:
+        dict: {"free_bikes": {"network": {id: sketch}, "country": {code: sketch}},
+               "network_size": {code: sketch}}
+    """
+    countries = networks_df.drop_duplicates("id").set_index("id")["country"]
+
+    codes, network_ids = pd.factorize(stations["network_id"], sort=False)
+    network_ids = list(np.asarray(network_ids, dtype=object))
+    per_network = _sketches_by_group(codes, stations["free_bikes"].to_numpy(), len(network_ids))
+    free_bikes = dict(zip(network_ids, per_network))
+
+    by_country, network_size = {}, {}
+    sizes = np.bincount(codes, minlength=len(network_ids))
+    for network_id, size in zip(network_ids, sizes.tolist()):
+        country = countries.get(network_id)
+        if country is None:
+            continue
+        by_country.setdefault(country, QuantileSketch()).merge(free_bikes[network_id])
+        network_size.setdefault(country, QuantileSketch()).add([size])
+
+    return {"free_bikes": {"network": free_bikes, "country": by_country}, "network_size": network_size}
+
+
+def snapshot_sketches(snapshot: dict) -> dict:
+    """Sketches for a snapshot, built once and kept with it."""
+    return derived_table(snapshot, "sketches", lambda: build_sketches(snapshot["stations"], snapshot["networks"]))
+
+
+# Free-bike sketches merged over every snapshot this process has served
+_history_lock = threading.Lock()
+_history = {}
+
+
+def record_history(sketches: dict):
+    """Merges one snapshot's per-network free-bike sketches into the history."""
+    with _history_lock:
+        for network_id, sketch in sketches["free_bikes"]["network"].items():
+            _history.setdefault(network_id, QuantileSketch()).merge(sketch)
+
+
+def history_sketch(network_ids=None) -> QuantileSketch:
+    """Free bikes per station over the accumulated history, for some or all networks."""
+    with _history_lock:
+        selected = _history.values() if network_ids is None else (
+            _history[n] for n in network_ids if n in _history
+        )
+        return merge_sketches(selected)
+
+
+def _update_sketches(snapshot, changed, removed):
+    if snapshot.get("stations") is not None:
+        record_history(snapshot_sketches(snapshot))
+
+
+add_refresh_listener(_update_sketches)
+
+
+def load_sketches():
+    """Sketches for the current snapshot, or None before the first snapshot."""
+    snapshot = get_current_snapshot()
+    if snapshot is None or snapshot.get("stations") is None:
+        return None
+    return snapshot_sketches(snapshot)
+
+
+def distribution_by_country(sketches: dict, quantiles=DISTRIBUTION_QUANTILES) -> pd.DataFrame:
+    """
+    Median and p90 stations per network and free bikes per station, per country.
+
+    Each row is answered from the country's sketches, without touching stations.
+    """
+    labels = ["median" if q == 0.5 else f"p{round(q * 100)}" for q in quantiles]
+    columns = ["country", "networks"] + [f"{label}_stations" for label in labels] \
+        + [f"{label}_free_bikes" for label in labels]
+
+    rows = []
+    for country, size_sketch in sketches["network_size"].items():
+        bike_sketch = sketches["free_bikes"]["country"][country]
+        row = {"country": country, "networks": size_sketch.count}
+        for q, label in zip(quantiles, labels):
+            row[f"{label}_stations"] = size_sketch.quantile(q)
+        for q, label in zip(quantiles, labels):
+            row[f"{label}_free_bikes"] = bike_sketch.quantile(q)
+        rows.append(row)
+    table = pd.DataFrame(rows, columns=columns)
+    return table.sort_values("networks", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def scope_distribution(sketches: dict, network_ids, quantiles=DISTRIBUTION_QUANTILES) -> dict:
+    """Quantiles of free bikes per station over some networks, merged from their sketches."""
+    per_network = sketches["free_bikes"]["network"]
+    merged = merge_sketches(per_network[n] for n in network_ids if n in per_network)
+    return {q: merged.quantile(q) for q in quantiles}
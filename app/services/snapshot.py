@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+from app.services.cache_io import atomic_write_bytes
+from app.services.memory_governor import GovernedCache
+from app.services.metrics import inc
+from app.services.singleflight import SingleFlight
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshot")
+MANIFEST_FILE = "MANIFEST.json"
+VERSIONS_DIR = "versions"
+KEEP_VERSIONS = 3
+
+# Snapshots older than this are still served, but trigger a background refresh
+SNAPSHOT_MAX_AGE = float(os.environ.get("SNAPSHOT_MAX_AGE", 900))
+
+ENRICHED_COLUMNS = ["station_count", "free_bikes", "empty_slots"]
+
+_lock = threading.Lock()
+_current = None
+
+# Background snapshot writer: the latest queued (snapshot, path), and set while no writer runs
+_writer_lock = threading.Lock()
+_pending_write = None
+_writer_idle = threading.Event()
+_writer_idle.set()
+
+# Concurrent first uses of one derived table of one snapshot share a single build;
+# builds of other tables, or for other snapshots, run independently
+_derived_flights = SingleFlight("snapshot_derived")
+
+
+def _with_default_index(df):
+    # reset_index copies every column on pandas < 3, which would detach
+    # memory-mapped tables from their mapping; skip it when it is a no-op
+    if isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1:
+        return df
+    return df.reset_index(drop=True)
+
+
+def make_snapshot(networks_df: pd.DataFrame, enriched_df: pd.DataFrame, created_at=None,
+                  stations=None, hashes=None) -> dict:
+    """
+    Bundles one consistent view of the data.
+
+    Args:
+        networks_df (pd.DataFrame): Output of process_data.
+        enriched_df (pd.DataFrame): The same networks with station totals.
+        created_at (float): Epoch seconds the data was fetched; defaults to now.
+        stations (pd.DataFrame): Columnar station table for all networks, if built.
+        hashes (dict): network_id -> content hash of its stations.
+
+    Returns:
+        dict: {"networks", "enriched", "stations", "hashes", "created_at", "derived"}.
+        "derived" holds tables computed from this snapshot, accounted against
+        the memory budget; see derived_table.
+    """
+    return {
+        "networks": _with_default_index(networks_df),
+        "enriched": _with_default_index(enriched_df),
+        "stations": _with_default_index(stations) if stations is not None else None,
+        "hashes": dict(hashes or {}),
+        "created_at": time.time() if created_at is None else created_at,
+        "derived": GovernedCache("snapshot_derived"),
+    }
+
+
+def content_hash(snapshot: dict) -> str:
+    """
+    Digest of a snapshot's content, ignoring when it was fetched.
+
+    Station content is taken from the per-network content hashes (which
+    leave out the per-fetch timestamps); the station table itself is only
+    hashed when a snapshot has no content hashes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    tables = ["networks", "enriched"] if snapshot.get("hashes") else ["networks", "enriched", "stations"]
+    for name in tables:
+        if snapshot.get(name) is not None:
+            digest.update(name.encode("utf-8"))
+            digest.update(pd.util.hash_pandas_object(snapshot[name], index=False).to_numpy().tobytes())
+    digest.update(json.dumps(snapshot.get("hashes") or {}, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_tables(snapshot: dict, path: str):
+    snapshot["networks"].to_parquet(os.path.join(path, "networks.parquet"), index=False)
+    snapshot["enriched"].to_parquet(os.path.join(path, "enriched.parquet"), index=False)
+    if snapshot.get("stations") is not None:
+        snapshot["stations"].to_parquet(os.path.join(path, "stations.parquet"), index=False)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"created_at": snapshot["created_at"], "hashes": snapshot.get("hashes", {})}, f)
+
+
+def _read_tables(path: str, created_at=None) -> dict:
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    stations_path = os.path.join(path, "stations.parquet")
+    return make_snapshot(
+        pd.read_parquet(os.path.join(path, "networks.parquet")),
+        pd.read_parquet(os.path.join(path, "enriched.parquet")),
+        created_at=meta["created_at"] if created_at is None else created_at,
+        stations=pd.read_parquet(stations_path) if os.path.exists(stations_path) else None,
+        hashes=meta.get("hashes"),
+    )
+
+
+def save_snapshot(snapshot: dict, path=SNAPSHOT_DIR) -> str:
+    """
+    Persists a snapshot as a new version, unless its content is unchanged.
+
+    Versions are Parquet files plus a small meta.json under
+    <path>/versions/<version>. Each is written to a temp directory and
+    renamed into place before MANIFEST.json is atomically pointed at it, so
+    the manifest only ever names a complete version. When the content hash
+    matches the current version, only the manifest's refreshed_at moves.
+
+    Returns:
+        str: The directory of the current version.
+    """
+    versions_dir = os.path.join(path, VERSIONS_DIR)
+    os.makedirs(versions_dir, exist_ok=True)
+
+    digest = content_hash(snapshot)
+    manifest = _read_manifest(path)
+    if manifest and manifest.get("content_hash") == digest \
+            and os.path.isdir(os.path.join(versions_dir, manifest["current"])):
+        manifest["refreshed_at"] = snapshot["created_at"]
+        atomic_write_bytes(os.path.join(path, MANIFEST_FILE), json.dumps(manifest).encode("utf-8"))
+        inc("snapshot_writes", result="unchanged")
+        return os.path.join(versions_dir, manifest["current"])
+
+    version = f"v-{time.time_ns()}"
+    tmp_path = os.path.join(versions_dir, f".{version}.tmp")
+    os.makedirs(tmp_path)
+    try:
+        _write_tables(snapshot, tmp_path)
+        os.replace(tmp_path, os.path.join(versions_dir, version))
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    manifest = {"current": version, "content_hash": digest, "refreshed_at": snapshot["created_at"]}
+    atomic_write_bytes(os.path.join(path, MANIFEST_FILE), json.dumps(manifest).encode("utf-8"))
+    inc("snapshot_writes", result="written")
+
+    # Keep a few older versions for readers that resolved the manifest just before the swap
+    for stale in sorted(v for v in os.listdir(versions_dir) if v.startswith("v-"))[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(versions_dir, stale), ignore_errors=True)
+    return os.path.join(versions_dir, version)
+
+
+def load_snapshot(path=SNAPSHOT_DIR):
+    """
+    Loads the version the manifest points at, or returns None if there is none or it is unreadable.
+
+    Snapshots written before versioning (tables directly in path) are still read.
+    """
+    try:
+        manifest = _read_manifest(path)
+        if manifest is None:
+            return _read_tables(path)
+        return _read_tables(os.path.join(path, VERSIONS_DIR, manifest["current"]),
+                            created_at=manifest.get("refreshed_at"))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Failed to load snapshot from {path}: {e}")
+        return None
+
+
+def _drain_writes():
+    global _pending_write
+    while True:
+        with _writer_lock:
+            if _pending_write is None:
+                _writer_idle.set()
+                return
+            snapshot, path = _pending_write
+            _pending_write = None
+        try:
+            save_snapshot(snapshot, path)
+        except Exception as e:
+            logging.warning(f"Failed to persist snapshot: {e}")
+
+
+def save_snapshot_async(snapshot: dict, path=SNAPSHOT_DIR) -> bool:
+    """
+    Queues a snapshot for save_snapshot on a background writer thread.
+
+    Only the latest queued snapshot is written; one that is superseded
+    before the writer gets to it is skipped.
+
+    Returns:
+        bool: True if a new writer thread was started.
+    """
+    global _pending_write
+    with _writer_lock:
+        _pending_write = (snapshot, path)
+        if not _writer_idle.is_set():
+            return False
+        _writer_idle.clear()
+    threading.Thread(target=_drain_writes, name="snapshot-writer", daemon=True).start()
+    return True
+
+
+def wait_for_snapshot_writes(timeout=None) -> bool:
+    """Blocks until queued snapshot writes are done; returns False on timeout."""
+    return _writer_idle.wait(timeout)
+
+
+def set_current_snapshot(snapshot):
+    """Makes a snapshot the one served by this process."""
+    global _current
+    with _lock:
+        _current = snapshot
+
+
+def get_current_snapshot():
+    """Returns the snapshot served by this process, or None before boot."""
+    with _lock:
+        return _current
+
+
+def derived_table(snapshot: dict, name: str, build):
+    """
+    Returns a table derived from snapshot, building it on first use.
+
+    The result lives in the snapshot itself, so it is computed once per
+    snapshot and dropped together with it when a refresh swaps in a new one.
+    The memory governor may evict it earlier; it is then rebuilt on next use.
+
+    Args:
+        snapshot (dict): The snapshot the table is derived from.
+        name (str): Key of the table in snapshot["derived"].
+        build (Callable): Zero-argument function computing the table.
+    """
+    derived = snapshot.get("derived")
+    if derived is None:
+        derived = snapshot.setdefault("derived", GovernedCache("snapshot_derived"))
+    table = derived.get(name)
+    if table is None:
+        table = _derived_flights.do((id(snapshot), name), _build_derived, derived, name, build)
+    return table
+
+
+def _build_derived(derived, name, build):
+    # A build that finished just before this one started may have stored the table
+    table = derived.get(name)
+    if table is None:
+        started = time.perf_counter()
+        table = build()
+        derived.put(name, table, cost=time.perf_counter() - started)
+    return table
+
+
+def snapshot_age(snapshot: dict) -> float:
+    return time.time() - snapshot["created_at"]
+
+
+def is_stale(snapshot: dict) -> bool:
+    return snapshot_age(snapshot) > SNAPSHOT_MAX_AGE
+
+
+def enriched_subset(snapshot: dict, df: pd.DataFrame):
+    """
+    Returns df with station totals taken from the snapshot.
+
+    Returns None when the snapshot does not cover every network in df, so the
+    caller can fall back to a live enrichment.
+    """
+    if snapshot is None or df.empty or "id" not in df.columns:
+        return None
+
+    enriched = snapshot["enriched"].drop_duplicates("id").set_index("id")
+    if not df["id"].isin(enriched.index).all():
+        return None
+
+    result = df.copy()
+    for column in ENRICHED_COLUMNS:
+        result[column] = enriched.loc[df["id"], column].fillna(0).astype(int).to_numpy()
+    return result
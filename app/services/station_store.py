@@ -0,0 +1,195 @@
+import logging
+import operator
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from app.services.fetcher import fetch_network_details
+from app.services.memory_governor import governed_cache
+from app.services.snapshot import get_current_snapshot
+
+STATION_COLUMNS = [
+    "network_id", "id", "name", "latitude", "longitude",
+    "free_bikes", "empty_slots", "slots", "timestamp"
+]
+
+FILTER_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _count(value) -> int:
+    return int(value) if isinstance(value, (int, float)) and value == value else 0
+
+
+def stations_to_frame(network: dict) -> pd.DataFrame:
+    """
+    Converts a network detail payload into a columnar station table.
+
+    Columns are built directly from the station list instead of through
+    per-row dicts, so large networks are converted in one pass.
+
+    Args:
+        network (dict): A network payload as returned by fetch_network_details.
+
+    Returns:
+        pd.DataFrame: One row per station with STATION_COLUMNS.
+    """
+    stations = (network or {}).get("stations") or []
+    network_id = (network or {}).get("id")
+
+    ids, names, lats, lons, bikes, empties, slots, stamps = [], [], [], [], [], [], [], []
+    for s in stations:
+        ids.append(s.get("id"))
+        names.append(s.get("name", "Unknown"))
+        lats.append(s.get("latitude"))
+        lons.append(s.get("longitude"))
+        bikes.append(_count(s.get("free_bikes")))
+        empties.append(_count(s.get("empty_slots")))
+        slots.append(_count((s.get("extra") or {}).get("slots")))
+        stamps.append(s.get("timestamp"))
+
+    return pd.DataFrame({
+        "network_id": pd.Series([network_id] * len(ids), dtype="object"),
+        "id": pd.Series(ids, dtype="object"),
+        "name": pd.Series(names, dtype="object"),
+        "latitude": pd.to_numeric(pd.Series(lats, dtype="object"), errors="coerce").astype("float64"),
+        "longitude": pd.to_numeric(pd.Series(lons, dtype="object"), errors="coerce").astype("float64"),
+        "free_bikes": np.asarray(bikes, dtype=np.int32),
+        "empty_slots": np.asarray(empties, dtype=np.int32),
+        "slots": np.asarray(slots, dtype=np.int32),
+        "timestamp": pd.Series(stamps, dtype="object"),
+    }, columns=STATION_COLUMNS)
+
+
+def build_station_table(network_ids, fetch_func=fetch_network_details) -> pd.DataFrame:
+    """
+    Builds one columnar station table covering every given network.
+
+    Args:
+        network_ids (Iterable[str]): Network ids to include.
+        fetch_func (Callable): Returns the detail payload for a network id.
+
+    Returns:
+        pd.DataFrame: Concatenated station rows, network_id as a categorical.
+    """
+    frames = []
+    for network_id in network_ids:
+        if not network_id:
+            continue
+        try:
+            frame = stations_to_frame(fetch_func(network_id))
+        except Exception as e:
+            logging.warning(f"Skipping stations for {network_id}: {e}")
+            continue
+        if not frame.empty:
+            frame["network_id"] = network_id
+            frames.append(frame)
+
+    if not frames:
+        return stations_to_frame({})
+
+    table = pd.concat(frames, ignore_index=True)
+    table["network_id"] = table["network_id"].astype("category")
+    return table
+
+
+@governed_cache("live_station_table", max_entries=1)
+@st.cache_resource(show_spinner="🔄 Fetching live station data...", max_entries=1)
+def load_station_table(network_ids: tuple) -> pd.DataFrame:
+    """
+    Station table for every given network, built once and shared.
+
+    Used before the first snapshot exists, so the live analytics build their
+    tables from one fetch of all network details instead of one each.
+    Callers must not modify the result.
+    """
+    return build_station_table(network_ids)
+
+
+def current_station_table(network_ids) -> pd.DataFrame:
+    """The current snapshot's station table; before the first snapshot, one built from the network details."""
+    snapshot = get_current_snapshot()
+    if snapshot is not None and snapshot.get("stations") is not None:
+        return snapshot["stations"]
+    return load_station_table(tuple(network_ids))
+
+
+@governed_cache("network_stations", max_entries=32)
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_network_stations(network_id: str) -> pd.DataFrame:
+    """Cached station table for a single network, sliced from the snapshot when it has one."""
+    snapshot = get_current_snapshot()
+    if snapshot is not None and snapshot.get("stations") is not None:
+        stations = snapshot["stations"]
+        rows = stations[stations["network_id"] == network_id]
+        if not rows.empty:
+            return rows.reset_index(drop=True)
+    return stations_to_frame(fetch_network_details(network_id))
+
+
+def filter_positions(stations: pd.DataFrame, filters=None) -> np.ndarray:
+    """
+    Returns the row positions of a station table that match every filter.
+
+    Args:
+        stations (pd.DataFrame): A station table from stations_to_frame.
+        filters (list): (column, operator, value) tuples, e.g. ("free_bikes", "==", 0).
+
+    Returns:
+        np.ndarray: Matching row positions in table order.
+    """
+    positions = np.arange(len(stations))
+
+    for column, op, value in filters or []:
+        if column not in stations.columns or op not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter: {column} {op} {value!r}")
+        values = stations[column].to_numpy()[positions]
+        positions = positions[FILTER_OPERATORS[op](values, value)]
+
+    return positions
+
+
+def query_stations(stations: pd.DataFrame, filters=None, sort_by=None, ascending=True,
+                   page=1, page_size=25):
+    """
+    Filters, sorts and pages a station table, materializing only the visible rows.
+
+    Filtering and sorting run on the underlying column arrays and produce row
+    positions; only the positions inside the requested page are taken from the
+    frame.
+
+    Args:
+        stations (pd.DataFrame): A station table from stations_to_frame.
+        filters (list): (column, operator, value) tuples, e.g. ("free_bikes", "==", 0).
+        sort_by (str): Column to sort by, or None to keep the original order.
+        ascending (bool): Sort direction.
+        page (int): 1-based page number.
+        page_size (int): Rows per page.
+
+    Returns:
+        tuple: (page DataFrame, total number of matching rows).
+    """
+    positions = filter_positions(stations, filters)
+
+    if sort_by:
+        if sort_by not in stations.columns:
+            raise ValueError(f"Unknown sort column: {sort_by}")
+        keys = stations[sort_by].to_numpy()[positions]
+        if keys.dtype == object:
+            keys = keys.astype(str)
+        order = np.argsort(keys, kind="stable")
+        if not ascending:
+            order = order[::-1]
+        positions = positions[order]
+
+    total = len(positions)
+    start = max(page - 1, 0) * page_size
+    window = positions[start:start + page_size]
+    return stations.take(window), total
@@ -0,0 +1,56 @@
+"""
+Benchmark fixtures.
+
+Benchmarks are skipped in the regular test run. Record a baseline with:
+
+    python -m app.devtools.benchcheck --save
+
+and compare a later run against it, failing on a >25% median regression:
+
+    python -m app.devtools.benchcheck
+"""
+import os
+
+import pytest
+
+from app.services import fetcher, processor
+from app.services.processor import process_data
+from tests.benchmarks.dataset import scaled_details, scaled_network_list, scaled_enriched
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("RUN_BENCHMARKS") or config.getoption("benchmark_only", default=False):
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with RUN_BENCHMARKS=1 or --benchmark-only")
+    for item in items:
+        if "benchmarks" in item.nodeid.split("/"):
+            item.add_marker(skip)
+
+
+_datasets = {}
+
+
+@pytest.fixture
+def bench_dataset(request, monkeypatch, tmp_path):
+    """
+    Loads the recorded dataset at the requested scale into the in-memory
+    network cache, and points every file the pipeline writes at tmp_path.
+    """
+    scale = request.param
+    if scale not in _datasets:
+        details = scaled_details(scale)
+        networks = scaled_network_list(details)
+        _datasets.clear()
+        _datasets[scale] = {
+            "scale": scale,
+            "details": details,
+            "networks": networks,
+            "base_df": process_data(networks),
+            "enriched_df": scaled_enriched(scale),
+        }
+
+    dataset = _datasets[scale]
+    monkeypatch.setattr(fetcher, "network_detail_cache", dataset["details"])
+    monkeypatch.setattr(processor, "CACHE_FILE", str(tmp_path / "cached_station_data.csv"))
+    monkeypatch.chdir(tmp_path)
+    return dataset
@@ -0,0 +1,68 @@
+"""
+Offline benchmark dataset recorded from the repository's own caches.
+
+network_cache/ holds one detail payload per network and cached_station_data.csv
+the matching enriched network table. Scaled datasets replicate every network
+under a new id; replicas share their station lists, so a 100x dataset costs
+little extra memory while still forcing 100x the work on the pipeline.
+"""
+import functools
+import json
+import os
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+NETWORK_CACHE_DIR = os.path.join(REPO_ROOT, "network_cache")
+STATION_CSV = os.path.join(REPO_ROOT, "cached_station_data.csv")
+
+SCALES = [1, 10, 100]
+
+
+@functools.lru_cache(maxsize=1)
+def load_recorded_details():
+    """Returns {network_id: detail payload} for every recorded network."""
+    details = {}
+    for file_name in sorted(os.listdir(NETWORK_CACHE_DIR)):
+        if not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(NETWORK_CACHE_DIR, file_name), "r") as f:
+            data = json.load(f)
+        details[data.get("id", file_name[:-5])] = data
+    return details
+
+
+@functools.lru_cache(maxsize=1)
+def load_recorded_enriched():
+    """Returns the recorded enriched network table."""
+    return pd.read_csv(STATION_CSV)
+
+
+def _replica_id(network_id, copy):
+    return network_id if copy == 0 else f"{network_id}~{copy}"
+
+
+def scaled_details(scale):
+    """Returns {network_id: detail payload} replicated `scale` times."""
+    details = {}
+    for copy in range(scale):
+        for network_id, data in load_recorded_details().items():
+            replica_id = _replica_id(network_id, copy)
+            details[replica_id] = dict(data, id=replica_id)
+    return details
+
+
+def scaled_network_list(details):
+    """Returns the network list as fetch_network_data would, without stations."""
+    return [{k: v for k, v in data.items() if k != "stations"} for data in details.values()]
+
+
+def scaled_enriched(scale):
+    """Returns the recorded enriched table replicated `scale` times with matching ids."""
+    recorded = load_recorded_enriched()
+    frames = []
+    for copy in range(scale):
+        frame = recorded.copy()
+        frame["id"] = [_replica_id(network_id, copy) for network_id in recorded["id"]]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from tests.benchmarks.dataset import REPO_ROOT
+
+MODULES = [
+    "app.services.report_builder",
+    "app.services.plot_builder",
+    "app.services.analytics",
+    "app.services.pagination",
+    "app.api.v1.routes",
+    "app.main",
+]
+
+
+def _import_in_fresh_interpreter(module):
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPO_ROOT, check=True)
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_time(benchmark, module):
+    benchmark.pedantic(_import_in_fresh_interpreter, args=(module,), rounds=5, iterations=1, warmup_rounds=1)
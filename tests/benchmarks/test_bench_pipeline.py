@@ -0,0 +1,90 @@
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import plotly.express as px
+
+from app.services.analytics import get_top_10_networks_by_station_count
+from app.services.fetcher import fetch_network_details
+from app.services.plot_builder import generate_country_summary, plot_station_map_all_networks, plot_world_station_map
+from app.services.processor import enrich_with_station_data, process_data
+from app.services.report_builder import generate_pdf_report
+from tests.benchmarks.dataset import SCALES
+
+# Figure builders materialize one row per station; 100x is left out to keep memory bounded
+MAP_SCALES = [1, 10]
+
+requires_mapbox = pytest.mark.skipif(
+    not hasattr(px, "scatter_mapbox"), reason="installed plotly has no scatter_mapbox"
+)
+
+
+def _rounds(dataset):
+    return {"rounds": 5 if dataset["scale"] == 1 else 1, "iterations": 1, "warmup_rounds": 0}
+
+
+@pytest.mark.parametrize("bench_dataset", SCALES, indirect=True)
+def test_process_data(benchmark, bench_dataset):
+    df = benchmark.pedantic(process_data, args=(bench_dataset["networks"],), **_rounds(bench_dataset))
+    assert len(df) == len(bench_dataset["networks"])
+
+
+@pytest.mark.parametrize("bench_dataset", SCALES, indirect=True)
+def test_enrich_with_station_data(benchmark, bench_dataset):
+    enrich = enrich_with_station_data.__wrapped__
+    df = benchmark.pedantic(enrich, args=(bench_dataset["base_df"],), **_rounds(bench_dataset))
+    assert df["station_count"].sum() > 0
+
+
+@pytest.mark.parametrize("bench_dataset", SCALES, indirect=True)
+def test_generate_country_summary(benchmark, bench_dataset):
+    summaries = benchmark.pedantic(
+        generate_country_summary, args=(bench_dataset["base_df"], fetch_network_details), **_rounds(bench_dataset)
+    )
+    assert summaries
+
+
+@pytest.mark.parametrize("bench_dataset", SCALES, indirect=True)
+def test_get_top_10_networks_by_station_count(benchmark, bench_dataset):
+    records = bench_dataset["base_df"].to_dict(orient="records")
+    top = benchmark.pedantic(get_top_10_networks_by_station_count, args=(records,), **_rounds(bench_dataset))
+    assert len(top) == 10
+
+
+@requires_mapbox
+@pytest.mark.parametrize("bench_dataset", MAP_SCALES, indirect=True)
+def test_plot_world_station_map(benchmark, bench_dataset):
+    fig = benchmark.pedantic(
+        plot_world_station_map, args=(bench_dataset["enriched_df"],), kwargs={"filters_applied": True},
+        **_rounds(bench_dataset)
+    )
+    assert fig is not None
+
+
+@requires_mapbox
+@pytest.mark.parametrize("bench_dataset", MAP_SCALES, indirect=True)
+def test_plot_station_map_all_networks(benchmark, bench_dataset):
+    networks = list(bench_dataset["details"].values())
+    fig = benchmark.pedantic(plot_station_map_all_networks, args=(networks,), **_rounds(bench_dataset))
+    assert fig is not None
+
+
+@pytest.mark.parametrize("bench_dataset", SCALES, indirect=True)
+def test_generate_pdf_report(benchmark, bench_dataset):
+    df = bench_dataset["enriched_df"]
+    top_country_counts = df["country"].value_counts().head(10)
+    top_country_networks_df = top_country_counts.rename_axis("name").reset_index(name="station_count")
+
+    path = benchmark.pedantic(
+        generate_pdf_report,
+        kwargs={
+            "df": df,
+            "top_country": top_country_counts.index[0],
+            "total_networks": len(df),
+            "total_stations": int(df["station_count"].sum()),
+            "top_network": df.loc[df["station_count"].idxmax(), "name"],
+            "top_country_networks_df": top_country_networks_df,
+        },
+        **_rounds(bench_dataset)
+    )
+    assert path.endswith(".pdf")
@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.services.availability import availability_by_network, overall_availability, rank_networks
+from app.services.snapshot import derived_table, make_snapshot
+
+STATIONS = pd.DataFrame({
+    "network_id": pd.Categorical(["a", "a", "b", "b", "b"], categories=["a", "b", "unused"]),
+    "free_bikes": np.array([0, 3, 2, 0, 0], dtype=np.int32),
+    "empty_slots": np.array([5, 0, 2, 0, 4], dtype=np.int32),
+    "slots": np.array([0, 0, 10, 0, 0], dtype=np.int32),
+})
+
+NETWORKS = pd.DataFrame({
+    "id": ["a", "b"], "name": ["Alpha", "Beta"], "city": ["X", "Y"], "country": ["DE", "FR"]
+})
+
+
+class TestAvailability(unittest.TestCase):
+    def test_availability_by_network(self):
+        result = availability_by_network(STATIONS).set_index("network_id")
+
+        self.assertEqual(list(result.index), ["a", "b"])
+        self.assertEqual(result.loc["a", "empty_stations"], 1)
+        self.assertEqual(result.loc["a", "full_stations"], 1)
+        self.assertEqual(result.loc["b", "offline_stations"], 1)
+        self.assertAlmostEqual(result.loc["b", "offline_pct"], 100 / 3)
+        # Reported slots win over bikes + empty docks when larger
+        self.assertEqual(result.loc["b", "docks"], 14)
+        self.assertAlmostEqual(result.loc["a", "bike_dock_ratio"], 3 / 8)
+
+    def test_empty_table(self):
+        self.assertTrue(availability_by_network(STATIONS.iloc[:0]).empty)
+        self.assertEqual(overall_availability(availability_by_network(None))["stations"], 0)
+
+    def test_overall_and_ranking(self):
+        availability = availability_by_network(STATIONS)
+        overall = overall_availability(availability)
+        self.assertEqual(overall["stations"], 5)
+        self.assertAlmostEqual(overall["empty_pct"], 40.0)
+
+        ranked = rank_networks(availability, NETWORKS, by="empty_pct")
+        self.assertEqual(list(ranked["name"]), ["Alpha", "Beta"])
+        ranked = rank_networks(availability, NETWORKS, by="offline_pct", limit=1)
+        self.assertEqual(list(ranked["name"]), ["Beta"])
+        with self.assertRaises(ValueError):
+            rank_networks(availability, NETWORKS, by="name")
+
+    def test_cached_per_snapshot(self):
+        snapshot = make_snapshot(NETWORKS, NETWORKS, stations=STATIONS)
+        calls = []
+
+        def build():
+            calls.append(1)
+            return availability_by_network(snapshot["stations"])
+
+        first = derived_table(snapshot, "availability", build)
+        self.assertIs(derived_table(snapshot, "availability", build), first)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from app.services.cache_io import (
+    CacheIntegrityError, atomic_write_bytes, decode_entry, encode_entry, read_cache_entry, resolve_codec,
+    write_cache_entry
+)
+
+PAYLOAD = {"id": "aksu", "stations": [{"id": "s1", "free_bikes": 3, "empty_slots": 5}]}
+
+
+class TestCacheIO(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_each_codec(self):
+        for codec in ("none", "gzip", "zstd"):
+            with self.subTest(codec=codec):
+                self.assertEqual(decode_entry(encode_entry(PAYLOAD, codec)), PAYLOAD)
+
+    def test_zstd_falls_back_to_gzip_when_missing(self):
+        self.assertIn(resolve_codec("zstd"), ("zstd", "gzip"))
+        with self.assertRaises(ValueError):
+            resolve_codec("lz4")
+
+    def test_truncated_entry_fails_checksum(self):
+        data = encode_entry(PAYLOAD, "gzip")
+        with self.assertRaises(CacheIntegrityError):
+            decode_entry(data[:-5])
+        with self.assertRaises(CacheIntegrityError):
+            decode_entry(b'{"id": "aksu"}')
+
+    def test_atomic_write_leaves_no_temp_files(self):
+        path = os.path.join(self.tmp.name, "aksu.cache")
+        write_cache_entry(path, PAYLOAD, "gzip")
+        write_cache_entry(path, {"id": "aksu", "stations": []}, "none")
+
+        self.assertEqual(os.listdir(self.tmp.name), ["aksu.cache"])
+        self.assertEqual(read_cache_entry(path), {"id": "aksu", "stations": []})
+
+    def test_failed_write_keeps_previous_file(self):
+        path = os.path.join(self.tmp.name, "data.csv")
+        atomic_write_bytes(path, b"old")
+        with self.assertRaises(TypeError):
+            atomic_write_bytes(path, "not bytes")
+
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"old")
+        self.assertEqual(os.listdir(self.tmp.name), ["data.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
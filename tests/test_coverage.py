@@ -0,0 +1,80 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app.services import coverage
+from app.services.coverage import build_coverage, grid_coverage, haversine_m, nearest_neighbors, snapshot_coverage
+from app.services.snapshot import make_snapshot
+
+# Three stations ~111 m apart on a meridian in Paris, one 10 km away, one Berlin station, one unlocated
+STATIONS = pd.DataFrame({
+    "network_id": pd.Categorical(["a", "a", "c", "a", "b", "a"]),
+    "latitude": [48.8500, 48.8510, 48.8520, 48.9400, 52.5200, np.nan],
+    "longitude": [2.3500, 2.3500, 2.3500, 2.3500, 13.4050, 0.0],
+})
+
+NETWORKS = pd.DataFrame({
+    "id": ["a", "b", "c"], "city": ["Paris", "Berlin", "Paris"], "country": ["FR", "DE", "FR"]
+})
+
+
+class TestCoverage(unittest.TestCase):
+    def test_haversine(self):
+        # Paris to London
+        self.assertAlmostEqual(haversine_m(48.8566, 2.3522, 51.5074, -0.1278) / 1000, 343.5, delta=0.5)
+        self.assertEqual(haversine_m([1.0, 2.0], [3.0, 4.0], [1.0, 2.0], [3.0, 4.0]).tolist(), [0.0, 0.0])
+
+    def test_nearest_neighbors_match_brute_force(self):
+        rng = np.random.default_rng(7)
+        lat = 40.0 + rng.random(300) * 0.05
+        lon = -3.7 + rng.random(300) * 0.05
+
+        nearest, neighbors = nearest_neighbors(lat, lon, radius_m=300, chunk=1000)
+
+        distances = haversine_m(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+        np.fill_diagonal(distances, np.inf)
+        np.testing.assert_allclose(nearest, distances.min(axis=1), rtol=1e-6)
+        np.testing.assert_array_equal(neighbors, (distances <= 300).sum(axis=1))
+
+        lone, counts = nearest_neighbors([1.0], [2.0])
+        self.assertTrue(np.isnan(lone[0]))
+        self.assertEqual(counts[0], 0)
+
+    def test_grid_coverage(self):
+        # A 2 x 3 km extent: one full 300 m disk in the middle, four half disks on its edges
+        lat = [0.0, 0.0, 0.018, -0.009]
+        lon = [-0.009, 0.009, 0.0, 0.0]
+        with mock.patch.object(coverage, "TRIM_EXTENT_STATIONS", 10 ** 9):
+            area, covered = grid_coverage(lat + [0.0045], lon + [0.0], radius_m=300, cell_m=10)
+        self.assertAlmostEqual(area, 2.0 * 3.0, delta=0.1)
+        self.assertAlmostEqual(covered, 3 * np.pi * 0.09, delta=0.02)
+
+        area, covered = grid_coverage([0.0], [0.0], radius_m=300, cell_m=50)
+        self.assertEqual(area, covered)
+
+    def test_build_coverage(self):
+        result = build_coverage(STATIONS, NETWORKS)
+        stations, cities = result["stations"], result["cities"].set_index(["country", "city"])
+
+        self.assertEqual(len(stations), len(STATIONS))
+        # Networks sharing a city are measured together
+        self.assertAlmostEqual(stations["nearest_m"].iloc[2], 111.2, delta=0.5)
+        self.assertEqual(list(stations["neighbors"]), [2, 2, 2, 0, 0, 0])
+        self.assertEqual(stations["density"].iloc[3], "isolated")
+        self.assertEqual(stations["density"].iloc[0], "regular")
+        self.assertTrue(pd.isna(stations["density"].iloc[5]))
+
+        paris = cities.loc[("FR", "Paris")]
+        self.assertEqual((paris["networks"], paris["stations"], paris["isolated_stations"]), (2, 4, 1))
+        self.assertTrue(0 < paris["coverage_pct"] < 100)
+        self.assertTrue(np.isnan(cities.loc[("DE", "Berlin"), "coverage_pct"]))
+
+    def test_coverage_kept_with_snapshot(self):
+        snapshot = make_snapshot(NETWORKS, NETWORKS, stations=STATIONS)
+        self.assertIs(snapshot_coverage(snapshot), snapshot_coverage(snapshot))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import gzip
+import io
+import unittest
+
+import pandas as pd
+
+from app.services.exporter import write_csv, export_table, lazy_export
+
+TABLE = pd.DataFrame({
+    "name": ["A", "B", "C", "D", "E"],
+    "free_bikes": [0, 3, 0, 1, 0],
+})
+
+class TestExporter(unittest.TestCase):
+    def test_csv_in_chunks(self):
+        out = io.BytesIO()
+        rows = write_csv(TABLE, out, chunk_rows=2)
+        self.assertEqual(rows, 5)
+        self.assertEqual(out.getvalue().decode().splitlines(), ["name,free_bikes", "A,0", "B,3", "C,0", "D,1", "E,0"])
+
+    def test_filtered_gzip_csv(self):
+        data = export_table(TABLE, "csv.gz", filters=[("free_bikes", "==", 0)]).read()
+        lines = gzip.decompress(data).decode().splitlines()
+        self.assertEqual(lines, ["name,free_bikes", "A,0", "C,0", "E,0"])
+
+    def test_parquet_round_trip(self):
+        out = export_table(TABLE, "parquet", chunk_rows=2)
+        result = pd.read_parquet(io.BytesIO(out.read()))
+        pd.testing.assert_frame_equal(result, TABLE)
+
+    def test_lazy_export_defers_and_validates(self):
+        build = lazy_export(TABLE, "xlsx")
+        with self.assertRaises(ValueError):
+            build()
+
+if __name__ == '__main__':
+    unittest.main()
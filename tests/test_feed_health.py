@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.services.feed_health import (
+    build_feed_health, deferred_feeds, health_summary, parse_timestamps, unhealthy_network_ids
+)
+from app.services.snapshot import make_snapshot
+
+NOW = "2025-05-03T12:00:00+00:00"
+
+STATIONS = pd.DataFrame({
+    "network_id": pd.Categorical(["live", "live", "live", "dead", "dead", "empty", "blank"]),
+    "timestamp": [
+        "2025-05-03T12:00:00.000001+00:00Z", "2025-05-03T11:30:00Z", "2025-05-01T08:00:00Z",
+        "2025-04-01T10:00:00+00:00", "2025-04-02T10:00:00+00:00",
+        "2025-05-03T11:59:00+00:00", None,
+    ],
+    "free_bikes": np.array([3, 0, 1, 5, 0, 0, 2], dtype=np.int32),
+    "empty_slots": np.array([2, 4, 0, 1, 6, 0, 1], dtype=np.int32),
+})
+
+
+class TestFeedHealth(unittest.TestCase):
+    def test_parse_timestamps(self):
+        parsed = parse_timestamps(["2025-05-03T03:15:44.156229+00:00Z", "2025-05-03T03:15:44Z",
+                                   "2025-05-03T05:15:44+02:00", None, "not a time"])
+        self.assertEqual(parsed[1], pd.Timestamp("2025-05-03T03:15:44Z"))
+        self.assertEqual(parsed[2], parsed[1])
+        self.assertEqual(parsed[0].microsecond, 156229)
+        self.assertTrue(parsed[3:].isna().all())
+
+    def test_build_feed_health(self):
+        health = build_feed_health(STATIONS, stale_after=3600)
+        networks = health["networks"].set_index("network_id")
+
+        # Ages count from the newest timestamp in the table
+        self.assertEqual(health["reference"], pd.Timestamp("2025-05-03T12:00:00.000001Z"))
+        self.assertEqual(networks.loc["live", "status"], "ok")
+        self.assertEqual(networks.loc["live", "stale_stations"], 1)
+        self.assertEqual(networks.loc["dead", "status"], "stale")
+        self.assertAlmostEqual(networks.loc["dead", "age_seconds"], 31 * 86400 + 7200, delta=1)
+        self.assertEqual(networks.loc["empty", "status"], "no_availability")
+        self.assertEqual(networks.loc["blank", "status"], "stale")
+        self.assertTrue(pd.isna(networks.loc["blank", "last_update"]))
+        self.assertEqual(health["stations"].tolist(), [False, False, True, True, True, False, True])
+
+        # Stalest first
+        self.assertEqual(list(health["networks"]["network_id"][:2]), ["dead", "blank"])
+
+    def test_summary(self):
+        health = build_feed_health(STATIONS, stale_after=3600, reference=NOW)
+        self.assertEqual(health_summary(health), {
+            "networks": 4, "live_networks": 1, "stale_networks": 2, "no_availability_networks": 1,
+            "stations": 7, "stale_stations": 4,
+        })
+        self.assertEqual(unhealthy_network_ids(health), {"dead", "empty", "blank"})
+
+    def test_deferred_feeds(self):
+        snapshot = make_snapshot(pd.DataFrame(), pd.DataFrame(), stations=STATIONS)
+        self.assertEqual(deferred_feeds(None, {}), set())
+        # Only unhealthy feeds fetched recently are deferred
+        now = 100_000.0
+        last_fetched = {"dead": now - 60, "live": now - 60, "empty": now - 7 * 3600}
+        self.assertEqual(deferred_feeds(snapshot, last_fetched, now=now), {"dead"})
+
+
+if __name__ == '__main__':
+    unittest.main()
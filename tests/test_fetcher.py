@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from app.devtools.mock_citybikes import FaultConfig, start_mock_server
+from app.services import fetcher
+
+NETWORK_ID = "aksu"
+
+class TestFetcher(unittest.TestCase):
+    def setUp(self):
+        self.faults = FaultConfig(retry_after=0)
+        self.server = start_mock_server(faults=self.faults)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.saved = (fetcher.BASE_URL, fetcher.CACHE_DIR, fetcher.MAX_RETRIES, fetcher.BACKOFF_FACTOR)
+        fetcher.BASE_URL = self.server.base_url
+        fetcher.CACHE_DIR = self.cache_dir.name
+        fetcher.MAX_RETRIES = 3
+        fetcher.BACKOFF_FACTOR = 0.01
+        fetcher.network_detail_cache.clear()
+
+    def tearDown(self):
+        fetcher.BASE_URL, fetcher.CACHE_DIR, fetcher.MAX_RETRIES, fetcher.BACKOFF_FACTOR = self.saved
+        fetcher.network_detail_cache.clear()
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache_dir.cleanup()
+
+    def test_retry_after_is_capped(self):
+        class Response:
+            def __init__(self, retry_after):
+                self.headers = {} if retry_after is None else {"Retry-After": retry_after}
+
+        self.assertEqual(fetcher._retry_after(Response("2"), 5.0), 2.0)
+        self.assertEqual(fetcher._retry_after(Response(None), 5.0), 5.0)
+        self.assertEqual(fetcher._retry_after(Response("soon"), 5.0), 5.0)
+        self.assertEqual(fetcher._retry_after(Response("3600"), 5.0), 5.0)
+
+    def test_fetch_network_list(self):
+        networks = fetcher.fetch_network_data()
+        self.assertTrue(any(n["id"] == NETWORK_ID for n in networks))
+        self.assertNotIn("stations", networks[0])
+
+    def test_fetch_details_writes_file_cache(self):
+        data = fetcher.fetch_network_details(NETWORK_ID)
+        self.assertEqual(data["id"], NETWORK_ID)
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir.name, f"{NETWORK_ID}.cache")))
+
+        fetcher.network_detail_cache.clear()
+        self.assertEqual(fetcher.fetch_network_details(NETWORK_ID), data)
+        self.assertEqual(sum(self.server.outcomes.values()), 1)
+
+    def test_damaged_cache_entry_is_refetched(self):
+        path = fetcher.save_cached_details(NETWORK_ID, {"id": NETWORK_ID, "stations": []})
+        with open(path, "rb") as f:
+            truncated = f.read()[:-10]
+        with open(path, "wb") as f:
+            f.write(truncated)
+
+        data = fetcher.fetch_network_details(NETWORK_ID)
+        self.assertTrue(data["stations"])
+        self.assertEqual(self.server.outcomes["ok"], 1)
+
+    def test_retries_after_rate_limit(self):
+        self.faults.script = ["429", "ok"]
+        data = fetcher.fetch_network_details(NETWORK_ID)
+        self.assertTrue(data["stations"])
+        self.assertEqual(self.server.outcomes["429"], 1)
+
+    def test_gives_up_on_truncated_bodies(self):
+        self.faults.script = ["truncated"] * 3
+        self.assertEqual(fetcher.fetch_network_details(NETWORK_ID), {})
+        self.assertEqual(self.server.outcomes["truncated"], 3)
+
+    def test_concurrent_misses_share_one_request(self):
+        self.faults.latency = 0.2
+        results = []
+
+        def fetch():
+            results.append(fetcher.fetch_network_details(NETWORK_ID))
+
+        threads = [threading.Thread(target=fetch) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.server.outcomes["ok"], 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_concurrent_list_fetches_share_one_request(self):
+        self.faults.latency = 0.2
+        threads = [threading.Thread(target=fetcher.fetch_network_data) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.server.outcomes["ok"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
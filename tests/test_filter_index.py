@@ -0,0 +1,64 @@
+import unittest
+
+import pandas as pd
+
+from app.services.filter_index import FilterIndex, load_filter_index
+from app.services.snapshot import make_snapshot, set_current_snapshot
+
+NETWORKS = pd.DataFrame({
+    "id": ["a", "b", "c", "d", "e"],
+    "name": ["Velo", "Nextbike", "Nextbike", "Bicing", "Alpha"],
+    "city": ["Paris", "Leipzig", "Krakow", "Barcelona", "Berlin"],
+    "country": pd.Categorical(["FR", "DE", "PL", "ES", "DE"]),
+    "station_count": [30, 10, 20, 40, 10],
+})
+
+
+class TestFilterIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = FilterIndex(NETWORKS)
+
+    def test_options(self):
+        self.assertEqual(self.index.country_options, ["ALL", "DE", "ES", "FR", "PL"])
+        self.assertEqual(self.index.networks_for("DE"), ["ALL", "Alpha", "Nextbike"])
+        self.assertEqual(self.index.networks_for(), ["ALL", "Alpha", "Bicing", "Nextbike", "Velo"])
+        self.assertEqual(self.index.networks_for("XX"), ["ALL"])
+
+    def test_select_matches_masks(self):
+        cases = [
+            ("DE", "ALL", ""), ("ALL", "Nextbike", ""), ("DE", "Nextbike", ""),
+            ("ALL", "ALL", "station count"), ("ALL", "Nextbike", "city"), ("FR", "Bicing", "name"),
+        ]
+        for country, network, sort_by in cases:
+            with self.subTest(country=country, network=network, sort_by=sort_by):
+                expected = NETWORKS
+                if country != "ALL":
+                    expected = expected[expected["country"] == country]
+                if network != "ALL":
+                    expected = expected[expected["name"] == network]
+                if sort_by:
+                    expected = expected.sort_values({"station count": "station_count"}.get(sort_by, sort_by),
+                                                    kind="stable")
+                pd.testing.assert_frame_equal(self.index.select(NETWORKS, country, network, sort_by), expected)
+
+    def test_unfiltered_select_returns_frame_itself(self):
+        self.assertIs(self.index.select(NETWORKS), NETWORKS)
+
+    def test_snapshot_index_reused(self):
+        snapshot = make_snapshot(NETWORKS, NETWORKS)
+        set_current_snapshot(snapshot)
+        try:
+            index = load_filter_index(snapshot["networks"])
+            self.assertIs(load_filter_index(snapshot["networks"]), index)
+            self.assertIs(snapshot["derived"]["filter_index"], index)
+        finally:
+            set_current_snapshot(None)
+
+    def test_live_index_shared_across_reruns(self):
+        index = load_filter_index(NETWORKS)
+        self.assertIs(load_filter_index(NETWORKS.copy()), index)
+        self.assertIsNot(load_filter_index(NETWORKS.iloc[:3]), index)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.services.geo_rollups import build_geo_rollups, cells_for, geohash_codes, geohash_strings, snapshot_rollups
+from app.services.snapshot import make_snapshot
+
+STATIONS = pd.DataFrame({
+    "network_id": pd.Categorical(["a", "a", "b", "c", "c"]),
+    "latitude": [48.8566, 48.8570, 52.5200, 48.8568, np.nan],
+    "longitude": [2.3522, 2.3525, 13.4050, 2.3523, 0.0],
+    "free_bikes": np.array([1, 2, 3, 4, 5], dtype=np.int32),
+    "empty_slots": np.array([1, 0, 2, 0, 0], dtype=np.int32),
+    "slots": np.array([0, 0, 10, 0, 0], dtype=np.int32),
+})
+
+NETWORKS = pd.DataFrame({
+    "id": ["a", "b", "c"], "city": ["Paris", "Berlin", "Paris"], "country": ["FR", "DE", "BE"]
+})
+
+
+class TestGeoRollups(unittest.TestCase):
+    def test_geohash_matches_reference(self):
+        codes = geohash_codes([57.64911, 0.0], [10.40744, 0.0], 11)
+        self.assertEqual(list(geohash_strings(codes, 11)), ["u4pruydqqvj", "s0000000000"])
+
+    def test_city_rollup(self):
+        city = build_geo_rollups(STATIONS, NETWORKS)["city"].set_index(["country", "city"])
+        self.assertEqual(city.loc[("FR", "Paris"), "stations"], 2)
+        self.assertEqual(city.loc[("BE", "Paris"), "free_bikes"], 9)
+        self.assertEqual(city.loc[("DE", "Berlin"), "docks"], 10)
+        self.assertEqual(city["stations"].sum(), len(STATIONS))
+
+    def test_cell_rollup(self):
+        rollups = build_geo_rollups(STATIONS, NETWORKS)
+        cells = rollups["cells"][5]
+        # Missing coordinates are skipped
+        self.assertEqual(cells["stations"].sum(), 4)
+
+        france = cells_for(rollups, 5, country="FR")
+        self.assertEqual(list(france["geohash"]), ["u09tv"])
+        self.assertEqual(france.iloc[0]["stations"], 2)
+
+        merged = cells_for(rollups, 5)
+        paris = merged[merged["geohash"] == "u09tv"].iloc[0]
+        self.assertEqual(paris["stations"], 3)
+        self.assertEqual(paris["free_bikes"], 7)
+        self.assertAlmostEqual(paris["latitude"], (48.8566 + 48.8570 + 48.8568) / 3)
+
+        with self.assertRaises(ValueError):
+            cells_for(rollups, 9)
+
+    def test_snapshot_rollups_built_once(self):
+        snapshot = make_snapshot(NETWORKS, NETWORKS, stations=STATIONS)
+        rollups = snapshot_rollups(snapshot)
+        self.assertIs(snapshot_rollups(snapshot), rollups)
+        # Built on top of the snapshot's availability table
+        self.assertIn("availability", snapshot["derived"])
+
+
+if __name__ == "__main__":
+    unittest.main()
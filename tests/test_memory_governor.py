@@ -0,0 +1,112 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app.services import memory_governor
+from app.services.memory_governor import GovernedCache, estimate_size, governed_cache, memory_usage, parse_bytes
+
+
+class TestMemoryGovernor(unittest.TestCase):
+    def setUp(self):
+        self.budget = memory_governor.get_budget()
+
+    def tearDown(self):
+        memory_governor.set_budget(self.budget)
+
+    def test_parse_bytes(self):
+        self.assertEqual(parse_bytes("512MB"), 512 * 1024 ** 2)
+        self.assertEqual(parse_bytes("1.5gb"), int(1.5 * 1024 ** 3))
+        self.assertEqual(parse_bytes("2048"), 2048)
+        self.assertEqual(parse_bytes(""), 0)
+        with self.assertRaises(ValueError):
+            parse_bytes("lots")
+
+    def test_estimate_size(self):
+        self.assertEqual(estimate_size(np.zeros(1000, dtype=np.float64)), 8000)
+        df = pd.DataFrame({"x": np.zeros(1000, dtype=np.int32)})
+        self.assertEqual(estimate_size(df), df.memory_usage(index=True, deep=True).sum())
+
+        # Long lists are sized from a sample, close to the exact walk
+        stations = [{"id": f"s{i}", "free_bikes": 1000 + i, "latitude": i * 0.5} for i in range(1000)]
+        exact = sum(estimate_size(s) for s in stations)
+        self.assertAlmostEqual(estimate_size(stations), exact, delta=exact * 0.05 + 8200)
+
+    def test_cache_accounting(self):
+        cache = GovernedCache("test_accounting")
+        cache.put("a", np.zeros(100, dtype=np.int64), cost=1.0)
+        cache["b"] = np.zeros(50, dtype=np.int64)
+        self.assertEqual(cache.nbytes, 1200)
+
+        cache.put("a", np.zeros(10, dtype=np.int64))
+        self.assertEqual(cache.nbytes, 480)
+        del cache["b"]
+        self.assertEqual(cache.nbytes, 80)
+        self.assertEqual(cache.get("missing"), None)
+
+        row = memory_usage().set_index("cache").loc["test_accounting"]
+        self.assertEqual((row["entries"], row["bytes"]), (1, 80))
+
+    def test_evicts_cheap_and_idle_entries_first(self):
+        with mock.patch.object(memory_governor, "_governor", memory_governor._Governor()):
+            cache = GovernedCache("test_eviction")
+            cache.put("expensive", np.zeros(1000, dtype=np.int64), cost=10.0)
+            cache.put("cheap", np.zeros(1000, dtype=np.int64), cost=0.001)
+            cache.put("idle", np.zeros(1000, dtype=np.int64), cost=10.0)
+            cache._meta["idle"][2] -= 600
+
+            # Room for two of the three entries
+            memory_governor.set_budget(20000)
+            self.assertEqual(set(cache), {"expensive", "idle"})
+
+            memory_governor.set_budget(15000)
+            self.assertEqual(set(cache), {"expensive"})
+
+            # An insert over budget evicts down to the low watermark
+            cache.put("new", np.zeros(1000, dtype=np.int64), cost=10.0)
+            self.assertLessEqual(cache.nbytes, 15000 * memory_governor.LOW_WATERMARK)
+
+    def test_governed_cache_data(self):
+        calls = []
+
+        class FakeCacheData:
+            def __call__(self, n):
+                calls.append(n)
+                return np.zeros(n, dtype=np.int8)
+
+            def clear(self):
+                calls.append("clear")
+
+        cached = governed_cache("test_cache_data", max_entries=2)(FakeCacheData())
+        for n in (100, 200, 100, 300):
+            cached(n)
+        self.assertEqual(cached.tracker.nbytes, 500)
+
+        cached.clear()
+        self.assertEqual(calls[-1], "clear")
+        self.assertEqual(cached.tracker.nbytes, 0)
+
+    def test_governed_cache_keys_frames_by_content(self):
+        class FakeCacheData:
+            def __call__(self, df):
+                return df
+
+            def clear(self):
+                pass
+
+        cached = governed_cache("test_frame_keys", max_entries=4)(FakeCacheData())
+        frames = pd.DataFrame({"id": ["a", "b"], "free_bikes": [1, 2]})
+        for _ in range(3):
+            cached(frames.copy())
+        self.assertEqual(len(cached.tracker), 1)
+
+        cached(frames.iloc[:1])
+        cached(pd.DataFrame({"free_bikes": [1, 2]}))
+        cached(pd.DataFrame({"free_bikes": [1, 2]}))
+        self.assertEqual(len(cached.tracker), 3)
+        cached.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import urllib.request
+
+from app.services import metrics
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_counters_and_timings(self):
+        metrics.inc("cache_requests", tier="memory", result="hit")
+        metrics.inc("cache_requests", tier="memory", result="hit")
+        with metrics.timed("process_data"):
+            pass
+
+        data = metrics.get_metrics()
+        self.assertEqual(data["counters"][0]["value"], 2)
+        self.assertEqual(data["timings"][0]["stage"], "process_data")
+        self.assertEqual(data["timings"][0]["count"], 1)
+
+    def test_prometheus_text(self):
+        metrics.inc("http_responses", endpoint="network", code=429)
+        metrics.observe("fetch_network_details", 0.5)
+        text = metrics.render_prometheus()
+        self.assertIn('citybike_http_responses_total{code="429",endpoint="network"} 1', text)
+        self.assertIn('citybike_stage_seconds_count{stage="fetch_network_details"} 1', text)
+        self.assertIn('citybike_stage_seconds_sum{stage="fetch_network_details"} 0.500000', text)
+
+    def test_gauges(self):
+        metrics.set_gauge("cache_bytes", 100, cache="network_details")
+        metrics.set_gauge("cache_bytes", 40, cache="network_details")
+        self.assertEqual(metrics.get_metrics()["gauges"][0]["value"], 40)
+        self.assertIn('citybike_cache_bytes{cache="network_details"} 40', metrics.render_prometheus())
+
+    def test_memory_per_stage(self):
+        started = metrics.start_memory_tracing(frames=1)
+        self.assertTrue(started)
+        try:
+            with metrics.timed("outer"):
+                kept = bytearray(2_000_000)
+                with metrics.timed("inner"):
+                    scratch = bytearray(5_000_000)
+                    del scratch
+
+            memory = {row["stage"]: row for row in metrics.get_metrics()["memory"]}
+            # The inner peak counts toward the outer stage too
+            self.assertGreaterEqual(memory["inner"]["peak_mb"], 5.0)
+            self.assertGreaterEqual(memory["outer"]["peak_mb"], 7.0)
+            self.assertLess(memory["inner"]["last_retained_mb"], 0.5)
+            self.assertGreaterEqual(memory["outer"]["last_retained_mb"], 2.0)
+            self.assertIn("citybike_stage_peak_bytes{stage=\"inner\"}", metrics.render_prometheus())
+            self.assertTrue(metrics.allocation_sites(limit=3))
+            del kept
+        finally:
+            self.assertTrue(metrics.stop_memory_tracing())
+        self.assertFalse(metrics.is_memory_tracing())
+        self.assertFalse(metrics.stop_memory_tracing())
+        self.assertIn("inner", {row["stage"] for row in metrics.get_metrics()["memory"]})
+
+    def test_memory_spans_with_equal_values(self):
+        self.assertTrue(metrics.start_memory_tracing(frames=1))
+        try:
+            first, second = metrics._start_memory_span(), metrics._start_memory_span()
+            second[:] = first
+            metrics._finish_memory_span(second)
+            self.assertIn(id(first), metrics._active_memory_spans)
+            metrics._finish_memory_span(first)
+            self.assertEqual(metrics._active_memory_spans, {})
+        finally:
+            metrics.stop_memory_tracing()
+
+    def test_instrumented_decorator(self):
+        @metrics.instrumented("double")
+        def double(x):
+            return x * 2
+
+        self.assertEqual(double(2), 4)
+        self.assertEqual(metrics.get_metrics()["timings"][0]["stage"], "double")
+
+    def test_metrics_endpoint(self):
+        server = metrics.start_metrics_server(port=0)
+        metrics.inc("cache_requests", tier="file", result="miss")
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+        self.assertIn('citybike_cache_requests_total{result="miss",tier="file"} 1', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from app.services.processor import process_data
+from app.services.processor import NETWORK_DTYPES, normalize_networks, process_data
 
 class TestProcessor(unittest.TestCase):
     def test_empty_input(self):
@@ -14,5 +14,40 @@ class TestProcessor(unittest.TestCase):
         df = process_data(sample)
         self.assertEqual(df.iloc[0]['station_count'], 10)
 
+    def test_declared_dtypes(self):
+        sample = [{
+            "id": "a", "name": "A",
+            "location": {"city": "X", "country": "DE", "latitude": "52.5", "longitude": 13.4},
+            "extra": {"slots": "many"}
+        }]
+        df = process_data(sample)
+        self.assertEqual(str(df["country"].dtype), "category")
+        self.assertEqual(str(df["city"].dtype), "category")
+        self.assertEqual(df["latitude"].dtype, "float32")
+        self.assertEqual(df["station_count"].dtype, "int32")
+        self.assertEqual(list(df.columns), list(NETWORK_DTYPES))
+        self.assertEqual(df.iloc[0]["station_count"], 0)
+
+    def test_null_name_stays_missing(self):
+        sample = [{"id": "a", "name": None, "location": {"country": "DE", "latitude": 1, "longitude": 2}}]
+        df = process_data(sample)
+        self.assertTrue(df["name"].isna().iloc[0])
+        self.assertEqual(df.iloc[0]["id"], "a")
+
+    def test_validation_report(self):
+        valid = {"id": "ok", "location": {"country": "DE", "latitude": 1, "longitude": 2}}
+        sample = [
+            valid,
+            None,
+            {"id": "no-country", "location": {"latitude": 1, "longitude": 2}},
+            {"id": "bad-lat", "location": {"country": "DE", "latitude": "n/a", "longitude": 2}},
+            {"id": "far", "location": {"country": "DE", "latitude": 91, "longitude": 2}},
+        ]
+        df, report = normalize_networks(sample)
+        self.assertEqual(list(df["id"]), ["ok"])
+        self.assertEqual(list(report["position"]), [1, 2, 3, 4])
+        self.assertEqual(list(report["id"]), ["unknown-1", "no-country", "bad-lat", "far"])
+        self.assertEqual(report.iloc[1]["reason"], "missing country")
+
 if __name__ == '__main__':
     unittest.main()
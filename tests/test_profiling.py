@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import xml.dom.minidom
+from collections import Counter
+from unittest import mock
+
+from app.services import profiling
+from app.services.profiling import (
+    Profile, collapsed_stacks, flamegraph_svg, profiling_enabled, start_rerun_profile, stop_rerun_profile
+)
+
+
+def _busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+class TestProfiling(unittest.TestCase):
+    def test_profile_writes_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with Profile("unit", out_dir=tmp, interval=0.001) as profile:
+                _busy_loop(0.2)
+
+            stem = profile.path[:-len(".svg")]
+            for suffix in profiling.PROFILE_SUFFIXES:
+                self.assertTrue(os.path.exists(stem + suffix), suffix)
+
+            with open(stem + ".collapsed") as f:
+                lines = f.read().splitlines()
+            self.assertTrue(any("_busy_loop" in line for line in lines))
+            self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+            xml.dom.minidom.parse(profile.path)
+
+    def test_stop_on_another_thread_keeps_sampled_stacks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            started = []
+            worker = threading.Thread(target=lambda: started.append(Profile("unit", out_dir=tmp).start()))
+            worker.start()
+            worker.join()
+
+            path = started[0].stop()
+            stem = path[:-len(".svg")]
+            self.assertTrue(os.path.exists(stem + ".collapsed"))
+            self.assertEqual(os.path.exists(stem + ".prof"), sys.version_info >= (3, 12))
+
+    def test_flamegraph_escapes_and_scales(self):
+        stacks = Counter({("<module> (a.py:1)", "f (a.py:2)"): 3, ("<module> (a.py:1)",): 1})
+        self.assertEqual(collapsed_stacks(stacks), "<module> (a.py:1) 1\n<module> (a.py:1);f (a.py:2) 3\n")
+
+        svg = flamegraph_svg(stacks, width=420)
+        xml.dom.minidom.parseString(svg)
+        self.assertIn('width="400.0"', svg)  # the root frame spans every sample
+        self.assertIn('width="300.0"', svg)
+
+    def test_keeps_newest_profiles(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(5):
+                for suffix in profiling.PROFILE_SUFFIXES:
+                    open(os.path.join(tmp, f"2025010{i}-rerun{suffix}"), "w").close()
+            profiling._prune(tmp, keep=2)
+            self.assertEqual(sorted(os.listdir(tmp))[0], "20250103-rerun.collapsed")
+            self.assertEqual(len(os.listdir(tmp)), 6)
+
+    def test_rerun_profile_per_session(self):
+        self.assertFalse(profiling_enabled("rerun", {}))
+        self.assertTrue(profiling_enabled("rerun", {"profile": "1"}))
+
+        session = {}
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(profiling, "PROFILE_DIR", tmp):
+            self.assertIsNone(start_rerun_profile({}, session))
+            self.assertIsNone(stop_rerun_profile(session))
+
+            # A rerun interrupted before stop() is flushed by the next one
+            start_rerun_profile({"profile": "1"}, session)
+            start_rerun_profile({"profile": "1"}, session)
+            path = stop_rerun_profile(session)
+            self.assertTrue(path.startswith(tmp))
+            self.assertEqual(session, {})
+            self.assertEqual(len([n for n in os.listdir(tmp) if n.endswith(".svg")]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
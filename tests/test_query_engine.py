@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.services import query_engine
+from app.services.query_engine import QueryEngine, QueryError, snapshot_engine
+from app.services.snapshot import make_snapshot
+
+NETWORKS = pd.DataFrame({
+    "id": ["a", "b", "c"], "name": ["Alpha", "Beta", "Gamma"], "city": ["X", "Y", "Y"],
+    "country": pd.Categorical(["DE", "FR", "FR"]), "latitude": [52.5, 48.8, 48.9], "longitude": [13.4, 2.3, 2.4],
+    "station_count": [2, 3, 1], "free_bikes": [3, 2, 1], "empty_slots": [5, 6, 0],
+})
+
+STATIONS = pd.DataFrame({
+    "network_id": pd.Categorical(["a", "a", "b", "b", "b", "c"]),
+    "id": ["s1", "s2", "s3", "s4", "s5", "s6"],
+    "name": ["One", "Two", "Three", "Four", "Five", "Six"],
+    "latitude": [52.50, 52.51, 48.80, 48.81, 48.82, 48.90],
+    "longitude": [13.40, 13.41, 2.30, 2.31, 2.32, 2.40],
+    "free_bikes": np.array([0, 3, 2, 0, 0, 1], dtype=np.int32),
+    "empty_slots": np.array([5, 0, 2, 0, 4, 0], dtype=np.int32),
+    "slots": np.zeros(6, dtype=np.int32),
+    "timestamp": ["2025-05-03T03:15:44Z"] * 6,
+})
+
+BACKENDS = ["sqlite"] + (["duckdb"] if query_engine.duckdb is not None else [])
+
+
+class TestQueryEngine(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = make_snapshot(NETWORKS, NETWORKS, stations=STATIONS)
+        self.engines = [QueryEngine(query_engine.snapshot_tables(self.snapshot), backend) for backend in BACKENDS]
+
+    def test_query(self):
+        for engine in self.engines:
+            with self.subTest(backend=engine.backend):
+                df = engine.query("SELECT country, SUM(station_count) AS stations FROM networks "
+                                  "GROUP BY country ORDER BY stations DESC")
+                self.assertEqual(df.to_dict("records"), [{"country": "FR", "stations": 4},
+                                                         {"country": "DE", "stations": 2}])
+
+                df = engine.query("SELECT name FROM stations WHERE network_id = ? ORDER BY name", ["b"])
+                self.assertEqual(list(df["name"]), ["Five", "Four", "Three"])
+
+                df = engine.query("SELECT id FROM stations ORDER BY id", max_rows=4)
+                self.assertEqual(len(df), 4)
+                self.assertTrue(df.attrs["truncated"])
+
+    def test_templates(self):
+        for engine in self.engines:
+            with self.subTest(backend=engine.backend):
+                by_country = engine.run_template("stations_by_country")
+                self.assertEqual(list(by_country["country"]), ["FR", "DE"])
+                self.assertEqual(list(by_country["stations"]), [4, 2])
+
+                top = engine.run_template("top_networks", country="FR", limit=1)
+                self.assertEqual(list(top["id"]), ["b"])
+
+                empty = engine.run_template("empty_stations", network_id="b")
+                self.assertEqual(list(empty["id"]), ["s5"])
+
+                availability = engine.run_template("country_availability").set_index("country")
+                self.assertAlmostEqual(availability.loc["FR", "offline_pct"], 25.0)
+
+                with self.assertRaises(QueryError):
+                    engine.run_template("top_networks", country="FR")
+                with self.assertRaises(QueryError):
+                    engine.run_template("no_such_template")
+
+    def test_rejects_writes_and_multiple_statements(self):
+        for engine in self.engines:
+            for sql in ["DELETE FROM networks", "DROP TABLE stations", "CREATE TABLE t (x INTEGER)",
+                        "SELECT 1; DROP TABLE networks", "ATTACH ':memory:' AS other", "SELECT * FROM nope"]:
+                with self.subTest(backend=engine.backend, sql=sql), self.assertRaises(QueryError):
+                    engine.query(sql)
+            self.assertEqual(len(engine.query("SELECT * FROM networks")), 3)
+
+    def test_timeout(self):
+        for engine in self.engines:
+            with self.subTest(backend=engine.backend), self.assertRaises(QueryError):
+                engine.query("WITH RECURSIVE r(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM r) "
+                             "SELECT COUNT(*) FROM r", timeout=0.2)
+
+    def test_engine_kept_with_snapshot(self):
+        self.assertIs(snapshot_engine(self.snapshot), snapshot_engine(self.snapshot))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.services.rebalancing import min_cost_flow, plan_rebalancing, snapshot_rebalancing, station_imbalance
+from app.services.snapshot import make_snapshot
+
+METERS_PER_DEGREE = 111_195.0
+
+
+def _stations(offsets_m, bikes, empties):
+    # Stations along a meridian, offsets_m meters north of 48.85
+    return pd.DataFrame({
+        "network_id": pd.Categorical(["a"] * len(bikes)),
+        "id": [f"s{i}" for i in range(len(bikes))],
+        "name": [f"Station {i}" for i in range(len(bikes))],
+        "latitude": 48.85 + np.asarray(offsets_m, dtype=float) / METERS_PER_DEGREE,
+        "longitude": [2.35] * len(bikes),
+        "free_bikes": np.asarray(bikes, dtype=np.int32),
+        "empty_slots": np.asarray(empties, dtype=np.int32),
+        "slots": np.zeros(len(bikes), dtype=np.int32),
+    })
+
+
+class TestRebalancing(unittest.TestCase):
+    def test_min_cost_flow_beats_nearest_first(self):
+        # Greedy would pair giver 1 with taker 0 (cost 100), leaving 0 -> 1 at 450
+        flow = min_cost_flow([1, 1], [1, 1], [0, 0, 1, 1], [0, 1, 0, 1], [150, 450, 100, 200])
+        self.assertEqual(flow.tolist(), [1, 0, 0, 1])
+
+    def test_min_cost_flow_limited_by_edges(self):
+        flow = min_cost_flow([5, 3], [4, 6], [0, 1], [0, 0], [10, 1])
+        # Only taker 0 is reachable; the cheaper giver serves it first
+        self.assertEqual(flow.tolist(), [1, 3])
+        self.assertEqual(min_cost_flow([2], [2], [], [], []).tolist(), [])
+
+    def test_station_imbalance(self):
+        stations = _stations([0, 100, 200], bikes=[10, 0, 5], empties=[0, 10, 5])
+        imbalance = station_imbalance(stations)
+        self.assertEqual(imbalance["surplus"].tolist(), [5, 0, 0])
+        self.assertEqual(imbalance["deficit"].tolist(), [0, 5, 0])
+
+        # A deficit is capped by the station's free docks
+        imbalance = station_imbalance(stations, target_fill=1.0)
+        self.assertEqual(imbalance["deficit"].tolist(), [0, 10, 5])
+
+    def test_plan(self):
+        # Givers at 0 m and 250 m, takers at 150 m and 450 m, one taker out of reach
+        stations = _stations([0, 250, 150, 450, 9000], bikes=[4, 4, 0, 0, 0], empties=[0, 0, 4, 4, 4])
+        plan = plan_rebalancing(stations, target_fill=0.5)
+        moves = plan["moves"]
+
+        self.assertEqual(set(zip(moves["from_id"], moves["to_id"], moves["bikes"])), {("s0", "s2", 2), ("s1", "s3", 2)})
+        self.assertAlmostEqual(moves["distance_m"].sum(), 350, delta=2)
+        summary = plan["summary"]
+        self.assertEqual((summary["moved_bikes"], summary["deficit_bikes"], summary["unmet_bikes"]), (4, 6, 2))
+
+    def test_plan_kept_with_snapshot(self):
+        stations = _stations([0, 100], bikes=[4, 0], empties=[0, 4])
+        networks = pd.DataFrame({"id": ["a"], "name": ["Alpha"], "country": ["FR"], "city": ["Paris"]})
+        snapshot = make_snapshot(networks, networks, stations=stations)
+        plan = snapshot_rebalancing(snapshot, "a")
+        self.assertIs(plan, snapshot_rebalancing(snapshot, "a"))
+        self.assertEqual(plan["summary"]["moved_bikes"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from app.devtools.mock_citybikes import FaultConfig, start_mock_server
+from app.services import feed_health, fetcher, refresher
+from app.services.snapshot import set_current_snapshot
+
+NETWORK_IDS = ["aksu", "alba", "algira"]
+REPO_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "network_cache")
+
+class TestRefresher(unittest.TestCase):
+    def setUp(self):
+        self.served = tempfile.TemporaryDirectory()
+        self.local = tempfile.TemporaryDirectory()
+        for network_id in NETWORK_IDS:
+            shutil.copy(os.path.join(REPO_CACHE, f"{network_id}.json"), self.served.name)
+
+        self.server = start_mock_server(cache_dir=self.served.name, faults=FaultConfig())
+        self.saved = (fetcher.BASE_URL, fetcher.CACHE_DIR)
+        fetcher.BASE_URL = self.server.base_url
+        fetcher.CACHE_DIR = self.local.name
+        fetcher.network_detail_cache.clear()
+        set_current_snapshot(None)
+        refresher._last_fetched.clear()
+        refresher._last_failure = None
+        self.calls = []
+        refresher.add_refresh_listener(self._listener)
+
+    def tearDown(self):
+        refresher._refresh_listeners.remove(self._listener)
+        refresher._last_failure = None
+        set_current_snapshot(None)
+        fetcher.BASE_URL, fetcher.CACHE_DIR = self.saved
+        fetcher.network_detail_cache.clear()
+        self.server.shutdown()
+        self.server.server_close()
+        self.served.cleanup()
+        self.local.cleanup()
+
+    def _listener(self, snapshot, changed, removed):
+        self.calls.append((sorted(changed), sorted(removed)))
+
+    def _change_free_bikes(self, network_id, delta):
+        path = os.path.join(self.served.name, f"{network_id}.json")
+        with open(path) as f:
+            data = json.load(f)
+        data["stations"][0]["free_bikes"] = (data["stations"][0]["free_bikes"] or 0) + delta
+        with open(path, "w") as f:
+            json.dump(data, f)
+        self.server.store._payloads.clear()
+
+    def test_detect_changes(self):
+        changed, removed = refresher.detect_changes({"a": 1, "b": 2, "c": 3}, {"a": 1, "b": 5, "d": 4})
+        self.assertEqual(changed, ["b", "d"])
+        self.assertEqual(removed, ["c"])
+
+    def test_first_refresh_seeds_from_cache_then_refetches(self):
+        fetcher.network_detail_cache.put("alba", {"id": "alba", "stations": []})
+        fetcher.save_cached_details("aksu", {"id": "aksu", "stations": []})
+
+        seeded = refresher.refresh_snapshot(persist=False)
+        self.assertEqual(set(seeded["stations"]["network_id"]), {"algira"})
+
+        refreshed = refresher.refresh_snapshot(persist=False)
+        station_counts = refreshed["stations"]["network_id"].value_counts()
+        self.assertGreater(station_counts["alba"], 0)
+        self.assertGreater(station_counts["aksu"], 0)
+
+    def test_seeded_background_refresh_is_followed_by_a_refetch(self):
+        calls = []
+
+        def refresh():
+            calls.append(refresher.get_current_snapshot())
+            snapshot = {"hashes": {}}
+            set_current_snapshot(snapshot)
+            return snapshot
+
+        with mock.patch.object(refresher, "refresh_snapshot", side_effect=refresh):
+            self.assertTrue(refresher.refresh_snapshot_async())
+            for _ in range(100):
+                refresher.wait_for_refresh(timeout=10)
+                if len(calls) == 2 and refresher._refresh_idle.is_set():
+                    break
+                time.sleep(0.01)
+        self.assertEqual(len(calls), 2)
+        self.assertIsNone(calls[0])
+
+    def test_incremental_refresh_only_rebuilds_changed_networks(self):
+        first = refresher.refresh_snapshot(persist=False)
+        self.assertEqual(self.calls[-1], (sorted(NETWORK_IDS), []))
+
+        refresher.refresh_snapshot(persist=False)
+        self.assertEqual(self.calls[-1], ([], []))
+
+        self._change_free_bikes("alba", 3)
+        second = refresher.refresh_snapshot(persist=False)
+        self.assertEqual(self.calls[-1], (["alba"], []))
+
+        before = first["enriched"].set_index("id")["free_bikes"]
+        after = second["enriched"].set_index("id")["free_bikes"]
+        self.assertEqual(after["alba"], before["alba"] + 3)
+        self.assertEqual(after["aksu"], before["aksu"])
+
+        stations = second["stations"]
+        self.assertEqual(len(stations), len(first["stations"]))
+        self.assertEqual(stations.loc[stations["network_id"] == "alba", "free_bikes"].sum(), after["alba"])
+
+    def test_dead_feeds_refetched_only_on_recheck(self):
+        # aksu's stations last updated weeks before the others'
+        refresher.refresh_snapshot(persist=False)
+        refresher.refresh_snapshot(persist=False)
+
+        self._change_free_bikes("aksu", 1)
+        self._change_free_bikes("alba", 1)
+        refresher.refresh_snapshot(persist=False)
+        self.assertEqual(self.calls[-1], (["alba"], []))
+
+        with mock.patch.object(feed_health, "DEAD_FEED_RECHECK_SECONDS", 0):
+            refresher.refresh_snapshot(persist=False)
+        self.assertEqual(self.calls[-1], (["aksu"], []))
+
+    def test_failed_background_refresh_backs_off(self):
+        with mock.patch.object(refresher, "refresh_snapshot", return_value=None) as refresh:
+            self.assertTrue(refresher.refresh_snapshot_async())
+            self.assertTrue(refresher.wait_for_refresh(timeout=10))
+            self.assertFalse(refresher.refresh_snapshot_async())
+            self.assertEqual(refresh.call_count, 1)
+
+            with mock.patch.object(refresher, "REFRESH_RETRY_SECONDS", 0):
+                self.assertTrue(refresher.refresh_snapshot_async())
+                self.assertTrue(refresher.wait_for_refresh(timeout=10))
+            self.assertEqual(refresh.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestReportBuilder(unittest.TestCase):
+    def test_import_does_not_load_heavy_backends(self):
+        code = (
+            "import sys, app.services.report_builder, app.services.plot_builder\n"
+            "heavy = [m for m in ('reportlab', 'matplotlib', 'plotly') if m in sys.modules]\n"
+            "assert not heavy, heavy\n"
+        )
+        subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True)
+
+    def test_generate_pdf_report(self):
+        from app.services.report_builder import generate_pdf_report
+
+        df = pd.DataFrame({
+            "name": ["A", "B"], "country": ["DE", "FR"],
+            "latitude": [52.5, 48.8], "longitude": [13.4, 2.3], "station_count": [10, 20]
+        })
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                path = generate_pdf_report(df, "FR", 2, 30, "B (20 stations)", df[["name", "station_count"]])
+                self.assertGreater(os.path.getsize(path), 0)
+
+                availability = df.assign(
+                    stations=[10, 20], empty_pct=[10.0, 5.0], full_pct=[0.0, 2.5],
+                    offline_pct=[0.0, 0.0], bike_dock_ratio=[0.4, 0.5]
+                )
+                feed_health = {"networks": 2, "live_networks": 1, "stale_networks": 1,
+                               "no_availability_networks": 0, "stations": 30, "stale_stations": 10}
+                path = generate_pdf_report(df, "FR", 2, 30, "B (20 stations)", df[["name", "station_count"]],
+                                           availability_df=availability, feed_health=feed_health)
+                self.assertGreater(os.path.getsize(path), 0)
+            finally:
+                os.chdir(cwd)
+
+        import matplotlib
+        self.assertEqual(matplotlib.get_backend().lower(), "agg")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.report_pack import plan_tasks, run_report_pack
+from app.services.snapshot import make_snapshot
+
+NETWORKS = pd.DataFrame({
+    "id": ["a", "b", "c"], "name": ["Alpha", "Beta", "Gamma"], "city": ["X", "Y", "Z"],
+    "country": ["DE", "FR", "FR"], "latitude": [52.5, 48.8, 45.7], "longitude": [13.4, 2.3, 4.8],
+})
+ENRICHED = NETWORKS.assign(station_count=[2, 3, 1], free_bikes=[3, 2, 1], empty_slots=[5, 6, 0])
+
+STATIONS = pd.DataFrame({
+    "network_id": ["a", "a", "b", "b", "b", "c"],
+    "latitude": [52.50, 52.51, 48.80, 48.81, 48.82, 45.70],
+    "longitude": [13.40, 13.41, 2.30, 2.31, 2.32, 4.80],
+    "free_bikes": np.array([0, 3, 2, 0, 0, 1], dtype=np.int32),
+    "empty_slots": np.array([5, 0, 2, 0, 4, 0], dtype=np.int32),
+    "slots": np.zeros(6, dtype=np.int32),
+})
+
+
+class TestReportPack(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = make_snapshot(NETWORKS, ENRICHED, stations=STATIONS)
+
+    def test_plan_tasks(self):
+        self.assertEqual(plan_tasks(self.snapshot), [("FR", True, []), ("DE", True, [])])
+        self.assertEqual(plan_tasks(self.snapshot, countries=["DE"]), [("DE", True, [])])
+
+        tasks = plan_tasks(self.snapshot, include_networks=True, per_task=1)
+        self.assertEqual(tasks, [("FR", True, ["b"]), ("FR", False, ["c"]), ("DE", True, ["a"])])
+
+    def test_writes_one_pdf_per_report(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers), tempfile.TemporaryDirectory() as tmp:
+                result = run_report_pack(tmp, snapshot=self.snapshot, include_networks=True, workers=workers)
+
+                self.assertEqual(result["failed"], 0)
+                expected = [
+                    os.path.join(tmp, "countries", "DE.pdf"), os.path.join(tmp, "countries", "FR.pdf"),
+                    os.path.join(tmp, "networks", "DE", "a.pdf"), os.path.join(tmp, "networks", "FR", "b.pdf"),
+                    os.path.join(tmp, "networks", "FR", "c.pdf"),
+                ]
+                self.assertEqual(result["reports"], sorted(expected))
+                for path in expected:
+                    self.assertGreater(os.path.getsize(path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
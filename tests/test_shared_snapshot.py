@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+from app.services import shared_snapshot
+from app.services.snapshot import make_snapshot
+
+NETWORKS = pd.DataFrame({"id": ["a", "b"], "name": ["A", "B"], "station_count": [5, 7]})
+ENRICHED = NETWORKS.assign(free_bikes=[4, 5], empty_slots=[6, 7])
+STATIONS = pd.DataFrame({
+    "network_id": pd.Categorical(["a", "a", "b"]),
+    "name": ["s1", "s2", "s3"],
+    "free_bikes": pd.Series([1, 3, 5], dtype="int32"),
+})
+
+class TestSharedSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publish_and_map_read_only(self):
+        self.assertIsNone(shared_snapshot.current_generation(self.dir))
+        generation = shared_snapshot.publish_snapshot(make_snapshot(NETWORKS, ENRICHED, stations=STATIONS, hashes={"a": 1}), self.dir)
+        self.assertEqual(shared_snapshot.current_generation(self.dir), generation)
+
+        mapped = shared_snapshot.map_snapshot(generation, self.dir)
+        self.assertEqual(mapped["generation"], generation)
+        self.assertEqual(mapped["hashes"], {"a": 1})
+        self.assertEqual(list(mapped["stations"]["free_bikes"]), [1, 3, 5])
+        self.assertFalse(mapped["stations"]["free_bikes"].to_numpy().flags.writeable)
+
+    def test_incomplete_generation_is_not_mapped(self):
+        generation = shared_snapshot.publish_snapshot(make_snapshot(NETWORKS, ENRICHED), self.dir)
+        os.remove(os.path.join(self.dir, generation, "enriched.arrow"))
+        self.assertIsNone(shared_snapshot.map_snapshot(generation, self.dir))
+
+    def test_old_generations_are_pruned(self):
+        for _ in range(shared_snapshot.KEEP_GENERATIONS + 2):
+            latest = shared_snapshot.publish_snapshot(make_snapshot(NETWORKS, ENRICHED), self.dir)
+        generations = [d for d in os.listdir(self.dir) if d.startswith("gen-")]
+        self.assertEqual(len(generations), shared_snapshot.KEEP_GENERATIONS)
+        self.assertIn(latest, generations)
+
+    def test_single_refresh_leader(self):
+        self.assertTrue(shared_snapshot.acquire_refresh_leadership(self.dir))
+        code = (
+            "import sys; from app.services import shared_snapshot\n"
+            f"sys.exit(0 if not shared_snapshot.acquire_refresh_leadership({self.dir!r}) else 1)\n"
+        )
+        subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+
+        shared_snapshot._leader_lock.close()
+        shared_snapshot._leader_lock = None
+
+if __name__ == '__main__':
+    unittest.main()
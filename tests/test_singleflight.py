@@ -0,0 +1,53 @@
+import threading
+import time
+import unittest
+
+from app.services.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def run_concurrently(self, target, n=6):
+        threads = [threading.Thread(target=target) for _ in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def test_shares_result_and_releases_key(self):
+        flight = SingleFlight("test")
+        calls, results = [], []
+
+        def work():
+            calls.append(1)
+            time.sleep(0.1)
+            return object()
+
+        self.run_concurrently(lambda: results.append(flight.do("k", work)))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(flight.in_flight(), 0)
+
+        flight.do("k", work)
+        self.assertEqual(len(calls), 2)
+
+    def test_shares_errors(self):
+        flight = SingleFlight("test")
+        errors = []
+
+        def fail():
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+        def call():
+            try:
+                flight.do("k", fail)
+            except RuntimeError as e:
+                errors.append(e)
+
+        self.run_concurrently(call, n=4)
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(flight.in_flight(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
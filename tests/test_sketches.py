@@ -0,0 +1,68 @@
+import math
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.services.sketches import (
+    RELATIVE_ACCURACY, QuantileSketch, build_sketches, distribution_by_country, merge_sketches, scope_distribution
+)
+
+STATIONS = pd.DataFrame({
+    "network_id": pd.Categorical(["a"] * 4 + ["b"] * 2 + ["c"] * 3),
+    "free_bikes": np.array([0, 3, 5, 7, 10, 20, 1, 1, 0], dtype=np.int32),
+})
+
+NETWORKS = pd.DataFrame({"id": ["a", "b", "c"], "country": ["FR", "FR", "DE"]})
+
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_quantiles_within_relative_accuracy(self):
+        values = np.random.default_rng(7).lognormal(2, 1, 20_000)
+        sketch = QuantileSketch().add(values)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            expected = np.quantile(values, q, method="lower")
+            self.assertAlmostEqual(sketch.quantile(q), expected, delta=expected * RELATIVE_ACCURACY * 1.01)
+
+    def test_merge_matches_single_sketch(self):
+        values = np.arange(0, 1000)
+        merged = merge_sketches([QuantileSketch().add(values[:300]), QuantileSketch().add(values[300:])])
+        whole = QuantileSketch().add(values)
+        self.assertEqual(merged.count, 1000)
+        for q in (0, 0.25, 0.5, 0.9, 1):
+            self.assertEqual(merged.quantile(q), whole.quantile(q))
+
+    def test_zeros_empty_and_round_trip(self):
+        self.assertTrue(math.isnan(QuantileSketch().quantile(0.5)))
+        sketch = QuantileSketch().add([0, 0, 0, 4])
+        self.assertEqual(sketch.quantile(0.5), 0.0)
+        self.assertEqual(sketch.quantile(1), 4.0)
+        self.assertEqual(QuantileSketch.from_dict(sketch.to_dict()).quantile(1), 4.0)
+        with self.assertRaises(ValueError):
+            sketch.quantile(1.5)
+
+
+class TestSnapshotSketches(unittest.TestCase):
+    def test_build_sketches(self):
+        sketches = build_sketches(STATIONS, NETWORKS)
+
+        self.assertEqual(sketches["free_bikes"]["network"]["a"].count, 4)
+        self.assertEqual(sketches["free_bikes"]["country"]["FR"].count, 6)
+        self.assertEqual(sketches["network_size"]["FR"].count, 2)
+        self.assertAlmostEqual(sketches["free_bikes"]["country"]["FR"].quantile(1), 20)
+
+        distribution = distribution_by_country(sketches).set_index("country")
+        self.assertAlmostEqual(distribution.loc["DE", "median_stations"], 3, delta=0.03)
+        self.assertAlmostEqual(distribution.loc["DE", "median_free_bikes"], 1, delta=0.01)
+
+        self.assertEqual(scope_distribution(sketches, ["c"])[0.5], sketches["free_bikes"]["network"]["c"].quantile(0.5))
+
+    def test_distribution_without_sketches(self):
+        empty = distribution_by_country({"network_size": {}, "free_bikes": {"network": {}, "country": {}}})
+        self.assertTrue(empty.empty)
+        self.assertIn("median_stations", empty.columns)
+        self.assertIn("median_free_bikes", empty.columns)
+
+
+if __name__ == "__main__":
+    unittest.main()
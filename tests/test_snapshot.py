@@ -0,0 +1,97 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import pandas as pd
+
+from app.services.snapshot import (
+    VERSIONS_DIR, derived_table, enriched_subset, is_stale, load_snapshot, make_snapshot, save_snapshot, save_snapshot_async,
+    wait_for_snapshot_writes
+)
+
+NETWORKS = pd.DataFrame({"id": ["a", "b"], "name": ["A", "B"], "station_count": [5, 7]})
+ENRICHED = NETWORKS.assign(station_count=[2, 3], free_bikes=[4, 5], empty_slots=[6, 7])
+
+class TestSnapshot(unittest.TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snapshot")
+            save_snapshot(make_snapshot(NETWORKS, ENRICHED, created_at=1.0), path)
+            save_snapshot(make_snapshot(NETWORKS, ENRICHED, created_at=2.0), path)
+
+            loaded = load_snapshot(path)
+            self.assertEqual(loaded["created_at"], 2.0)
+            pd.testing.assert_frame_equal(loaded["enriched"], ENRICHED)
+            self.assertEqual(os.listdir(tmp), ["snapshot"])
+
+    def test_writes_new_version_only_on_change(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first = save_snapshot(make_snapshot(NETWORKS, ENRICHED, created_at=1.0), tmp)
+            same = save_snapshot(make_snapshot(NETWORKS, ENRICHED, created_at=2.0), tmp)
+            self.assertEqual(first, same)
+
+            changed = ENRICHED.assign(free_bikes=[0, 1])
+            latest = save_snapshot(make_snapshot(NETWORKS, changed, created_at=3.0), tmp)
+            self.assertNotEqual(latest, first)
+            self.assertEqual(len(os.listdir(os.path.join(tmp, VERSIONS_DIR))), 2)
+
+            loaded = load_snapshot(tmp)
+            self.assertEqual(loaded["created_at"], 3.0)
+            self.assertEqual(list(loaded["enriched"]["free_bikes"]), [0, 1])
+
+    def test_reads_unversioned_layout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            NETWORKS.to_parquet(os.path.join(tmp, "networks.parquet"), index=False)
+            ENRICHED.to_parquet(os.path.join(tmp, "enriched.parquet"), index=False)
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                f.write('{"created_at": 5.0}')
+            self.assertEqual(load_snapshot(tmp)["created_at"], 5.0)
+
+    def test_async_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            save_snapshot_async(make_snapshot(NETWORKS, ENRICHED, created_at=1.0), tmp)
+            save_snapshot_async(make_snapshot(NETWORKS, ENRICHED, created_at=4.0), tmp)
+            self.assertTrue(wait_for_snapshot_writes(timeout=10))
+            self.assertEqual(load_snapshot(tmp)["created_at"], 4.0)
+
+    def test_missing_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertIsNone(load_snapshot(os.path.join(tmp, "missing")))
+
+    def test_enriched_subset(self):
+        snapshot = make_snapshot(NETWORKS, ENRICHED)
+        subset = enriched_subset(snapshot, NETWORKS.iloc[[1]])
+        self.assertEqual(subset.iloc[0]["free_bikes"], 5)
+        self.assertEqual(subset.iloc[0]["station_count"], 3)
+
+        unknown = pd.DataFrame({"id": ["c"], "name": ["C"]})
+        self.assertIsNone(enriched_subset(snapshot, unknown))
+
+    def test_slow_derived_build_does_not_block_other_tables(self):
+        snapshot = make_snapshot(NETWORKS, ENRICHED)
+        release = threading.Event()
+        builds = []
+
+        def slow_build():
+            builds.append("slow")
+            release.wait(10)
+            return "slow"
+
+        waiters = [threading.Thread(target=derived_table, args=(snapshot, "slow", slow_build)) for _ in range(2)]
+        for waiter in waiters:
+            waiter.start()
+        # Another table is built while the slow one is still in flight
+        self.assertEqual(derived_table(snapshot, "fast", lambda: "fast"), "fast")
+        release.set()
+        for waiter in waiters:
+            waiter.join(10)
+        self.assertEqual(builds, ["slow"])
+        self.assertEqual(derived_table(snapshot, "slow", slow_build), "slow")
+
+    def test_staleness(self):
+        self.assertFalse(is_stale(make_snapshot(NETWORKS, ENRICHED)))
+        self.assertTrue(is_stale(make_snapshot(NETWORKS, ENRICHED, created_at=0)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from app.services import station_store
+from app.services.availability import load_availability
+from app.services.feed_health import load_feed_health
+from app.services.snapshot import make_snapshot, set_current_snapshot
+from app.services.station_store import (
+    stations_to_frame, build_station_table, current_station_table, load_station_table, query_stations
+)
+
+SAMPLE_NETWORK = {
+    "id": "net-a",
+    "stations": [
+        {"id": "s1", "name": "Charlie", "latitude": 1.0, "longitude": 2.0, "free_bikes": 0, "empty_slots": 5, "extra": {"slots": 5}},
+        {"id": "s2", "name": "Alpha", "latitude": 1.1, "longitude": 2.1, "free_bikes": 3, "empty_slots": None},
+        {"id": "s3", "name": "Bravo", "latitude": 1.2, "longitude": 2.2, "free_bikes": 0, "empty_slots": 2, "extra": {"slots": 2}},
+    ]
+}
+
+class TestStationStore(unittest.TestCase):
+    def test_stations_to_frame(self):
+        frame = stations_to_frame(SAMPLE_NETWORK)
+        self.assertEqual(len(frame), 3)
+        self.assertEqual(frame["free_bikes"].dtype.name, "int32")
+        self.assertEqual(frame.iloc[1]["empty_slots"], 0)
+        self.assertEqual(frame.iloc[1]["slots"], 0)
+
+    def test_empty_network(self):
+        self.assertTrue(stations_to_frame({}).empty)
+        self.assertTrue(build_station_table([]).empty)
+
+    def test_build_station_table(self):
+        table = build_station_table(["net-a", "net-b"], fetch_func=lambda nid: dict(SAMPLE_NETWORK, id=nid))
+        self.assertEqual(len(table), 6)
+        self.assertEqual(sorted(table["network_id"].unique()), ["net-a", "net-b"])
+
+    def test_query_filter_sort_and_page(self):
+        frame = stations_to_frame(SAMPLE_NETWORK)
+        page, total = query_stations(frame, filters=[("free_bikes", "==", 0)], sort_by="name", page=1, page_size=1)
+        self.assertEqual(total, 2)
+        self.assertEqual(list(page["name"]), ["Bravo"])
+
+        page, total = query_stations(frame, sort_by="name", ascending=False, page=2, page_size=2)
+        self.assertEqual(total, 3)
+        self.assertEqual(list(page["name"]), ["Alpha"])
+
+    def test_query_rejects_unknown_filter(self):
+        frame = stations_to_frame(SAMPLE_NETWORK)
+        with self.assertRaises(ValueError):
+            query_stations(frame, filters=[("free_bikes", "~", 0)])
+    def test_live_analytics_share_one_station_table(self):
+        set_current_snapshot(None)
+        load_station_table.clear()
+        table = build_station_table(["net-a"], fetch_func=lambda nid: SAMPLE_NETWORK)
+        with mock.patch.object(station_store, "build_station_table", return_value=table) as build:
+            load_availability(["net-a"])
+            load_feed_health(["net-a"])
+        self.assertEqual(build.call_count, 1)
+        load_station_table.clear()
+    def test_current_station_table_prefers_snapshot(self):
+        table = build_station_table(["net-a"], fetch_func=lambda nid: SAMPLE_NETWORK)
+        networks = pd.DataFrame({"id": ["net-a"], "name": ["A"]})
+        set_current_snapshot(make_snapshot(networks, networks, stations=table))
+        try:
+            with mock.patch.object(station_store, "build_station_table") as build:
+                self.assertIs(current_station_table(["net-a"]), table)
+            build.assert_not_called()
+        finally:
+            set_current_snapshot(None)
+
+if __name__ == '__main__':
+    unittest.main()